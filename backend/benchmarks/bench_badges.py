@@ -0,0 +1,55 @@
+"""
+Benchmark - Badge rules
+Compares the former badge check (rule list rebuilt on every call, every rule
+evaluated) with the compiled rules, evaluated on every stat or only on the
+stats written by a challenge completion. CPU only, no database needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_badges [--calls 100000]
+"""
+
+import argparse
+import random
+import time
+
+from services.badges import BADGE_CATALOG, earned_badges
+from tests.test_badge_rules import LEGACY_RULES, random_stats
+
+BADGE_TEXT = {entry[0]: entry[1:4] for entry in BADGE_CATALOG}
+
+
+def legacy_check(stats, owned):
+    # As before: the list of ~45 rule dicts is built on every call
+    rules = [
+        {"badge_id": badge_id, "badge_name": BADGE_TEXT[badge_id][0], "badge_icon": BADGE_TEXT[badge_id][1],
+         "badge_description": BADGE_TEXT[badge_id][2], "condition": condition}
+        for badge_id, condition in LEGACY_RULES
+    ]
+    return [rule["badge_id"] for rule in rules if rule["badge_id"] not in owned and rule["condition"](stats)]
+
+
+def timed(label: str, check, samples):
+    started = time.perf_counter()
+    for stats, owned in samples:
+        check(stats, owned)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<30} {elapsed * 1e6 / len(samples):.2f}µs/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    all_ids = [entry[0] for entry in BADGE_CATALOG]
+    samples = [(random_stats(rng), set(rng.sample(all_ids, rng.randrange(0, 20)))) for _ in range(args.calls)]
+
+    print(f"{args.calls} badge checks")
+    timed("legacy (rebuild + all rules)", legacy_check, samples)
+    timed("compiled, all stats", lambda s, o: earned_badges(s, o), samples)
+    timed("compiled, challenge stats", lambda s, o: earned_badges(s, o, ("total_xp", "level", "streak_days")), samples)
+
+
+if __name__ == "__main__":
+    main()
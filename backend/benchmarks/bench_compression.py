@@ -0,0 +1,53 @@
+"""
+Benchmark - Response compression
+Bytes on the wire and CPU per request for large JSON payloads: uncompressed,
+compressed per request by the middleware (gzip, and brotli if installed), and
+served from the variants precompressed once by StaticPayload. CPU only, no
+database needed; the full FFAAA programme stands in for /kyu-levels.
+
+Usage (from backend/):
+    python -m benchmarks.bench_compression [--requests 200]
+"""
+
+import argparse
+import time
+
+from models.passages_grades import PROGRAMME_FFAAA
+from routes.grades_routes import GRADE_PAYLOADS, PROGRAMME_PAYLOADS
+from services.compression import compress, supported_encodings
+from services.http_cache import StaticPayload
+
+
+def per_request_us(job, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        job()
+    return (time.perf_counter() - started) * 1e6 / requests
+
+
+def report(label: str, payload: StaticPayload, requests: int):
+    print(f"{label} ({len(payload.body) / 1024:.1f} KB)")
+    print(f"  {'identity':<22} {len(payload.body):>9} B")
+    for encoding in supported_encodings():
+        body = compress(payload.body, encoding)
+        cpu = per_request_us(lambda: compress(payload.body, encoding), requests)
+        print(f"  {encoding + ' per request':<22} {len(body):>9} B  {cpu:>10.1f}µs/request")
+        precompressed, _ = payload.encoded[encoding]
+        cpu = per_request_us(lambda: payload.variant(encoding), requests)
+        print(f"  {encoding + ' precompressed':<22} {len(precompressed):>9} B  {cpu:>10.1f}µs/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    if "br" not in supported_encodings():
+        print("brotli not installed: gzip only\n")
+    report("curriculum (all grades)", StaticPayload(list(PROGRAMME_FFAAA.values())), args.requests)
+    report("/grades/programme", PROGRAMME_PAYLOADS[None], args.requests)
+    report("/grades/programme/shodan", GRADE_PAYLOADS["shodan"], args.requests)
+
+
+if __name__ == "__main__":
+    main()
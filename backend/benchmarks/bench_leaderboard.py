@@ -0,0 +1,102 @@
+"""
+Benchmark - Leaderboard
+Compares the legacy leaderboard query (sort of gamification_stats + one
+users.find_one per entry) with the materialized leaderboard (top-N, top-N per
+dojo and "my rank"), on a scratch database seeded with N players.
+
+Requires a MongoDB server; the scratch database is dropped at the end.
+
+Usage (from backend/):
+    python -m benchmarks.bench_leaderboard [--players 100000] [--dojos 200] [--mongo-url mongodb://localhost:27017]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.indexes import INDEX_REGISTRY, ensure_indexes
+from services.leaderboard import Leaderboard
+
+BATCH_SIZE = 5000
+SAMPLES = 200
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed(db, players: int, dojos: int):
+    rng = random.Random(42)
+    for start in range(0, players, BATCH_SIZE):
+        users, stats = [], []
+        for i in range(start, min(start + BATCH_SIZE, players)):
+            user_id = f"user-{i:07d}"
+            users.append({"id": user_id, "first_name": f"Ninja {i}", "dojo_id": f"dojo-{rng.randrange(dojos)}"})
+            stats.append({"user_id": user_id, "total_xp": rng.randrange(0, 50000, 5), "level": 1, "level_name": "Petit Scarabée"})
+        await db.users.insert_many(users)
+        await db.gamification_stats.insert_many(stats)
+
+
+async def legacy_top(db, limit: int):
+    entries = await db.gamification_stats.find(
+        {}, {"_id": 0, "user_id": 1, "total_xp": 1, "level": 1, "level_name": 1}
+    ).sort("total_xp", -1).limit(limit).to_list(length=limit)
+    for i, entry in enumerate(entries):
+        user = await db.users.find_one({"id": entry["user_id"]}, {"_id": 0, "first_name": 1})
+        entry["rank"] = i + 1
+        entry["name"] = user.get("first_name", "Ninja") if user else "Ninja"
+    return entries
+
+
+async def timed(label: str, make_call, samples: int = SAMPLES):
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        await make_call()
+        durations.append((time.perf_counter() - started) * 1000)
+    print(f"  {label:<28} p50={statistics.median(durations):.2f}ms p99={percentile(durations, 99):.2f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--dojos", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10, help="leaderboard size")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="bench_leaderboard")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    await client.drop_database(args.db_name)
+    db = client[args.db_name]
+    try:
+        started = time.perf_counter()
+        await seed(db, args.players, args.dojos)
+        # Legacy path as deployed: users.id indexed, no index on total_xp
+        await ensure_indexes(db, {"users": INDEX_REGISTRY["users"], "leaderboard": INDEX_REGISTRY["leaderboard"]})
+        print(f"Seeded {args.players} players in {args.dojos} dojos ({time.perf_counter() - started:.1f}s)")
+
+        board = Leaderboard(db)
+        started = time.perf_counter()
+        await board.rebuild()
+        print(f"  rebuild                      {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        rng = random.Random(7)
+        await timed(f"legacy top {args.limit}", lambda: legacy_top(db, args.limit), samples=20)
+        await timed(f"materialized top {args.limit}", lambda: board.top(args.limit))
+        await timed(f"materialized dojo top {args.limit}", lambda: board.top(args.limit, f"dojo-{rng.randrange(args.dojos)}"))
+        await timed("my rank (global)", lambda: board.rank_of(f"user-{rng.randrange(args.players):07d}"))
+        await timed("record_xp", lambda: board.record_xp(f"user-{rng.randrange(args.players):07d}", rng.randrange(50000), 1, "Petit Scarabée"))
+    finally:
+        await client.drop_database(args.db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Benchmark - Login storm
+Measures the latency of an unrelated endpoint while a whole class logs in,
+with bcrypt run inline on the event loop vs. on the hashing pool.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login_storm [--logins 60] [--rounds 12]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import bcrypt
+import httpx
+from fastapi import FastAPI
+
+from services.hashing import hashing_pool, verify_password
+
+PASSWORD = "premium123"
+PROBE_INTERVAL = 0.005  # seconds between two /ping probes
+
+
+def build_app(hashed: str, use_pool: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login():
+        if use_pool:
+            ok = await verify_password(PASSWORD, hashed)
+        else:
+            ok = bcrypt.checkpw(PASSWORD.encode('utf-8'), hashed.encode('utf-8'))
+        return {"ok": ok}
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_storm(app: FastAPI, logins: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        storm_done = asyncio.Event()
+
+        async def probe():
+            # Probes are scheduled on a fixed grid; latency is measured from the
+            # scheduled time so that a blocked loop is not hidden by missed probes.
+            due = time.perf_counter()
+            while not storm_done.is_set():
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await http.get("/ping")
+                latencies.append((time.perf_counter() - due) * 1000)
+                due += PROBE_INTERVAL
+
+        async def storm():
+            await asyncio.gather(*(http.post("/login") for _ in range(logins)))
+            storm_done.set()
+
+        started = time.perf_counter()
+        await asyncio.gather(probe(), storm())
+        elapsed = time.perf_counter() - started
+
+    return {
+        "storm_seconds": round(elapsed, 2),
+        "probes": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=60, help="concurrent logins in the storm")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    args = parser.parse_args()
+
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=args.rounds)).decode('utf-8')
+
+    print(f"Login storm: {args.logins} logins, bcrypt cost {args.rounds}, {hashing_pool.max_workers} hashing workers")
+    for label, use_pool in (("inline", False), ("pool", True)):
+        result = await run_storm(build_app(hashed, use_pool), args.logins)
+        print(f"  {label:<7} /ping p50={result['p50_ms']}ms p99={result['p99_ms']}ms max={result['max_ms']}ms "
+              f"({result['probes']} probes, storm {result['storm_seconds']}s)")
+    print(f"  pool stats: {hashing_pool.stats()}")
+    hashing_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
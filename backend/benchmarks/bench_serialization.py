@@ -0,0 +1,114 @@
+"""
+Benchmark - JSON serialization
+Serialization time per endpoint payload, before (FastAPI's response_model
+validation + encoding, then json.dumps) and after (model_response /
+FastJSONResponse, and the /kyu-levels body rendered once per curriculum
+load). Synthetic payloads, no database needed; imports the models from
+server.py, so it needs the backend environment.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--members 1000] [--rounds 50]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from server import KyuLevel, Member
+from services.curriculum import Curriculum
+from services.serialization import FastJSONResponse, model_json
+
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+LOOP = asyncio.new_event_loop()
+
+
+def members(count: int) -> List[dict]:
+    return [{
+        "id": str(uuid.uuid4()),
+        "member_id": f"AR-{i:03d}",
+        "parent_first_name": f"Prénom {i}",
+        "parent_last_name": f"Nom {i}",
+        "email": f"adherent{i}@example.fr",
+        "phone": "0600000000",
+        "children": [{"id": str(uuid.uuid4()), "first_name": "Enfant", "last_name": f"Nom {i}", "status": "active"}],
+        "status": "active",
+        "reglement_accepted": True,
+        "created_at": NOW - timedelta(days=i),
+        "notes": "Adhérent depuis la saison précédente, certificat médical fourni.",
+    } for i in range(count)]
+
+
+def kyu_levels(levels: int = 10, techniques: int = 30) -> List[dict]:
+    return [{
+        "id": str(uuid.uuid4()),
+        "name": f"{level} KYU",
+        "order": level,
+        "color": "#fbbf24",
+        "created_at": NOW,
+        "techniques": [{
+            "id": str(uuid.uuid4()),
+            "name": f"Technique {level}-{t}",
+            "description": "Immobilisation du coude, entrée omote puis ura, contrôle au sol.",
+            "key_points": ["Centrer le mouvement", "Garder le contact", "Finir en contrôle"],
+            "practice_count": t,
+            "last_practiced": NOW,
+            "created_at": NOW,
+        } for t in range(techniques)],
+    } for level in range(levels)]
+
+
+def leaderboard(count: int = 100) -> List[dict]:
+    return [{"rank": i + 1, "user_id": str(uuid.uuid4()), "first_name": f"Ninja {i}", "total_xp": 10000 - i,
+             "level": 7, "level_name": "Maître Ninja", "updated_at": NOW} for i in range(count)]
+
+
+def timed(job, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        job()
+    return (time.perf_counter() - started) * 1e3 / rounds
+
+
+def fastapi_path(model, docs):
+    """What FastAPI does for a route declaring response_model=`model`"""
+    field = create_response_field(name="bench", type_=model)
+    return lambda: JSONResponse(LOOP.run_until_complete(serialize_response(field=field, response_content=docs))).body
+
+
+def report(label: str, before: float, after: float):
+    print(f"  {label:<28} {before:>8.2f}ms -> {after:>8.2f}ms  (x{before / after:.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"Serialization per request, {args.rounds} rounds")
+    docs = members(args.members)
+    report(f"/members ({args.members})", timed(fastapi_path(List[Member], docs), args.rounds),
+           timed(lambda: model_json(List[Member], docs), args.rounds))
+
+    levels = kyu_levels()
+    curriculum = Curriculum(levels)
+    report("/kyu-levels", timed(fastapi_path(List[KyuLevel], levels), args.rounds),
+           timed(lambda: model_json(List[KyuLevel], levels), args.rounds))
+    report("/kyu-levels (cached body)", timed(fastapi_path(List[KyuLevel], levels), args.rounds),
+           timed(lambda: curriculum.rendered("kyu_levels", lambda: model_json(List[KyuLevel], levels)), args.rounds))
+
+    entries = leaderboard()
+    report("/gamification/leaderboard", timed(lambda: JSONResponse(jsonable_encoder(entries)).body, args.rounds),
+           timed(lambda: FastJSONResponse(entries).body, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
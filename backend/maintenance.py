@@ -0,0 +1,156 @@
+"""
+Commandes de maintenance de la base (à lancer depuis backend/)
+Utilise sa propre connexion MongoDB (MONGO_URL / DB_NAME du .env).
+
+Usage:
+    python maintenance.py rebuild-leaderboard
+    python maintenance.py backfill-progression-stats [--all]
+    python maintenance.py migrate-journal
+    python maintenance.py migrate-virtue-actions
+    python maintenance.py rebuild-virtue-totals
+    python maintenance.py migrate-challenge-completions
+    python maintenance.py seed-xp-ledger
+    python maintenance.py compact-xp-ledger [--older-than-hours 24] [--workers 4]
+    python maintenance.py rebuild-xp-stats [--workers 8]
+    python maintenance.py reset-streaks
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.indexes import INDEX_REGISTRY, ensure_indexes
+from services.leaderboard import Leaderboard
+from services.progression import stats_expression
+from services.journal import JournalStore
+from services.virtues import VirtueLog
+from services.challenges import ChallengeLog
+from services.xp_ledger import XpLedger
+from services.streaks import StreakMaintenance
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("maintenance")
+
+
+async def rebuild_leaderboard(db, args) -> dict:
+    """Reconstruit le classement matérialisé depuis gamification_stats"""
+    # $merge on user_id needs the unique index
+    await ensure_indexes(db, {"leaderboard": INDEX_REGISTRY["leaderboard"]})
+    return await Leaderboard(db).rebuild()
+
+
+async def backfill_progression_stats(db, args) -> dict:
+    """Calcule progression_stats pour les utilisateurs qui n'en ont pas (ou pour tous avec --all)"""
+    query = {} if args.all else {"progression_stats": {"$exists": False}}
+    result = await db.users.update_many(query, [{"$set": {"progression_stats": stats_expression()}}])
+    return {"matched": result.matched_count, "modified": result.modified_count}
+
+
+async def migrate_journal(db, args) -> dict:
+    """Déplace les journaux encore embarqués dans users vers journal_entries"""
+    # Migrated entries are upserted by id
+    await ensure_indexes(db, {"journal_entries": INDEX_REGISTRY["journal_entries"]})
+    return await JournalStore(db).migrate_all()
+
+
+async def migrate_virtue_actions(db, args) -> dict:
+    """Déplace les actions de vertu encore embarquées dans users vers virtue_actions"""
+    # Migrated actions are upserted on the unique monthly key
+    await ensure_indexes(db, {name: INDEX_REGISTRY[name] for name in ("virtue_actions", "virtue_totals")})
+    return await VirtueLog(db).migrate_all()
+
+
+async def rebuild_virtue_totals(db, args) -> dict:
+    """Recalcule virtue_totals depuis virtue_actions pour chaque utilisateur"""
+    await ensure_indexes(db, {"virtue_totals": INDEX_REGISTRY["virtue_totals"]})
+    return await VirtueLog(db).rebuild_all_totals()
+
+
+async def migrate_challenge_completions(db, args) -> dict:
+    """Déplace les défis complétés encore embarqués dans gamification_stats vers challenge_completions"""
+    # Migrated completions are upserted on the unique daily key
+    await ensure_indexes(db, {"challenge_completions": INDEX_REGISTRY["challenge_completions"]})
+    return await ChallengeLog(db).migrate_all()
+
+
+async def seed_xp_ledger(db, args) -> dict:
+    """Ouvre le ledger XP : un solde d'ouverture par stats existantes qui n'en ont pas"""
+    await ensure_indexes(db, {name: INDEX_REGISTRY[name] for name in ("xp_events", "xp_snapshots")})
+    return await XpLedger(db).seed_opening_balances()
+
+
+async def compact_xp_ledger(db, args) -> dict:
+    """Regroupe les événements XP anciens en un point de reprise par utilisateur"""
+    await ensure_indexes(db, {name: INDEX_REGISTRY[name] for name in ("xp_events", "xp_snapshots")})
+    return await XpLedger(db).compact(timedelta(hours=args.older_than_hours), args.workers)
+
+
+async def rebuild_xp_stats(db, args) -> dict:
+    """
+    Recalcule gamification_stats (XP, niveau, série, compteurs) depuis le ledger, puis le classement.
+    Les remises à 0 de la tâche de nuit (reset-streaks) ne sont pas dans le ledger : les séries
+    interrompues sont remises à 0 avec la même date limite.
+    """
+    result = await XpLedger(db).rebuild_all(args.workers)
+    result["leaderboard"] = await Leaderboard(db).rebuild()
+    return result
+
+
+async def reset_streaks(db, args) -> dict:
+    """Remet à 0 les séries interrompues (même traitement que la tâche de nuit)"""
+    return await StreakMaintenance(db).reset_broken()
+
+
+# name -> (command, [(argument, options)])
+COMMANDS = {
+    "rebuild-leaderboard": (rebuild_leaderboard, []),
+    "backfill-progression-stats": (backfill_progression_stats, [
+        ("--all", {"action": "store_true", "help": "recompute every user, not only those without counters"}),
+    ]),
+    "migrate-journal": (migrate_journal, []),
+    "migrate-virtue-actions": (migrate_virtue_actions, []),
+    "rebuild-virtue-totals": (rebuild_virtue_totals, []),
+    "migrate-challenge-completions": (migrate_challenge_completions, []),
+    "seed-xp-ledger": (seed_xp_ledger, []),
+    "compact-xp-ledger": (compact_xp_ledger, [
+        ("--older-than-hours", {"type": float, "default": 24, "help": "only fold events older than this"}),
+        ("--workers", {"type": int, "default": 4, "help": "users compacted concurrently"}),
+    ]),
+    "rebuild-xp-stats": (rebuild_xp_stats, [
+        ("--workers", {"type": int, "default": 8, "help": "users rebuilt concurrently"}),
+    ]),
+    "reset-streaks": (reset_streaks, []),
+}
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (command, arguments) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=command.__doc__)
+        for argument, options in arguments:
+            subparser.add_argument(argument, **options)
+    args = parser.parse_args(argv)
+    command = COMMANDS[args.command][0]
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        result = await command(client[os.environ['DB_NAME']], args)
+        logger.info(f"{args.command}: {result}")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -3,7 +3,7 @@
 Routes pour accéder au programme FFAAA et gérer la progression utilisateur
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime, timezone
@@ -11,12 +11,12 @@ import os
 
 from models.passages_grades import (
     PROGRAMME_FFAAA,
-    get_programme_grade,
     get_all_grades,
     get_kyu_grades,
     get_dan_grades,
     count_techniques_by_category
 )
+from services.http_cache import STATIC_CACHE_CONTROL, StaticPayload, cached_response, static_for_build
 
 router = APIRouter(prefix="/grades", tags=["Passages de Grades"])
 
@@ -82,54 +82,30 @@ class UserProgressUpdate(BaseModel):
 # ROUTES - PROGRAMME FFAAA
 # ============================================================================
 
-@router.get("/programme", response_model=List[GradeResume])
-async def get_programme_complet(type: Optional[str] = Query(None, description="Filtrer par type: 'kyu', 'dan', ou tous si non spécifié")):
-    """
-    Récupère la liste des grades avec résumé.
-    - type=kyu : uniquement les grades Kyu (6e → 1er)
-    - type=dan : uniquement les grades Dan (Shodan → Yondan)
-    - sans filtre : tous les grades
-    """
-    if type == "kyu":
-        grades = get_kyu_grades()
-    elif type == "dan":
-        grades = get_dan_grades()
-    else:
-        grades = get_all_grades()
-    
-    result = []
-    dan_grades = ["shodan", "nidan", "sandan", "yondan"]
-    
-    for g in grades:
-        techniques = g.get("techniques", [])
-        mouvements = g.get("mouvements", [])
-        
-        result.append(GradeResume(
-            id=g["id"],
-            nom=g["nom"],
-            nom_japonais=g["nom_japonais"],
-            couleur_ceinture=g["couleur_ceinture"],
-            delai_minimum=g["delai_minimum"],
-            heures_minimum=g["heures_minimum"],
-            nb_techniques=len(techniques),
-            nb_mouvements=len(mouvements),
-            categories=count_techniques_by_category(g["id"]),
-            type_grade="dan" if g["id"] in dan_grades else "kyu"
-        ))
-    
-    return result
+DAN_GRADES = ["shodan", "nidan", "sandan", "yondan"]
 
 
-@router.get("/programme/{grade_id}", response_model=GradeComplet)
-async def get_grade_detail(grade_id: str):
-    """
-    Récupère le détail complet d'un grade avec toutes ses techniques et mouvements.
-    """
-    grade = get_programme_grade(grade_id)
-    
-    if not grade:
-        raise HTTPException(status_code=404, detail=f"Grade {grade_id} non trouvé")
-    
+def grade_resume(g: dict) -> GradeResume:
+    """Résumé d'un grade du programme"""
+    techniques = g.get("techniques", [])
+    mouvements = g.get("mouvements", [])
+
+    return GradeResume(
+        id=g["id"],
+        nom=g["nom"],
+        nom_japonais=g["nom_japonais"],
+        couleur_ceinture=g["couleur_ceinture"],
+        delai_minimum=g["delai_minimum"],
+        heures_minimum=g["heures_minimum"],
+        nb_techniques=len(techniques),
+        nb_mouvements=len(mouvements),
+        categories=count_techniques_by_category(g["id"]),
+        type_grade="dan" if g["id"] in DAN_GRADES else "kyu"
+    )
+
+
+def grade_complet(grade: dict) -> GradeComplet:
+    """Détail d'un grade, techniques groupées par catégorie et par attaque"""
     techniques = grade.get("techniques", [])
     mouvements = grade.get("mouvements", [])
     
@@ -175,7 +151,41 @@ async def get_grade_detail(grade_id: str):
     )
 
 
+# Le programme est statique : réponses construites et sérialisées une fois à l'import
+PROGRAMME_PAYLOADS = {
+    type_grade: StaticPayload([grade_resume(g) for g in grades])
+    for type_grade, grades in (("kyu", get_kyu_grades()), ("dan", get_dan_grades()), (None, get_all_grades()))
+}
+GRADE_PAYLOADS = {grade_id: StaticPayload(grade_complet(grade)) for grade_id, grade in PROGRAMME_FFAAA.items()}
+
+
+@router.get("/programme", response_model=List[GradeResume])
+async def get_programme_complet(request: Request, type: Optional[str] = Query(None, description="Filtrer par type: 'kyu', 'dan', ou tous si non spécifié")):
+    """
+    Récupère la liste des grades avec résumé.
+    - type=kyu : uniquement les grades Kyu (6e → 1er)
+    - type=dan : uniquement les grades Dan (Shodan → Yondan)
+    - sans filtre : tous les grades
+    """
+    payload = PROGRAMME_PAYLOADS.get(type, PROGRAMME_PAYLOADS[None])
+    return cached_response(request, payload, STATIC_CACHE_CONTROL)
+
+
+@router.get("/programme/{grade_id}", response_model=GradeComplet)
+async def get_grade_detail(request: Request, grade_id: str):
+    """
+    Récupère le détail complet d'un grade avec toutes ses techniques et mouvements.
+    """
+    payload = GRADE_PAYLOADS.get(grade_id)
+    
+    if not payload:
+        raise HTTPException(status_code=404, detail=f"Grade {grade_id} non trouvé")
+    
+    return cached_response(request, payload, STATIC_CACHE_CONTROL)
+
+
 @router.get("/categories")
+@static_for_build
 async def get_categories():
     """
     Retourne toutes les catégories de techniques avec leur description.
@@ -233,6 +243,7 @@ async def get_categories():
 
 
 @router.get("/attaques")
+@static_for_build
 async def get_attaques():
     """
     Retourne toutes les attaques avec leur traduction.
@@ -1,15 +1,15 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request, Query, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 import asyncio
 import resend
 import jwt
-import bcrypt
 import io
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
@@ -24,6 +24,72 @@ from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
+# Password hashing runs on a dedicated worker pool (bcrypt would block the event loop)
+from services.hashing import hash_password, verify_password, hashing_pool
+
+# Authenticated user documents are cached per process (see invalidate() calls in user write paths)
+from services.principal_cache import principal_cache
+
+# Role-aware JWT verification shared by every auth dependency
+from services.tokens import TokenVerifier
+
+# Declared MongoDB indexes, applied at startup and audited by /admin/indexes
+from services.indexes import ensure_indexes, audit_indexes
+
+# Short-lived caches of computed list payloads (cleared by the matching write paths)
+from services.snapshots import SnapshotCache, RollupSnapshot
+
+# /members-stats counters, one $facet aggregation per collection
+from services.member_stats import compute_members_stats
+
+# Batch loading of a family's children (and their stats) for the parent routes
+from services.family import load_children
+
+# Materialized leaderboard, updated on every XP change
+from services.leaderboard import Leaderboard
+
+# Cursor-based pagination for the member/user lists
+from services.pagination import fetch_page
+
+# Streamed NDJSON/CSV exports
+from services.exports import stream_export
+
+# Progression counters kept on the user document
+from services import progression as progression_counters
+
+# Private journal entries, in their own collection (embedded journals migrated on access)
+from services.journal import JournalStore
+
+# Virtue-action log with its monthly limit enforced by a unique index
+from services.virtues import VirtueLog, month_of, summarize_totals
+
+# Daily challenge completions with their once-per-day limit enforced by a unique index
+from services.challenges import ChallengeLog
+
+# Badge rules compiled once, indexed by the stat they depend on
+from services.badges import award_badges
+
+# Atomic XP gains (level recomputed in the same update)
+from services.xp import XpService
+
+# Append-only XP ledger, compacted into per-user checkpoints
+from services.xp_ledger import XpLedger
+
+# Nightly reset of broken streaks
+from services.streaks import StreakMaintenance
+
+# Reference-data routes served pre-serialized with ETag/304 for the current build
+from services.http_cache import static_for_build
+
+# gzip / brotli compression of large responses
+from services.compression import CompressionMiddleware
+
+# orjson default response class, single-validation responses for response_model routes
+from services.serialization import FastJSONResponse, model_json, model_response
+
+# kyu_levels loaded once per process, invalidated by the curriculum write routes
+from services.curriculum import CurriculumCache
+
 # Import email service
 from email_service import (
     send_password_reset_email,
@@ -42,6 +108,19 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
+leaderboard = Leaderboard(db)
+journal_store = JournalStore(db)
+virtue_log = VirtueLog(db)
+challenge_log = ChallengeLog(db)
+xp_ledger = XpLedger(db)
+# Ledger events older than XP_COMPACTION_AGE_HOURS are folded into checkpoints every XP_COMPACTION_INTERVAL_SECONDS
+XP_COMPACTION_INTERVAL_SECONDS = float(os.environ.get('XP_COMPACTION_INTERVAL_SECONDS', 6 * 3600))
+XP_COMPACTION_AGE_HOURS = float(os.environ.get('XP_COMPACTION_AGE_HOURS', 24))
+xp_service = XpService(db, leaderboard, xp_ledger)
+streak_maintenance = StreakMaintenance(db)
+# Time of the nightly streak reset (UTC)
+STREAK_JOB_HOUR_UTC = int(os.environ.get('STREAK_JOB_HOUR_UTC', 0))
+STREAK_JOB_MINUTE_UTC = int(os.environ.get('STREAK_JOB_MINUTE_UTC', 5))
 
 # Resend configuration
 resend.api_key = os.environ.get('RESEND_API_KEY', '')
@@ -51,6 +130,7 @@ SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
 JWT_SECRET = os.environ.get('JWT_SECRET', 'club-test-secret-key-2025')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 72
+token_verifier = TokenVerifier(JWT_SECRET, JWT_ALGORITHM)
 
 # Security
 security = HTTPBearer(auto_error=False)
@@ -59,7 +139,7 @@ security = HTTPBearer(auto_error=False)
 logger = logging.getLogger(__name__)
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -91,12 +171,6 @@ DEFAULT_DOJO = {
 # AUTHENTICATION HELPERS
 # ═══════════════════════════════════════════════════════════════════════════════════
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-
 def create_token(user_id: str, email: str) -> str:
     payload = {
         "user_id": user_id,
@@ -106,20 +180,18 @@ def create_token(user_id: str, email: str) -> str:
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def decode_token(token: str) -> dict:
-    try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expiré")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Token invalide")
+    return token_verifier.verify(token, "user")
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if not credentials:
         return None
     payload = decode_token(credentials.credentials)
-    user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
+    user = principal_cache.get(payload["user_id"])
+    if user is None:
+        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+        if not user:
+            raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
+        principal_cache.set(user["id"], user)
     return user
 
 async def require_auth(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -127,6 +199,39 @@ async def require_auth(credentials: HTTPAuthorizationCredentials = Depends(secur
         raise HTTPException(status_code=401, detail="Authentification requise")
     return await get_current_user(credentials)
 
+async def require_user_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Vérifie le token utilisateur et retourne son payload, sans charger le document"""
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Authentification requise")
+    return decode_token(credentials.credentials)
+
+def require_user_fields(*fields: str):
+    """
+    Dépendance d'authentification qui ne charge que les champs listés du document
+    utilisateur (plus "id"). Chaque route déclare ainsi les champs qu'elle lit ;
+    tests/test_route_user_fields.py vérifie que la déclaration est respectée.
+    """
+    user_fields = frozenset(("id",) + fields)
+    projection = {"_id": 0, **{field: 1 for field in user_fields}}
+    
+    async def dependency(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        if not credentials:
+            raise HTTPException(status_code=401, detail="Authentification requise")
+        payload = decode_token(credentials.credentials)
+        user = principal_cache.get(payload["user_id"], user_fields)
+        if user is None:
+            user = await db.users.find_one({"id": payload["user_id"]}, projection)
+            if not user:
+                raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
+            principal_cache.set(user["id"], user, user_fields)
+        return user
+    
+    dependency.user_fields = user_fields
+    return dependency
+
+# Routes qui n'ont besoin que de l'identifiant de l'utilisateur
+require_identity = require_user_fields()
+
 
 # ═══════════════════════════════════════════════════════════════════════════════════
 # EMAIL FUNCTIONS
@@ -322,24 +427,37 @@ class DojoLoginRequest(BaseModel):
 # DOJO ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════════════════════
 
+# Public dojo list (landing and registration pages), cleared on dojo writes and user (re)assignments
+dojo_list_cache = SnapshotCache("dojos", ttl=float(os.environ.get('DOJO_LIST_CACHE_TTL_SECONDS', 30)))
+
 @api_router.get("/dojos")
-async def get_all_dojos():
-    """Récupérer la liste de tous les dojos"""
-    dojos = await db.dojos.find({}, {"_id": 0, "admin_password": 0}).to_list(100)
-    
-    # Add default dojo if not exists
-    if not dojos:
-        # Create default dojo
-        await db.dojos.insert_one(DEFAULT_DOJO)
-        dojos = [DEFAULT_DOJO.copy()]
-        del dojos[0]["admin_password"]
-    
-    # Count members for each dojo
-    for dojo in dojos:
-        members_count = await db.users.count_documents({"dojo_id": dojo["id"]})
-        dojo["members_count"] = members_count
+async def get_all_dojos(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500)):
+    """Récupérer la liste des dojos (paginée, avec le nombre d'adhérents)"""
+    async def load():
+        total = await db.dojos.count_documents({})
+        
+        # Add default dojo if not exists
+        if not total:
+            await db.dojos.insert_one(DEFAULT_DOJO.copy())
+            total = 1
+        
+        dojos = await db.dojos.find(
+            {}, {"_id": 0, "admin_password": 0}
+        ).sort("_id", 1).skip(skip).limit(limit).to_list(limit)
+        
+        # Count members of the whole page in a single aggregation
+        members_counts = {}
+        async for row in db.users.aggregate([
+            {"$match": {"dojo_id": {"$in": [dojo["id"] for dojo in dojos]}}},
+            {"$group": {"_id": "$dojo_id", "count": {"$sum": 1}}}
+        ]):
+            members_counts[row["_id"]] = row["count"]
+        for dojo in dojos:
+            dojo["members_count"] = members_counts.get(dojo["id"], 0)
+        
+        return {"dojos": dojos, "total": total, "skip": skip, "limit": limit}
     
-    return {"dojos": dojos}
+    return await dojo_list_cache.get_or_load((skip, limit), load)
 
 @api_router.get("/dojos/{dojo_id}")
 async def get_dojo(dojo_id: str):
@@ -397,6 +515,7 @@ async def create_dojo(request: DojoCreateRequest):
     }
     
     await db.dojos.insert_one(new_dojo)
+    dojo_list_cache.clear()
     logger.info(f"New dojo created: {dojo.name} ({dojo_id})")
     
     # Create response dojo without MongoDB ObjectId and password
@@ -433,6 +552,8 @@ async def update_dojo(dojo_id: str, dojo: DojoUpdate, auth: SuperAdminAuth):
         raise HTTPException(status_code=400, detail="Aucune donnée à mettre à jour")
     
     await db.dojos.update_one({"id": dojo_id}, {"$set": update_data})
+    dojo_list_cache.clear()
+    clubs_rollup.invalidate()
     
     return {"success": True, "message": "Dojo mis à jour"}
 
@@ -454,8 +575,12 @@ async def delete_dojo(dojo_id: str, auth: SuperAdminAuth):
         {"dojo_id": dojo_id},
         {"$set": {"dojo_id": "club-test", "dojo_name": "Club test"}}
     )
+    principal_cache.clear()
+    await leaderboard.move_dojo(dojo_id, "club-test")
     
     await db.dojos.delete_one({"id": dojo_id})
+    dojo_list_cache.clear()
+    clubs_rollup.invalidate()
     logger.info(f"Dojo deleted: {dojo_id}")
     
     return {"success": True, "message": "Dojo supprimé, les membres ont été transférés au dojo par défaut"}
@@ -545,7 +670,7 @@ async def club_register(request: ClubRegisterRequest):
     admin_id = f"clubadmin_{uuid.uuid4().hex[:12]}"
     
     # Hash password
-    password_hash = bcrypt.hashpw(admin.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = await hash_password(admin.password)
     
     # Create dojo document
     new_dojo = {
@@ -575,6 +700,8 @@ async def club_register(request: ClubRegisterRequest):
     
     await db.dojos.insert_one(new_dojo)
     await db.club_admins.insert_one(new_admin)
+    dojo_list_cache.clear()
+    clubs_rollup.invalidate()
     
     logger.info(f"New club registered: {dojo.name} in {dojo.city}, admin: {admin.email}")
     
@@ -598,7 +725,7 @@ async def club_login(request: ClubLoginRequest):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
     # Verify password
-    if not bcrypt.checkpw(request.password.encode('utf-8'), admin["password_hash"].encode('utf-8')):
+    if not await verify_password(request.password, admin["password_hash"]):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
     # Get dojo info
@@ -664,14 +791,22 @@ class DojoMemberUpdate(BaseModel):
     progression_percentage: Optional[int] = None
 
 @api_router.get("/dojo-members")
-async def get_dojo_members(dojo_id: Optional[str] = None):
-    """Récupérer les adhérents d'un dojo"""
+async def get_dojo_members(
+    dojo_id: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    after: Optional[str] = None,
+    with_total: bool = False
+):
+    """Récupérer les adhérents d'un dojo (paginé : passer next_cursor dans `after`)"""
     query = {}
     if dojo_id:
         query["dojo_id"] = dojo_id
     
-    members = await db.dojo_members.find(query, {"_id": 0}).to_list(500)
-    return {"members": members}
+    members, next_cursor = await fetch_page(db.dojo_members, query, {"_id": 0}, [("id", 1)], limit, after)
+    result = {"members": members, "next_cursor": next_cursor}
+    if with_total:
+        result["total"] = await db.dojo_members.count_documents(query)
+    return result
 
 @api_router.post("/dojo-members")
 async def create_dojo_member(member: DojoMemberCreate):
@@ -783,7 +918,7 @@ async def create_enseignant(data: EnseignantCreate, dojo_password: str = None):
         "first_name": data.first_name,
         "last_name": data.last_name,
         "email": data.email,
-        "password_hash": hash_password(data.password),
+        "password_hash": await hash_password(data.password),
         "dojo_id": data.dojo_id,
         "dojo_name": dojo.get("name"),
         "is_active": True,
@@ -813,7 +948,7 @@ async def login_enseignant(data: EnseignantLogin):
     if not enseignant:
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
-    if not verify_password(data.password, enseignant["password_hash"]):
+    if not await verify_password(data.password, enseignant["password_hash"]):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
     if not enseignant.get("is_active", True):
@@ -858,15 +993,7 @@ async def require_enseignant_auth(credentials: HTTPAuthorizationCredentials = De
     if not credentials:
         raise HTTPException(status_code=401, detail="Token manquant")
     
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        if payload.get("role") != "enseignant":
-            raise HTTPException(status_code=403, detail="Accès réservé aux enseignants")
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expiré")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Token invalide")
+    return token_verifier.verify(credentials.credentials, "enseignant")
 
 
 # ═══════════════════════════════════════════════════════════════════════════════════
@@ -930,7 +1057,7 @@ async def send_message(data: MessageCreate, enseignant: dict = Depends(require_e
 
 
 @api_router.get("/messages/inbox")
-async def get_inbox(user: dict = Depends(require_auth)):
+async def get_inbox(user: dict = Depends(require_identity)):
     """Récupérer les messages reçus (pour un parent/utilisateur)"""
     messages = await db.messages.find(
         {"recipient_id": user["id"]},
@@ -952,7 +1079,7 @@ async def get_sent_messages(enseignant: dict = Depends(require_enseignant_auth))
 
 
 @api_router.patch("/messages/{message_id}/read")
-async def mark_message_read(message_id: str, user: dict = Depends(require_auth)):
+async def mark_message_read(message_id: str, user: dict = Depends(require_identity)):
     """Marquer un message comme lu"""
     result = await db.messages.update_one(
         {"id": message_id, "recipient_id": user["id"]},
@@ -1028,7 +1155,7 @@ async def create_observation(data: ObservationCreate, enseignant: dict = Depends
 
 
 @api_router.get("/observations/student/{student_id}")
-async def get_student_observations(student_id: str, user: dict = Depends(require_auth)):
+async def get_student_observations(student_id: str, user: dict = Depends(require_user_fields("children"))):
     """Récupérer les observations d'un élève (visible par le parent et l'élève lui-même)"""
     # Vérifier que l'utilisateur a le droit de voir les observations
     # (soit c'est l'élève lui-même, soit c'est le parent)
@@ -1118,20 +1245,13 @@ async def require_parent_auth(authorization: str = Header(None)):
         raise HTTPException(status_code=401, detail="Token d'authentification requis")
     
     token = authorization.replace("Bearer ", "")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        if payload.get("role") != "parent":
-            raise HTTPException(status_code=403, detail="Accès réservé aux parents")
-        
-        parent = await db.parents.find_one({"id": payload["parent_id"]}, {"_id": 0, "password_hash": 0})
-        if not parent:
-            raise HTTPException(status_code=404, detail="Parent non trouvé")
-        
-        return parent
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expiré")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Token invalide")
+    payload = token_verifier.verify(token, "parent")
+    
+    parent = await db.parents.find_one({"id": payload["parent_id"]}, {"_id": 0, "password_hash": 0})
+    if not parent:
+        raise HTTPException(status_code=404, detail="Parent non trouvé")
+    
+    return parent
 
 @api_router.post("/parents/register")
 async def register_parent(data: ParentRegister):
@@ -1151,7 +1271,7 @@ async def register_parent(data: ParentRegister):
         "first_name": data.first_name,
         "last_name": data.last_name,
         "email": data.email.lower(),
-        "password_hash": hash_password(data.password),
+        "password_hash": await hash_password(data.password),
         "phone": data.phone,
         "children": [],  # Liste des IDs des enfants liés
         "is_active": True,
@@ -1183,7 +1303,7 @@ async def login_parent(data: ParentLogin):
     if not parent:
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
-    if not verify_password(data.password, parent["password_hash"]):
+    if not await verify_password(data.password, parent["password_hash"]):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
     if not parent.get("is_active", True):
@@ -1291,6 +1411,7 @@ async def link_child_to_parent(data: LinkChildRequest, parent: dict = Depends(re
         {"id": child_id},
         {"$set": {"parent_id": parent["id"]}}
     )
+    principal_cache.invalidate(child_id)
     
     logger.info(f"Enfant {child['first_name']} {child['last_name']} lié au parent {parent['first_name']} {parent['last_name']}")
     
@@ -1324,6 +1445,7 @@ async def unlink_child_from_parent(child_id: str, parent: dict = Depends(require
         {"id": child_id},
         {"$unset": {"parent_id": ""}}
     )
+    principal_cache.invalidate(child_id)
     
     return {"success": True, "message": "Enfant retiré de votre compte"}
 
@@ -1353,16 +1475,17 @@ async def get_parent_observations(parent: dict = Depends(require_parent_auth)):
     if not children_ids:
         return {"observations": [], "children_data": {}}
     
-    # Récupérer les observations de tous les enfants
-    observations = await db.observations.find(
-        {"student_id": {"$in": children_ids}},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(200)
+    # Récupérer les observations et les informations de tous les enfants en parallèle
+    observations, children = await asyncio.gather(
+        db.observations.find(
+            {"student_id": {"$in": children_ids}},
+            {"_id": 0}
+        ).sort("created_at", -1).to_list(200),
+        load_children(db, children_ids, ["first_name", "last_name", "belt_level"])
+    )
     
-    # Récupérer les informations des enfants
     children_data = {}
-    for child_id in children_ids:
-        child = await db.users.find_one({"id": child_id}, {"_id": 0, "password_hash": 0})
+    for child_id, child, _ in children:
         if child:
             children_data[child_id] = {
                 "first_name": child.get("first_name", ""),
@@ -1446,6 +1569,9 @@ async def assign_user_to_dojo(dojo_id: str, user_id: str, auth: SuperAdminAuth):
         {"id": user_id},
         {"$set": {"dojo_id": dojo_id, "dojo_name": dojo["name"]}}
     )
+    principal_cache.invalidate(user_id)
+    dojo_list_cache.clear()
+    await leaderboard.move_player(user_id, dojo_id)
     
     return {"success": True, "message": f"Utilisateur assigné au dojo {dojo['name']}"}
 
@@ -1800,9 +1926,10 @@ async def register(data: UserRegister):
         "first_name": data.first_name,
         "last_name": data.last_name,
         "email": data.email.lower(),
-        "password_hash": hash_password(data.password),
+        "password_hash": await hash_password(data.password),
         "created_at": datetime.now(timezone.utc).isoformat(),
         "progression": {},  # Will store technique_id -> {mastery_level, practice_count, last_practiced}
+        "progression_stats": dict(progression_counters.EMPTY_STATS),
         "belt_level": "6e_kyu",  # Default: white belt (6e kyu)
         "belt_awarded_at": datetime.now(timezone.utc).isoformat(),
         "belt_awarded_by": "system",  # Initial belt is system-assigned
@@ -1813,6 +1940,7 @@ async def register(data: UserRegister):
     }
     
     await db.users.insert_one(user)
+    dojo_list_cache.clear()
     
     # Generate token
     token = create_token(user["id"], user["email"])
@@ -1838,7 +1966,7 @@ async def login(data: UserLogin):
     """Connexion utilisateur"""
     user = await db.users.find_one({"email": data.email.lower()}, {"_id": 0})
     
-    if not user or not verify_password(data.password, user["password_hash"]):
+    if not user or not await verify_password(data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
     token = create_token(user["id"], user["email"])
@@ -1858,7 +1986,9 @@ async def login(data: UserLogin):
     }
 
 @api_router.get("/auth/me")
-async def get_me(user: dict = Depends(require_auth)):
+async def get_me(user: dict = Depends(require_user_fields(
+    "first_name", "last_name", "email", "created_at", "subscription_status", "subscription_plan"
+))):
     """Récupérer les informations de l'utilisateur connecté"""
     return {
         "id": user["id"],
@@ -1956,7 +2086,7 @@ async def reset_password(data: ResetPasswordRequest):
         raise HTTPException(status_code=400, detail="Le mot de passe doit contenir au moins 6 caractères")
     
     # Hash new password
-    new_hash = hash_password(data.new_password)
+    new_hash = await hash_password(data.new_password)
     
     # Update password in the appropriate collection
     collection = reset_record["collection"]
@@ -1975,6 +2105,7 @@ async def reset_password(data: ResetPasswordRequest):
             {"email": reset_record["email"]},
             {"$set": {"password_hash": new_hash}}
         )
+        principal_cache.clear()
     
     # Delete used token
     await db.password_resets.delete_one({"token": data.token})
@@ -1998,53 +2129,58 @@ async def verify_reset_token(token: str):
 
 
 @api_router.get("/users")
-async def get_users(dojo_id: Optional[str] = None):
-    """Récupérer la liste des utilisateurs (pour les enseignants)"""
+async def get_users(
+    dojo_id: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    after: Optional[str] = None,
+    with_total: bool = False
+):
+    """Récupérer la liste des utilisateurs (pour les enseignants, paginée : passer next_cursor dans `after`)"""
     query = {}
     if dojo_id:
         query["dojo_id"] = dojo_id
     
-    users = await db.users.find(query, {"_id": 0, "password_hash": 0}).to_list(500)
-    return {"users": users}
+    users, next_cursor = await fetch_page(db.users, query, {"_id": 0, "password_hash": 0}, [("id", 1)], limit, after)
+    result = {"users": users, "next_cursor": next_cursor}
+    if with_total:
+        result["total"] = await db.users.count_documents(query)
+    return result
 
 
 @api_router.put("/auth/progression/{technique_id}")
-async def update_user_progression(technique_id: str, data: UserProgressionUpdate, user: dict = Depends(require_auth)):
+async def update_user_progression(technique_id: str, data: UserProgressionUpdate, user: dict = Depends(require_identity)):
     """Mettre à jour la progression d'un utilisateur pour une technique"""
-    progression_key = f"progression.{technique_id}"
-    
-    update_data = {
-        f"{progression_key}.mastery_level": data.mastery_level,
-        f"{progression_key}.last_updated": datetime.now(timezone.utc).isoformat()
-    }
-    
-    if data.practice_count is not None:
-        update_data[f"{progression_key}.practice_count"] = data.practice_count
-    
+    # Pipeline update: the entry and the progression_stats counters change atomically
     await db.users.update_one(
         {"id": user["id"]},
-        {"$set": update_data}
+        progression_counters.progression_update(
+            technique_id,
+            mastery_level=data.mastery_level,
+            practice_count=data.practice_count,
+            timestamps={"last_updated": datetime.now(timezone.utc).isoformat()}
+        )
     )
+    principal_cache.invalidate(user["id"])
     
     return {"success": True}
 
 @api_router.post("/auth/progression/{technique_id}/practice")
-async def add_practice_session(technique_id: str, user: dict = Depends(require_auth)):
+async def add_practice_session(technique_id: str, user: dict = Depends(require_identity)):
     """Ajouter une session de pratique pour une technique"""
-    progression_key = f"progression.{technique_id}"
-    
     await db.users.update_one(
         {"id": user["id"]},
-        {
-            "$inc": {f"{progression_key}.practice_count": 1},
-            "$set": {f"{progression_key}.last_practiced": datetime.now(timezone.utc).isoformat()}
-        }
+        progression_counters.progression_update(
+            technique_id,
+            practice_increment=1,
+            timestamps={"last_practiced": datetime.now(timezone.utc).isoformat()}
+        )
     )
+    principal_cache.invalidate(user["id"])
     
     return {"success": True}
 
 @api_router.get("/auth/progression")
-async def get_user_progression(user: dict = Depends(require_auth)):
+async def get_user_progression(user: dict = Depends(require_user_fields("progression"))):
     """Récupérer la progression complète de l'utilisateur"""
     return user.get("progression", {})
 
@@ -2054,46 +2190,35 @@ async def get_user_progression(user: dict = Depends(require_auth)):
 # ═══════════════════════════════════════════════════════════════════════════════════
 
 @api_router.get("/virtues")
+@static_for_build
 async def get_virtue_actions():
     """Récupérer le référentiel des vertus et leurs actions"""
     return VIRTUE_ACTIONS
 
+async def ensure_virtue_actions_migrated(user_id: str):
+    """Chemin de compatibilité : déplace les actions de vertu encore embarquées dans le document utilisateur"""
+    if await virtue_log.ensure_migrated(user_id):
+        # The full-document principal cache may still hold the embedded log
+        principal_cache.invalidate(user_id)
+
 @api_router.get("/auth/virtue-actions")
-async def get_user_virtue_actions(user: dict = Depends(require_auth)):
-    """Récupérer les actions de vertu de l'utilisateur"""
-    virtue_actions = user.get("virtue_actions", [])
-    
-    # Calculate totals per virtue
-    virtue_totals = {}
-    for virtue_id in VIRTUE_ACTIONS.keys():
-        virtue_totals[virtue_id] = {
-            "individual_points": 0,
-            "collective_points": 0,
-            "total_points": 0,
-            "action_count": 0
-        }
-    
-    for action in virtue_actions:
-        vid = action.get("virtue_id")
-        if vid in virtue_totals:
-            points = action.get("points", 0)
-            if action.get("action_type") == "individual":
-                virtue_totals[vid]["individual_points"] += points
-            else:
-                virtue_totals[vid]["collective_points"] += points
-            virtue_totals[vid]["total_points"] += points
-            virtue_totals[vid]["action_count"] += 1
+async def get_user_virtue_actions(user: dict = Depends(require_identity)):
+    """Récupérer les actions de vertu du mois en cours et les totaux par vertu"""
+    await ensure_virtue_actions_migrated(user["id"])
+    month = month_of(datetime.now(timezone.utc))
+    actions, totals_doc = await asyncio.gather(
+        virtue_log.month_actions(user["id"], month),
+        virtue_log.totals_of(user["id"])
+    )
     
     return {
-        "actions": virtue_actions,
-        "totals": virtue_totals,
-        "total_pv": sum(v["individual_points"] for v in virtue_totals.values()),
-        "total_pc": sum(v["collective_points"] for v in virtue_totals.values()),
-        "total_points": sum(v["total_points"] for v in virtue_totals.values())
+        "actions": actions,
+        "month": month,
+        **summarize_totals(totals_doc, VIRTUE_ACTIONS.keys())
     }
 
 @api_router.post("/auth/virtue-actions")
-async def log_virtue_action(data: VirtueActionLog, user: dict = Depends(require_auth)):
+async def log_virtue_action(data: VirtueActionLog, user: dict = Depends(require_identity)):
     """Enregistrer une action de vertu pour l'utilisateur (max 1 fois par mois par action)"""
     # Validate virtue exists
     if data.virtue_id not in VIRTUE_ACTIONS:
@@ -2108,24 +2233,6 @@ async def log_virtue_action(data: VirtueActionLog, user: dict = Depends(require_
     if not action:
         raise HTTPException(status_code=400, detail=f"Action invalide: {data.action_id}")
     
-    # Check if action was already logged this month (limit: 1 per month per action)
-    now = datetime.now(timezone.utc)
-    current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    user_actions = user.get("virtue_actions", [])
-    for logged_action in user_actions:
-        if logged_action.get("action_id") == data.action_id:
-            logged_at_str = logged_action.get("logged_at", "")
-            try:
-                logged_at = datetime.fromisoformat(logged_at_str.replace('Z', '+00:00'))
-                if logged_at >= current_month_start:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Tu as déjà validé cette action ce mois-ci ! Reviens le mois prochain 🗓️"
-                    )
-            except (ValueError, TypeError):
-                continue
-    
     # Create action log entry
     action_entry = {
         "id": str(uuid.uuid4()),
@@ -2135,14 +2242,18 @@ async def log_virtue_action(data: VirtueActionLog, user: dict = Depends(require_
         "action_name": action["name"],
         "points": action["points"],
         "note": data.note,
-        "logged_at": now.isoformat()
+        "logged_at": datetime.now(timezone.utc).isoformat()
     }
     
-    # Update user's virtue actions
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$push": {"virtue_actions": action_entry}}
-    )
+    # Limit of 1 per month per action: the unique (user_id, month, action_id) index rejects the insert
+    await ensure_virtue_actions_migrated(user["id"])
+    try:
+        await virtue_log.log(user["id"], action_entry)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Tu as déjà validé cette action ce mois-ci ! Reviens le mois prochain 🗓️"
+        )
     
     logger.info(f"User {user['id']} logged virtue action: {data.virtue_id}/{data.action_id} (+{action['points']} pts)")
     
@@ -2158,12 +2269,13 @@ async def log_virtue_action(data: VirtueActionLog, user: dict = Depends(require_
 # ═══════════════════════════════════════════════════════════════════════════════════
 
 @api_router.get("/belts")
+@static_for_build
 async def get_belt_levels():
     """Récupérer le référentiel des ceintures Aïkido"""
     return AIKIDO_BELTS
 
 @api_router.get("/auth/belt")
-async def get_user_belt(user: dict = Depends(require_auth)):
+async def get_user_belt(user: dict = Depends(require_user_fields("belt_level", "belt_awarded_at", "belt_awarded_by"))):
     """Récupérer la ceinture actuelle de l'utilisateur"""
     belt_level = user.get("belt_level", "6e_kyu")
     belt_info = AIKIDO_BELTS.get(belt_level, AIKIDO_BELTS["6e_kyu"])
@@ -2197,6 +2309,7 @@ async def assign_belt(data: BeltAssignment):
             }
         }
     )
+    principal_cache.invalidate(data.user_id)
     
     belt_info = AIKIDO_BELTS[data.belt_level]
     logger.info(f"Belt {data.belt_level} assigned to user {data.user_id}")
@@ -2211,7 +2324,7 @@ class UserBeltUpdate(BaseModel):
     belt_level: str
 
 @api_router.put("/auth/belt")
-async def update_user_belt(data: UserBeltUpdate, user: dict = Depends(require_auth)):
+async def update_user_belt(data: UserBeltUpdate, user: dict = Depends(require_identity)):
     """Permet à l'utilisateur de mettre à jour sa propre ceinture (auto-déclaration)"""
     # Validate belt level exists
     if data.belt_level not in AIKIDO_BELTS:
@@ -2228,6 +2341,7 @@ async def update_user_belt(data: UserBeltUpdate, user: dict = Depends(require_au
             }
         }
     )
+    principal_cache.invalidate(user["id"])
     
     belt_info = AIKIDO_BELTS[data.belt_level]
     logger.info(f"User {user['id']} updated their belt to {data.belt_level}")
@@ -2248,7 +2362,7 @@ class SymbolicRoleActivation(BaseModel):
     activate: bool = True  # True to activate, False to deactivate
 
 @api_router.put("/auth/symbolic-role")
-async def toggle_symbolic_role(data: SymbolicRoleActivation, user: dict = Depends(require_auth)):
+async def toggle_symbolic_role(data: SymbolicRoleActivation, user: dict = Depends(require_user_fields("belt_level"))):
     """Activer ou désactiver le rôle symbolique de l'utilisateur"""
     belt_level = user.get("belt_level", "6e_kyu")
     belt_info = AIKIDO_BELTS.get(belt_level)
@@ -2280,6 +2394,7 @@ async def toggle_symbolic_role(data: SymbolicRoleActivation, user: dict = Depend
                 }
             }
         )
+        principal_cache.invalidate(user["id"])
         logger.info(f"User {user['id']} activated symbolic role: {symbolic_role['name']}")
         return {
             "success": True,
@@ -2291,6 +2406,7 @@ async def toggle_symbolic_role(data: SymbolicRoleActivation, user: dict = Depend
             {"id": user["id"]},
             {"$unset": {"active_symbolic_role": ""}}
         )
+        principal_cache.invalidate(user["id"])
         logger.info(f"User {user['id']} deactivated their symbolic role")
         return {
             "success": True,
@@ -2299,7 +2415,7 @@ async def toggle_symbolic_role(data: SymbolicRoleActivation, user: dict = Depend
         }
 
 @api_router.get("/auth/symbolic-role")
-async def get_user_symbolic_role(user: dict = Depends(require_auth)):
+async def get_user_symbolic_role(user: dict = Depends(require_user_fields("active_symbolic_role", "belt_level"))):
     """Récupérer le rôle symbolique actif de l'utilisateur"""
     active_role = user.get("active_symbolic_role")
     belt_level = user.get("belt_level", "6e_kyu")
@@ -2324,7 +2440,10 @@ class UserProfileUpdate(BaseModel):
     objective: Optional[str] = None
 
 @api_router.put("/auth/profile")
-async def update_user_profile(data: UserProfileUpdate, user: dict = Depends(require_auth)):
+async def update_user_profile(
+    data: UserProfileUpdate,
+    user: dict = Depends(require_user_fields("profile_avatar", "guardian_animal", "personal_objective"))
+):
     """Mettre à jour le profil utilisateur (avatar, animal gardien, objectif)"""
     update_data = {}
     
@@ -2341,6 +2460,7 @@ async def update_user_profile(data: UserProfileUpdate, user: dict = Depends(requ
             {"id": user["id"]},
             {"$set": update_data}
         )
+        principal_cache.invalidate(user["id"])
         logger.info(f"User {user['id']} updated profile: {list(update_data.keys())}")
     
     return {
@@ -2354,7 +2474,9 @@ async def update_user_profile(data: UserProfileUpdate, user: dict = Depends(requ
     }
 
 @api_router.get("/auth/profile")
-async def get_user_profile(user: dict = Depends(require_auth)):
+async def get_user_profile(user: dict = Depends(require_user_fields(
+    "profile_avatar", "guardian_animal", "personal_objective", "profile_updated_at"
+))):
     """Récupérer le profil utilisateur"""
     return {
         "avatar": user.get("profile_avatar"),
@@ -2369,7 +2491,10 @@ async def get_user_profile(user: dict = Depends(require_auth)):
 # ═══════════════════════════════════════════════════════════════════════════════════
 
 @api_router.get("/auth/timeline")
-async def get_user_timeline(user: dict = Depends(require_auth)):
+async def get_user_timeline(user: dict = Depends(require_user_fields(
+    "created_at", "belt_level", "belt_awarded_at", "active_symbolic_role",
+    "progression", "first_name", "last_name"
+))):
     """Récupérer le parcours chronologique de l'utilisateur"""
     events = []
     
@@ -2412,8 +2537,8 @@ async def get_user_timeline(user: dict = Depends(require_auth)):
         })
     
     # 4. Virtue actions logged
-    virtue_actions = user.get("virtue_actions", [])
-    for action in virtue_actions:
+    await ensure_virtue_actions_migrated(user["id"])
+    async for action in virtue_log.history(user["id"]):
         virtue_id = action.get("virtue_id", "")
         virtue_info = VIRTUE_ACTIONS.get(virtue_id, {})
         events.append({
@@ -2480,25 +2605,33 @@ class JournalEntryUpdate(BaseModel):
     mood: Optional[str] = None
     tags: Optional[List[str]] = None
 
+async def ensure_journal_migrated(user_id: str):
+    """Chemin de compatibilité : déplace le journal encore embarqué dans le document utilisateur"""
+    if await journal_store.ensure_migrated(user_id):
+        # The full-document principal cache may still hold the embedded journal
+        principal_cache.invalidate(user_id)
+
 @api_router.get("/auth/journal")
-async def get_journal_entries(user: dict = Depends(require_auth), limit: int = 50):
-    """Récupérer les entrées du journal de l'utilisateur"""
-    journal = user.get("journal", [])
-    
-    # Sort by date (most recent first)
-    sorted_journal = sorted(
-        journal, 
-        key=lambda x: x.get("created_at", ""), 
-        reverse=True
-    )[:limit]
+async def get_journal_entries(
+    user: dict = Depends(require_identity),
+    limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = None
+):
+    """Récupérer les entrées du journal de l'utilisateur (les plus récentes d'abord)"""
+    await ensure_journal_migrated(user["id"])
+    (entries, next_cursor), total = await asyncio.gather(
+        journal_store.page(user["id"], limit, after),
+        journal_store.count(user["id"])
+    )
     
     return {
-        "entries": sorted_journal,
-        "total_entries": len(journal)
+        "entries": entries,
+        "total_entries": total,
+        "next_cursor": next_cursor
     }
 
 @api_router.post("/auth/journal")
-async def create_journal_entry(data: JournalEntry, user: dict = Depends(require_auth)):
+async def create_journal_entry(data: JournalEntry, user: dict = Depends(require_identity)):
     """Créer une nouvelle entrée dans le journal"""
     entry = {
         "id": str(uuid.uuid4()),
@@ -2509,10 +2642,8 @@ async def create_journal_entry(data: JournalEntry, user: dict = Depends(require_
         "updated_at": None
     }
     
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$push": {"journal": entry}}
-    )
+    await ensure_journal_migrated(user["id"])
+    await journal_store.create(user["id"], dict(entry))
     
     logger.info(f"User {user['id']} created journal entry")
     
@@ -2523,28 +2654,20 @@ async def create_journal_entry(data: JournalEntry, user: dict = Depends(require_
     }
 
 @api_router.put("/auth/journal/{entry_id}")
-async def update_journal_entry(entry_id: str, data: JournalEntryUpdate, user: dict = Depends(require_auth)):
+async def update_journal_entry(entry_id: str, data: JournalEntryUpdate, user: dict = Depends(require_identity)):
     """Modifier une entrée du journal"""
-    journal = user.get("journal", [])
-    entry_index = next((i for i, e in enumerate(journal) if e.get("id") == entry_id), None)
-    
-    if entry_index is None:
-        raise HTTPException(status_code=404, detail="Entrée non trouvée")
-    
-    # Update the entry
     update_fields = {}
     if data.content is not None:
-        update_fields[f"journal.{entry_index}.content"] = data.content
+        update_fields["content"] = data.content
     if data.mood is not None:
-        update_fields[f"journal.{entry_index}.mood"] = data.mood
+        update_fields["mood"] = data.mood
     if data.tags is not None:
-        update_fields[f"journal.{entry_index}.tags"] = data.tags
-    update_fields[f"journal.{entry_index}.updated_at"] = datetime.now(timezone.utc).isoformat()
+        update_fields["tags"] = data.tags
+    update_fields["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$set": update_fields}
-    )
+    await ensure_journal_migrated(user["id"])
+    if not await journal_store.update(user["id"], entry_id, update_fields):
+        raise HTTPException(status_code=404, detail="Entrée non trouvée")
     
     return {
         "success": True,
@@ -2552,12 +2675,10 @@ async def update_journal_entry(entry_id: str, data: JournalEntryUpdate, user: di
     }
 
 @api_router.delete("/auth/journal/{entry_id}")
-async def delete_journal_entry(entry_id: str, user: dict = Depends(require_auth)):
+async def delete_journal_entry(entry_id: str, user: dict = Depends(require_identity)):
     """Supprimer une entrée du journal"""
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$pull": {"journal": {"id": entry_id}}}
-    )
+    await ensure_journal_migrated(user["id"])
+    await journal_store.delete(user["id"], entry_id)
     
     logger.info(f"User {user['id']} deleted journal entry {entry_id}")
     
@@ -2572,7 +2693,7 @@ async def delete_journal_entry(entry_id: str, user: dict = Depends(require_auth)
 # ═══════════════════════════════════════════════════════════════════════════════════
 
 @api_router.get("/auth/export-pdf/status")
-async def get_export_pdf_status(user: dict = Depends(require_auth)):
+async def get_export_pdf_status(user: dict = Depends(require_user_fields("last_pdf_export"))):
     """Vérifier si l'utilisateur peut exporter son PDF (limite 6 mois)"""
     last_export = user.get("last_pdf_export")
     
@@ -2615,7 +2736,10 @@ async def get_export_pdf_status(user: dict = Depends(require_auth)):
 
 
 @api_router.get("/auth/export-pdf")
-async def export_user_pdf(user: dict = Depends(require_auth)):
+async def export_user_pdf(user: dict = Depends(require_user_fields(
+    "last_pdf_export", "belt_level", "progression",
+    "active_symbolic_role", "created_at", "email", "first_name", "last_name"
+))):
     """Générer et télécharger le PDF du parcours utilisateur"""
     
     # Check if user can export (6 month limit)
@@ -2640,7 +2764,8 @@ async def export_user_pdf(user: dict = Depends(require_auth)):
     belt_level = user.get("belt_level", "6e_kyu")
     belt_info = AIKIDO_BELTS.get(belt_level, AIKIDO_BELTS["6e_kyu"])
     progression = user.get("progression", [])
-    virtue_actions = user.get("virtue_actions", [])
+    await ensure_virtue_actions_migrated(user["id"])
+    virtue_totals = summarize_totals(await virtue_log.totals_of(user["id"]), VIRTUE_ACTIONS.keys())
     active_role = user.get("active_symbolic_role")
     created_at = user.get("created_at", "")
     
@@ -2652,7 +2777,7 @@ async def export_user_pdf(user: dict = Depends(require_auth)):
     # Calculate points
     technique_points = learning_count * 1 + practiced_count * 2 + mastered_count * 3
     belt_points = (belt_info.get("order", 0) + 1) * 10
-    virtue_points = sum(a.get("points", 0) for a in virtue_actions)
+    virtue_points = virtue_totals["total_points"]
     total_points = technique_points + belt_points + virtue_points
     
     # Create PDF buffer
@@ -2763,21 +2888,16 @@ async def export_user_pdf(user: dict = Depends(require_auth)):
     
     # Virtues section
     story.append(Paragraph("🎌 Points de Vertu", section_style))
-    if virtue_actions:
-        virtue_summary = {}
-        for action in virtue_actions:
-            vid = action.get("virtue_id", "unknown")
-            if vid not in virtue_summary:
-                virtue_info = VIRTUE_ACTIONS.get(vid, {})
-                virtue_summary[vid] = {
-                    "name": virtue_info.get("name", vid),
-                    "emoji": virtue_info.get("emoji", "🎯"),
-                    "points": 0,
-                    "count": 0
-                }
-            virtue_summary[vid]["points"] += action.get("points", 0)
-            virtue_summary[vid]["count"] += 1
-        
+    virtue_summary = {
+        vid: {
+            "name": VIRTUE_ACTIONS[vid].get("name", vid),
+            "emoji": VIRTUE_ACTIONS[vid].get("emoji", "🎯"),
+            "points": totals["total_points"],
+            "count": totals["action_count"]
+        }
+        for vid, totals in virtue_totals["totals"].items() if totals["action_count"]
+    }
+    if virtue_summary:
         virtue_data = [["Vertu", "Actions", "Points"]]
         for vid, data in virtue_summary.items():
             virtue_data.append([f"{data['emoji']} {data['name']}", str(data['count']), f"+{data['points']} pts"])
@@ -2846,6 +2966,7 @@ async def export_user_pdf(user: dict = Depends(require_auth)):
         {"id": user["id"]},
         {"$set": {"last_pdf_export": datetime.now(timezone.utc).isoformat()}}
     )
+    principal_cache.invalidate(user["id"])
     
     logger.info(f"User {user['id']} exported their PDF")
     
@@ -2860,14 +2981,37 @@ async def export_user_pdf(user: dict = Depends(require_auth)):
 
 
 @api_router.get("/visitors")
-async def get_visitors(dojo_id: Optional[str] = None):
-    """Récupérer la liste des utilisateurs inscrits (visiteurs) avec stats de progression"""
+async def get_visitors(
+    response: Response,
+    dojo_id: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    with_total: bool = False
+):
+    """
+    Récupérer la liste des utilisateurs inscrits (visiteurs) avec stats de progression.
+    Paginée : la page suivante s'obtient en passant l'en-tête X-Next-Cursor dans `after`.
+    """
     # Build query - filter by dojo if specified
     query = {}
     if dojo_id:
         query["dojo_id"] = dojo_id
     
-    users = await db.users.find(query, {"_id": 0, "password_hash": 0}).to_list(1000)
+    # The progression dict stays in the database: its counters are kept in progression_stats
+    users, next_cursor = await fetch_page(
+        db.users, query, {"_id": 0, "password_hash": 0, "progression": 0}, [("id", 1)], limit, after
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if with_total:
+        response.headers["X-Total-Count"] = str(await db.users.count_documents(query))
+    
+    # Users not yet backfilled: compute their counters from progression, in one batch
+    missing_stats = [user["id"] for user in users if "progression_stats" not in user]
+    legacy_stats = {}
+    if missing_stats:
+        async for doc in db.users.find({"id": {"$in": missing_stats}}, {"_id": 0, "id": 1, "progression": 1}):
+            legacy_stats[doc["id"]] = progression_counters.summarize(doc.get("progression"))
     
     # Add belt info and progression stats to each user
     for user in users:
@@ -2879,15 +3023,11 @@ async def get_visitors(dojo_id: Optional[str] = None):
             user["dojo_id"] = "club-test"
             user["dojo_name"] = "Club test"
         
-        # Calculate progression stats
-        progression = user.get("progression", {})
-        user["techniques_mastered"] = sum(1 for p in progression.values() if p.get("mastery_level") == "mastered")
-        user["techniques_in_progress"] = sum(1 for p in progression.values() if p.get("mastery_level") in ["learning", "practiced"])
-        user["total_sessions"] = sum(p.get("practice_count", 0) for p in progression.values())
-        
-        # Remove progression dict from response (too heavy)
-        if "progression" in user:
-            del user["progression"]
+        # Progression stats
+        stats = user.pop("progression_stats", None) or legacy_stats.get(user["id"], progression_counters.EMPTY_STATS)
+        user["techniques_mastered"] = stats["techniques_mastered"]
+        user["techniques_in_progress"] = stats["techniques_in_progress"]
+        user["total_sessions"] = stats["total_sessions"]
     
     return users
 
@@ -3080,14 +3220,19 @@ async def get_status_checks():
     return status_checks
 
 
+curriculum_cache = CurriculumCache(db, prepare=deserialize_doc)
+# Also follow kyu_levels writes from other processes (needs a replica set)
+CURRICULUM_CHANGE_STREAM = os.environ.get('CURRICULUM_CHANGE_STREAM', '0') == '1'
+
+
 # Kyu Level Routes
 @api_router.get("/kyu-levels", response_model=List[KyuLevel])
 async def get_kyu_levels():
     """Get all kyu levels with their techniques, sorted by order"""
-    kyu_levels = await db.kyu_levels.find({}, {"_id": 0}).sort("order", -1).to_list(100)
-    for kyu in kyu_levels:
-        deserialize_doc(kyu)
-    return kyu_levels
+    curriculum = await curriculum_cache.get()
+    # Validated and serialized once per curriculum load
+    body = curriculum.rendered("kyu_levels", lambda: model_json(List[KyuLevel], curriculum.by_order))
+    return Response(body, media_type="application/json")
 
 @api_router.post("/kyu-levels", response_model=KyuLevel)
 async def create_kyu_level(input: KyuLevelCreate):
@@ -3096,16 +3241,17 @@ async def create_kyu_level(input: KyuLevelCreate):
     doc = kyu_obj.model_dump()
     serialize_doc(doc)
     await db.kyu_levels.insert_one(doc)
+    curriculum_cache.invalidate()
     return kyu_obj
 
 @api_router.get("/kyu-levels/{kyu_id}", response_model=KyuLevel)
 async def get_kyu_level(kyu_id: str):
     """Get a specific kyu level"""
-    kyu = await db.kyu_levels.find_one({"id": kyu_id}, {"_id": 0})
+    curriculum = await curriculum_cache.get()
+    kyu = curriculum.by_id.get(kyu_id)
     if not kyu:
         raise HTTPException(status_code=404, detail="Kyu level not found")
-    deserialize_doc(kyu)
-    return kyu
+    return model_response(KyuLevel, kyu)
 
 @api_router.put("/kyu-levels/{kyu_id}", response_model=KyuLevel)
 async def update_kyu_level(kyu_id: str, input: KyuLevelUpdate):
@@ -3117,6 +3263,7 @@ async def update_kyu_level(kyu_id: str, input: KyuLevelUpdate):
     result = await db.kyu_levels.update_one({"id": kyu_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Kyu level not found")
+    curriculum_cache.invalidate()
     
     kyu = await db.kyu_levels.find_one({"id": kyu_id}, {"_id": 0})
     deserialize_doc(kyu)
@@ -3128,6 +3275,7 @@ async def delete_kyu_level(kyu_id: str):
     result = await db.kyu_levels.delete_one({"id": kyu_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Kyu level not found")
+    curriculum_cache.invalidate()
     return {"message": "Kyu level deleted successfully"}
 
 
@@ -3147,6 +3295,7 @@ async def add_technique(kyu_id: str, input: TechniqueCreate):
         {"id": kyu_id},
         {"$push": {"techniques": tech_doc}}
     )
+    curriculum_cache.invalidate()
     return technique
 
 @api_router.put("/kyu-levels/{kyu_id}/techniques/{technique_id}", response_model=Technique)
@@ -3166,6 +3315,7 @@ async def update_technique(kyu_id: str, technique_id: str, input: TechniqueUpdat
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Technique not found")
+    curriculum_cache.invalidate()
     
     # Fetch updated technique
     kyu = await db.kyu_levels.find_one({"id": kyu_id}, {"_id": 0})
@@ -3185,6 +3335,7 @@ async def delete_technique(kyu_id: str, technique_id: str):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Kyu level not found")
+    curriculum_cache.invalidate()
     return {"message": "Technique deleted successfully"}
 
 
@@ -3204,6 +3355,7 @@ async def record_practice(kyu_id: str, technique_id: str):
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Technique not found")
+    curriculum_cache.invalidate()
     
     # Fetch updated technique
     kyu = await db.kyu_levels.find_one({"id": kyu_id}, {"_id": 0})
@@ -3219,25 +3371,20 @@ async def record_practice(kyu_id: str, technique_id: str):
 @api_router.get("/statistics")
 async def get_statistics():
     """Get overall statistics - returns zero progression for non-authenticated requests"""
-    kyu_levels = await db.kyu_levels.find({}, {"_id": 0}).to_list(100)
-    
-    total_techniques = 0
-    techniques_by_level = []
+    curriculum = await curriculum_cache.get()
+    total_techniques = curriculum.total_techniques
     
-    for kyu in kyu_levels:
-        kyu_total = len(kyu.get('techniques', []))
-        total_techniques += kyu_total
-        
-        techniques_by_level.append({
-            "name": kyu.get('name'),
-            "color": kyu.get('color'),
-            "total": kyu_total,
+    techniques_by_level = [
+        {
+            **level,
             "mastered": 0,
             "in_progress": 0,
-            "not_started": kyu_total,
+            "not_started": level["total"],
             "practice_sessions": 0,
             "progress_percentage": 0
-        })
+        }
+        for level in curriculum.techniques_by_level
+    ]
     
     # Return zero progression for non-authenticated users
     return {
@@ -3253,29 +3400,11 @@ async def get_statistics():
 @api_router.get("/public-stats")
 async def get_public_stats():
     """Get public statistics for landing page - total techniques, grades count, challenges"""
-    kyu_levels = await db.kyu_levels.find({}, {"_id": 0}).to_list(100)
-    
-    total_techniques = 0
+    curriculum = await curriculum_cache.get()
     
-    # Count Kyu and Dan separately (exclude weapon categories like BOKKEN, JO, TANTO)
-    kyu_count = 0
-    dan_count = 0
-    weapon_categories = ['bokken', 'jo', 'tanto', 'aïkiken', 'aikiken', 'aïkijo', 'aikijo']
-    
-    for kyu in kyu_levels:
-        kyu_total = len(kyu.get('techniques', []))
-        total_techniques += kyu_total
-        
-        name = kyu.get('name', '').lower()
-        
-        # Skip weapon categories - they are not grades
-        if any(weapon in name for weapon in weapon_categories):
-            continue
-            
-        if 'dan' in name or 'shodan' in name or 'nidan' in name or 'sandan' in name or 'yondan' in name:
-            dan_count += 1
-        elif 'kyu' in name:
-            kyu_count += 1
+    # Kyu and Dan counted at load time (weapon categories like BOKKEN, JO, TANTO are not grades)
+    kyu_count = curriculum.kyu_count
+    dan_count = curriculum.dan_count
     
     # Number of challenges (7 virtues x 5 daily + 3 weekly each = ~56 + badges)
     total_challenges = 84  # Based on virtuesGamification.js count
@@ -3284,7 +3413,7 @@ async def get_public_stats():
     total_grades = kyu_count + dan_count
     
     return {
-        "total_techniques": total_techniques,
+        "total_techniques": curriculum.total_techniques,
         "total_grades": total_grades,
         "kyu_count": kyu_count,
         "dan_count": dan_count,
@@ -3298,12 +3427,23 @@ async def get_public_stats():
 # ═══════════════════════════════════════════════════════════════════════════════════
 
 @api_router.get("/members", response_model=List[Member])
-async def get_members():
-    """Get all members"""
-    members = await db.members.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+async def get_members(
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    with_total: bool = False
+):
+    """Get members, newest first (paginated: pass the X-Next-Cursor header as `after`)"""
+    members, next_cursor = await fetch_page(
+        db.members, {}, {"_id": 0}, [("created_at", -1), ("id", -1)], limit, after
+    )
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if with_total:
+        headers["X-Total-Count"] = str(await db.members.count_documents({}))
     for member in members:
         deserialize_doc(member)
-    return members
+    return model_response(List[Member], members, headers=headers)
 
 @api_router.get("/members/{member_id}", response_model=Member)
 async def get_member(member_id: str):
@@ -3312,7 +3452,7 @@ async def get_member(member_id: str):
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
     deserialize_doc(member)
-    return member
+    return model_response(Member, member)
 
 @api_router.post("/members", response_model=Member)
 async def create_member(input: MemberCreate):
@@ -3461,51 +3601,18 @@ async def validate_member(member_id: str, club_signature: str = None):
     deserialize_doc(member)
     return Member(**member)
 
+# Admin dashboard counters, served stale while a recount runs in the background
+members_stats_rollup = RollupSnapshot(
+    "members_stats",
+    lambda: compute_members_stats(db),
+    refresh_interval=float(os.environ.get('MEMBERS_STATS_REFRESH_SECONDS', 60))
+)
+
 @api_router.get("/members-stats")
 async def get_members_stats():
     """Get members statistics - combines users and dojos data"""
     try:
-        # Count users from users collection
-        total_users = await db.users.count_documents({})
-        active_users = await db.users.count_documents({"is_active": True})
-        inactive_users = await db.users.count_documents({"is_active": False})
-        
-        # Count users with active subscriptions
-        active_subscriptions = await db.users.count_documents({
-            "subscription_status": {"$in": ["active", "trialing"]}
-        })
-        
-        # Count dojos
-        total_dojos = await db.dojos.count_documents({})
-        active_dojos = await db.dojos.count_documents({"is_active": True})
-        
-        # Count children (users with role 'enfant' or parent_id set)
-        total_children = await db.users.count_documents({
-            "$or": [
-                {"role": "enfant"},
-                {"parent_id": {"$exists": True, "$ne": None}}
-            ]
-        })
-        
-        # Count adult members
-        adult_members = total_users - total_children
-        
-        # Also check legacy members collection
-        legacy_total = await db.members.count_documents({})
-        legacy_active = await db.members.count_documents({"status": "active"})
-        
-        return {
-            "total_members": total_users + legacy_total,
-            "totalUsers": total_users,
-            "totalDojos": total_dojos,
-            "activeDojos": active_dojos,
-            "activeSubscriptions": active_subscriptions,
-            "pending": 0,
-            "active": active_users + legacy_active,
-            "inactive": inactive_users,
-            "total_children": total_children,
-            "adult_members": adult_members
-        }
+        return await members_stats_rollup.get()
     except Exception as e:
         logger.error(f"Error getting members stats: {e}")
         return {
@@ -3536,6 +3643,7 @@ async def get_visitors_stats():
 async def reseed_data():
     """Clear all data and reseed - Use for complete data refresh"""
     await db.kyu_levels.delete_many({})
+    curriculum_cache.invalidate()
     return await seed_data()
 
 
@@ -4548,6 +4656,7 @@ async def seed_data():
         serialize_doc(doc)
         await db.kyu_levels.insert_one(doc)
     
+    curriculum_cache.invalidate()
     return {"message": "Data seeded successfully", "count": len(initial_data)}
 
 
@@ -4694,6 +4803,7 @@ class DojoRegistrationRequest(BaseModel):
     password: str
 
 @api_router.get("/subscription-plans")
+@static_for_build
 async def get_subscription_plans():
     """Récupérer les plans d'abonnement disponibles"""
     # Return plans organized by category
@@ -4707,7 +4817,7 @@ async def get_subscription_plans():
     }
 
 @api_router.post("/subscriptions/checkout")
-async def create_subscription_checkout(data: SubscriptionCheckoutRequest, user: dict = Depends(require_auth)):
+async def create_subscription_checkout(data: SubscriptionCheckoutRequest, user: dict = Depends(require_user_fields("email"))):
     """Créer une session de checkout pour un abonnement"""
     
     if data.plan_id not in SUBSCRIPTION_PLANS:
@@ -4766,6 +4876,7 @@ async def create_subscription_checkout(data: SubscriptionCheckoutRequest, user:
             "trial_end": trial_end.isoformat()
         }}
     )
+    principal_cache.invalidate(user["id"])
     
     logger.info(f"User {user['id']} started trial for plan {data.plan_id}")
     
@@ -4828,7 +4939,7 @@ async def request_quote(data: QuoteRequest):
     }
 
 @api_router.post("/subscriptions/checkout-with-card")
-async def create_subscription_checkout_with_card(data: SubscriptionCheckoutWithCardRequest, user: dict = Depends(require_auth)):
+async def create_subscription_checkout_with_card(data: SubscriptionCheckoutWithCardRequest, user: dict = Depends(require_user_fields("email"))):
     """Créer une session de checkout Stripe avec carte bancaire pour un abonnement"""
     
     if data.plan_id not in SUBSCRIPTION_PLANS:
@@ -4950,7 +5061,7 @@ async def create_subscription_checkout_with_card(data: SubscriptionCheckoutWithC
         raise HTTPException(status_code=500, detail=f"Erreur Stripe: {str(e)}")
 
 @api_router.post("/subscriptions/add-payment-method")
-async def add_payment_method(data: SubscriptionCheckoutRequest, user: dict = Depends(require_auth)):
+async def add_payment_method(data: SubscriptionCheckoutRequest, user: dict = Depends(require_user_fields("email"))):
     """Ajouter une méthode de paiement à la fin de l'essai"""
     
     if data.plan_id not in SUBSCRIPTION_PLANS:
@@ -5008,7 +5119,7 @@ async def add_payment_method(data: SubscriptionCheckoutRequest, user: dict = Dep
     }
 
 @api_router.get("/subscriptions/status/{session_id}")
-async def get_subscription_status(session_id: str, user: dict = Depends(require_auth)):
+async def get_subscription_status(session_id: str, user: dict = Depends(require_identity)):
     """Vérifier le statut d'un paiement d'abonnement"""
     
     stripe_api_key = os.environ.get("STRIPE_API_KEY")
@@ -5047,6 +5158,7 @@ async def get_subscription_status(session_id: str, user: dict = Depends(require_
                 {"id": transaction["user_id"]},
                 {"$set": {"subscription_status": "active"}}
             )
+            principal_cache.invalidate(transaction["user_id"])
     
     return {
         "status": status.status,
@@ -5054,7 +5166,7 @@ async def get_subscription_status(session_id: str, user: dict = Depends(require_
     }
 
 @api_router.get("/auth/subscription")
-async def get_user_subscription(user: dict = Depends(require_auth)):
+async def get_user_subscription(user: dict = Depends(require_identity)):
     """Récupérer l'abonnement de l'utilisateur"""
     
     subscription = await db.subscriptions.find_one(
@@ -5078,6 +5190,7 @@ async def get_user_subscription(user: dict = Depends(require_auth)):
                 {"id": user["id"]},
                 {"$set": {"subscription_status": "trial_expired"}}
             )
+            principal_cache.invalidate(user["id"])
             subscription["status"] = "trial_expired"
     
     return {
@@ -5116,7 +5229,7 @@ async def register_dojo(data: DojoRegistrationRequest):
         "address": data.dojo_address or "",
         "city": data.dojo_city,
         "phone": data.dojo_phone or "",
-        "admin_password": hash_password(str(uuid.uuid4())[:12]),  # Random password, admin uses personal login
+        "admin_password": await hash_password(str(uuid.uuid4())[:12]),  # Random password, admin uses personal login
         "is_default": False,
         "created_at": datetime.now(timezone.utc).isoformat(),
         "subscription_plan": "dojo",
@@ -5132,9 +5245,10 @@ async def register_dojo(data: DojoRegistrationRequest):
         "first_name": data.first_name,
         "last_name": data.last_name,
         "email": data.email.lower(),
-        "password_hash": hash_password(data.password),
+        "password_hash": await hash_password(data.password),
         "created_at": datetime.now(timezone.utc).isoformat(),
         "progression": {},
+        "progression_stats": dict(progression_counters.EMPTY_STATS),
         "belt_level": "6e_kyu",
         "belt_awarded_at": datetime.now(timezone.utc).isoformat(),
         "belt_awarded_by": "system",
@@ -5147,6 +5261,7 @@ async def register_dojo(data: DojoRegistrationRequest):
     }
     
     await db.users.insert_one(user)
+    dojo_list_cache.clear()
     
     # Create subscription
     subscription = {
@@ -5319,8 +5434,7 @@ class UserGamificationStats(BaseModel):
     streak_days: int = 0
     last_activity_date: Optional[str] = None
     badges: List[dict] = []
-    completed_challenges: List[dict] = []
-    pending_validations: List[dict] = []
+    challenges_completed: int = 0
     attendance_count: int = 0
     techniques_validated: int = 0
 
@@ -5335,38 +5449,18 @@ class AttendanceRecord(BaseModel):
     date: str  # YYYY-MM-DD
     attended: bool = True
 
-# XP par niveau
-LEVEL_THRESHOLDS = [
-    {"level": 1, "name": "Petit Scarabée", "xp": 0},
-    {"level": 2, "name": "Jeune Poussin", "xp": 200},
-    {"level": 3, "name": "Apprenti Ninja", "xp": 500},
-    {"level": 4, "name": "Ninja Agile", "xp": 1000},
-    {"level": 5, "name": "Ninja Rapide", "xp": 2000},
-    {"level": 6, "name": "Super Ninja", "xp": 4000},
-    {"level": 7, "name": "Maître Ninja", "xp": 8000},
-    {"level": 8, "name": "Grand Maître", "xp": 15000},
-    {"level": 9, "name": "Légende Ninja", "xp": 30000},
-    {"level": 10, "name": "Dragon Suprême", "xp": 50000},
-]
-
-def get_level_from_xp(total_xp: int) -> dict:
-    """Calculate level and level name from total XP"""
-    current_level = LEVEL_THRESHOLDS[0]
-    for threshold in LEVEL_THRESHOLDS:
-        if total_xp >= threshold["xp"]:
-            current_level = threshold
-        else:
-            break
-    return current_level
-
 @api_router.get("/gamification/stats/{user_id}")
-async def get_user_gamification_stats(user_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_user_gamification_stats(user_id: str, token: dict = Depends(require_user_token)):
     """Get gamification stats for a user"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
+    await challenge_log.ensure_migrated(user_id)
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
     # Fetch or create gamification stats
-    stats = await db.gamification_stats.find_one({"user_id": user_id}, {"_id": 0})
+    stats, completed_today, pending = await asyncio.gather(
+        db.gamification_stats.find_one({"user_id": user_id}, {"_id": 0}),
+        challenge_log.of_day(user_id, today),
+        challenge_log.pending([user_id])
+    )
     
     if not stats:
         # Create default stats for new user
@@ -5378,8 +5472,7 @@ async def get_user_gamification_stats(user_id: str, credentials: HTTPAuthorizati
             "streak_days": 0,
             "last_activity_date": None,
             "badges": [],
-            "completed_challenges": [],
-            "pending_validations": [],
+            "challenges_completed": 0,
             "attendance_count": 0,
             "techniques_validated": 0,
             "created_at": datetime.now(timezone.utc).isoformat()
@@ -5388,45 +5481,22 @@ async def get_user_gamification_stats(user_id: str, credentials: HTTPAuthorizati
         if "_id" in stats:
             del stats["_id"]
     
+    # Today's completions and the pending ones, read from challenge_completions
+    stats["completed_challenges"] = completed_today
+    stats["pending_validations"] = pending[user_id]
     return stats
 
 @api_router.post("/gamification/challenge/complete")
 async def complete_challenge(
     completion: DailyChallengeCompletion,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    token: dict = Depends(require_user_token)
 ):
     """Complete a daily challenge and earn XP"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
-    # Verify token and get user
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    user_id = token["user_id"]
     
     now = datetime.now(timezone.utc)
     today = now.strftime("%Y-%m-%d")
     
-    # Check if challenge already completed today
-    existing = await db.gamification_stats.find_one({
-        "user_id": user_id,
-        "completed_challenges": {
-            "$elemMatch": {
-                "challenge_id": completion.challenge_id,
-                "completed_date": today
-            }
-        }
-    })
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Challenge already completed today")
-    
     # Prepare challenge record
     challenge_record = {
         "challenge_id": completion.challenge_id,
@@ -5438,206 +5508,45 @@ async def complete_challenge(
         "status": ChallengeStatus.VALIDATED if not completion.needs_parent_validation else ChallengeStatus.PENDING
     }
     
+    # Once per day: the unique (user_id, completed_date, challenge_id) index rejects the insert
+    await challenge_log.ensure_migrated(user_id)
+    try:
+        await challenge_log.record(user_id, challenge_record)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Challenge already completed today")
+    
     # Calculate XP to award
     xp_to_award = completion.xp_reward if not completion.needs_parent_validation else 0
     
-    # Update or create gamification stats
-    stats = await db.gamification_stats.find_one({"user_id": user_id})
-    
-    if not stats:
-        # Create new stats
-        new_total_xp = xp_to_award
-        level_info = get_level_from_xp(new_total_xp)
-        
-        stats = {
-            "user_id": user_id,
-            "total_xp": new_total_xp,
-            "level": level_info["level"],
-            "level_name": level_info["name"],
-            "streak_days": 1,
-            "last_activity_date": today,
-            "badges": [],
-            "completed_challenges": [challenge_record],
-            "pending_validations": [challenge_record] if completion.needs_parent_validation else [],
-            "attendance_count": 0,
-            "techniques_validated": 0,
-            "created_at": now.isoformat()
-        }
-        await db.gamification_stats.insert_one(stats)
-    else:
-        # Update existing stats
-        current_xp = stats.get("total_xp", 0)
-        new_total_xp = current_xp + xp_to_award
-        level_info = get_level_from_xp(new_total_xp)
-        
-        # Calculate streak
-        last_date = stats.get("last_activity_date")
-        current_streak = stats.get("streak_days", 0)
-        
-        if last_date:
-            last_datetime = datetime.strptime(last_date, "%Y-%m-%d")
-            days_diff = (now.date() - last_datetime.date()).days
-            
-            if days_diff == 1:
-                current_streak += 1
-            elif days_diff > 1:
-                current_streak = 1
-            # If same day, keep streak
-        else:
-            current_streak = 1
-        
-        # Update
-        update_query = {
-            "$set": {
-                "total_xp": new_total_xp,
-                "level": level_info["level"],
-                "level_name": level_info["name"],
-                "streak_days": current_streak,
-                "last_activity_date": today
-            },
-            "$push": {
-                "completed_challenges": challenge_record
-            }
-        }
-        
-        if completion.needs_parent_validation:
-            update_query["$push"]["pending_validations"] = challenge_record
-        
-        await db.gamification_stats.update_one(
-            {"user_id": user_id},
-            update_query
-        )
-        
-        stats["total_xp"] = new_total_xp
-        stats["level"] = level_info["level"]
-        stats["level_name"] = level_info["name"]
-        stats["streak_days"] = current_streak
+    # Update or create gamification stats in one atomic update
+    stats = await xp_service.gain(
+        user_id, xp_to_award, "challenge",
+        counters={"challenges_completed": 1},
+        activity_date=today,
+        ref=completion.challenge_id
+    )
     
-    # Check for new badges
-    new_badges = await check_and_award_badges(user_id, stats)
+    # Check for new badges (only the rules of the stats written above)
+    new_badges = await award_badges(db, user_id, stats, changed=("total_xp", "level", "streak_days"))
     
     return {
         "success": True,
         "xp_awarded": xp_to_award,
-        "total_xp": stats.get("total_xp", 0) + xp_to_award,
-        "level": level_info["level"],
-        "level_name": level_info["name"],
-        "streak_days": stats.get("streak_days", 1),
+        "total_xp": stats["total_xp"],
+        "level": stats["level"],
+        "level_name": stats["level_name"],
+        "streak_days": stats["streak_days"],
         "new_badges": new_badges,
         "needs_validation": completion.needs_parent_validation
     }
 
-async def check_and_award_badges(user_id: str, stats: dict) -> List[dict]:
-    """Check and award badges based on achievements"""
-    new_badges = []
-    current_badges = [b.get("badge_id") for b in stats.get("badges", [])]
-    
-    badges_to_check = [
-        # === BADGES DE DÉBUT DE PARCOURS ===
-        {"badge_id": "first_step", "badge_name": "Premier Pas", "badge_icon": "👣", "badge_description": "Premier entraînement", "condition": lambda s: s.get("attendance_count", 0) >= 1},
-        
-        # === BADGES DE RÉGULARITÉ (Streak) ===
-        {"badge_id": "streak_3", "badge_name": "Persévérant", "badge_icon": "🔥", "badge_description": "3 jours d'affilée", "condition": lambda s: s.get("streak_days", 0) >= 3},
-        {"badge_id": "streak_7", "badge_name": "Assidu", "badge_icon": "💪", "badge_description": "7 jours d'affilée", "condition": lambda s: s.get("streak_days", 0) >= 7},
-        {"badge_id": "streak_14", "badge_name": "Marathonien", "badge_icon": "🏃", "badge_description": "14 jours d'affilée", "condition": lambda s: s.get("streak_days", 0) >= 14},
-        {"badge_id": "streak_21", "badge_name": "Esprit du Budo", "badge_icon": "🧘", "badge_description": "21 jours d'affilée", "condition": lambda s: s.get("streak_days", 0) >= 21},
-        
-        # === BADGES DE DURÉE DE PRATIQUE (Long terme - Aïkido) ===
-        {"badge_id": "practice_1month", "badge_name": "Initié", "badge_icon": "🌱", "badge_description": "1 mois de pratique", "condition": lambda s: s.get("days_since_registration", 0) >= 30},
-        {"badge_id": "practice_3months", "badge_name": "Disciple", "badge_icon": "🌿", "badge_description": "3 mois de pratique", "condition": lambda s: s.get("days_since_registration", 0) >= 90},
-        {"badge_id": "practice_6months", "badge_name": "Pratiquant Confirmé", "badge_icon": "🌳", "badge_description": "6 mois de pratique", "condition": lambda s: s.get("days_since_registration", 0) >= 180},
-        {"badge_id": "practice_1year", "badge_name": "Fidèle du Dojo", "badge_icon": "🥋", "badge_description": "1 an de pratique", "condition": lambda s: s.get("days_since_registration", 0) >= 365},
-        {"badge_id": "practice_2years", "badge_name": "Pilier du Dojo", "badge_icon": "🏯", "badge_description": "2 ans de pratique", "condition": lambda s: s.get("days_since_registration", 0) >= 730},
-        {"badge_id": "practice_5years", "badge_name": "Vétéran", "badge_icon": "⛩️", "badge_description": "5 ans de pratique", "condition": lambda s: s.get("days_since_registration", 0) >= 1825},
-        
-        # === BADGES DE PASSAGE DE GRADE (Kyu) ===
-        {"badge_id": "grade_6kyu", "badge_name": "Ceinture Blanche", "badge_icon": "⬜", "badge_description": "6e Kyu - Début du chemin", "condition": lambda s: s.get("belt_level", "") in ["6e_kyu", "5e_kyu", "4e_kyu", "3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]},
-        {"badge_id": "grade_5kyu", "badge_name": "Ceinture Jaune", "badge_icon": "🟡", "badge_description": "5e Kyu obtenu", "condition": lambda s: s.get("belt_level", "") in ["5e_kyu", "4e_kyu", "3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]},
-        {"badge_id": "grade_4kyu", "badge_name": "Ceinture Orange", "badge_icon": "🟠", "badge_description": "4e Kyu obtenu", "condition": lambda s: s.get("belt_level", "") in ["4e_kyu", "3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]},
-        {"badge_id": "grade_3kyu", "badge_name": "Ceinture Verte", "badge_icon": "🟢", "badge_description": "3e Kyu obtenu", "condition": lambda s: s.get("belt_level", "") in ["3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]},
-        {"badge_id": "grade_2kyu", "badge_name": "Ceinture Bleue", "badge_icon": "🔵", "badge_description": "2e Kyu obtenu", "condition": lambda s: s.get("belt_level", "") in ["2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]},
-        {"badge_id": "grade_1kyu", "badge_name": "Ceinture Marron", "badge_icon": "🟤", "badge_description": "1er Kyu obtenu", "condition": lambda s: s.get("belt_level", "") in ["1er_kyu", "shodan", "nidan", "sandan", "yondan"]},
-        
-        # === BADGES DE PASSAGE DE GRADE (Dan) ===
-        {"badge_id": "grade_shodan", "badge_name": "Ceinture Noire", "badge_icon": "⬛", "badge_description": "Shodan - 1er Dan", "condition": lambda s: s.get("belt_level", "") in ["shodan", "nidan", "sandan", "yondan"]},
-        {"badge_id": "grade_nidan", "badge_name": "Maître Confirmé", "badge_icon": "🎌", "badge_description": "Nidan - 2e Dan", "condition": lambda s: s.get("belt_level", "") in ["nidan", "sandan", "yondan"]},
-        {"badge_id": "grade_sandan", "badge_name": "Enseignant", "badge_icon": "📜", "badge_description": "Sandan - 3e Dan", "condition": lambda s: s.get("belt_level", "") in ["sandan", "yondan"]},
-        {"badge_id": "grade_yondan", "badge_name": "Maître", "badge_icon": "👘", "badge_description": "Yondan - 4e Dan", "condition": lambda s: s.get("belt_level", "") == "yondan"},
-        
-        # === BADGES D'XP ===
-        {"badge_id": "xp_100", "badge_name": "Débutant", "badge_icon": "⭐", "badge_description": "100 XP gagnés", "condition": lambda s: s.get("total_xp", 0) >= 100},
-        {"badge_id": "xp_500", "badge_name": "Apprenti", "badge_icon": "🌟", "badge_description": "500 XP gagnés", "condition": lambda s: s.get("total_xp", 0) >= 500},
-        {"badge_id": "xp_1000", "badge_name": "Confirmé", "badge_icon": "✨", "badge_description": "1000 XP gagnés", "condition": lambda s: s.get("total_xp", 0) >= 1000},
-        {"badge_id": "xp_5000", "badge_name": "Expert", "badge_icon": "💫", "badge_description": "5000 XP gagnés", "condition": lambda s: s.get("total_xp", 0) >= 5000},
-        {"badge_id": "xp_10000", "badge_name": "Maître du Ki", "badge_icon": "🌀", "badge_description": "10000 XP gagnés", "condition": lambda s: s.get("total_xp", 0) >= 10000},
-        
-        # === BADGES DE NIVEAU ===
-        {"badge_id": "level_5", "badge_name": "Ninja Rapide", "badge_icon": "🥷", "badge_description": "Niveau 5 atteint", "condition": lambda s: s.get("level", 1) >= 5},
-        {"badge_id": "level_10", "badge_name": "Dragon Suprême", "badge_icon": "🐉", "badge_description": "Niveau 10 atteint", "condition": lambda s: s.get("level", 1) >= 10},
-        {"badge_id": "level_20", "badge_name": "Légende Vivante", "badge_icon": "🏆", "badge_description": "Niveau 20 atteint", "condition": lambda s: s.get("level", 1) >= 20},
-        
-        # === BADGES DE TECHNIQUES VALIDÉES ===
-        {"badge_id": "tech_5", "badge_name": "Technicien", "badge_icon": "🥋", "badge_description": "5 techniques validées", "condition": lambda s: s.get("techniques_validated", 0) >= 5},
-        {"badge_id": "tech_10", "badge_name": "Pratiquant Technique", "badge_icon": "🎯", "badge_description": "10 techniques validées", "condition": lambda s: s.get("techniques_validated", 0) >= 10},
-        {"badge_id": "tech_25", "badge_name": "Artiste Martial", "badge_icon": "🎨", "badge_description": "25 techniques validées", "condition": lambda s: s.get("techniques_validated", 0) >= 25},
-        {"badge_id": "tech_50", "badge_name": "Maître Technique", "badge_icon": "🏅", "badge_description": "50 techniques validées", "condition": lambda s: s.get("techniques_validated", 0) >= 50},
-        {"badge_id": "tech_100", "badge_name": "Encyclopédie Vivante", "badge_icon": "📚", "badge_description": "100 techniques validées", "condition": lambda s: s.get("techniques_validated", 0) >= 100},
-        
-        # === BADGES DE PRÉSENCE AU DOJO ===
-        {"badge_id": "attendance_10", "badge_name": "Habitué", "badge_icon": "🏠", "badge_description": "10 séances au dojo", "condition": lambda s: s.get("attendance_count", 0) >= 10},
-        {"badge_id": "attendance_50", "badge_name": "Régulier", "badge_icon": "📅", "badge_description": "50 séances au dojo", "condition": lambda s: s.get("attendance_count", 0) >= 50},
-        {"badge_id": "attendance_100", "badge_name": "Fidèle", "badge_icon": "🎖️", "badge_description": "100 séances au dojo", "condition": lambda s: s.get("attendance_count", 0) >= 100},
-        {"badge_id": "attendance_200", "badge_name": "Dévoué", "badge_icon": "🏆", "badge_description": "200 séances au dojo", "condition": lambda s: s.get("attendance_count", 0) >= 200},
-        {"badge_id": "attendance_500", "badge_name": "Légende du Dojo", "badge_icon": "👑", "badge_description": "500 séances au dojo", "condition": lambda s: s.get("attendance_count", 0) >= 500},
-        
-        # === BADGES SPÉCIAUX AÏKIDO ===
-        {"badge_id": "ukemi_master", "badge_name": "Maître des Chutes", "badge_icon": "🔄", "badge_description": "Ukemis parfaits validés", "condition": lambda s: s.get("ukemi_validated", False)},
-        {"badge_id": "weapons_intro", "badge_name": "Initié aux Armes", "badge_icon": "⚔️", "badge_description": "Buki waza découvert", "condition": lambda s: s.get("weapons_started", False)},
-        {"badge_id": "tanto_master", "badge_name": "Maître du Tanto", "badge_icon": "🔪", "badge_description": "Tanto-dori maîtrisé", "condition": lambda s: s.get("tanto_mastered", False)},
-        {"badge_id": "jo_master", "badge_name": "Maître du Jo", "badge_icon": "🪵", "badge_description": "Jo-waza maîtrisé", "condition": lambda s: s.get("jo_mastered", False)},
-        {"badge_id": "bokken_master", "badge_name": "Maître du Bokken", "badge_icon": "⚔️", "badge_description": "Aïki-ken maîtrisé", "condition": lambda s: s.get("bokken_mastered", False)},
-    ]
-    
-    now = datetime.now(timezone.utc).isoformat()
-    
-    for badge in badges_to_check:
-        if badge["badge_id"] not in current_badges and badge["condition"](stats):
-            badge_award = {
-                "badge_id": badge["badge_id"],
-                "badge_name": badge["badge_name"],
-                "badge_icon": badge["badge_icon"],
-                "badge_description": badge["badge_description"],
-                "awarded_at": now
-            }
-            new_badges.append(badge_award)
-            
-            # Award badge in database
-            await db.gamification_stats.update_one(
-                {"user_id": user_id},
-                {"$push": {"badges": badge_award}}
-            )
-    
-    return new_badges
-
 @api_router.post("/gamification/attendance")
 async def record_attendance(
     record: AttendanceRecord,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    token: dict = Depends(require_user_token)
 ):
     """Record attendance at dojo training"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
-    # Verify token and get user
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    user_id = token["user_id"]
     
     now = datetime.now(timezone.utc)
     
@@ -5662,50 +5571,20 @@ async def record_attendance(
     # Update gamification stats
     xp_reward = 25  # XP for attending class
     
-    stats = await db.gamification_stats.find_one({"user_id": user_id})
-    
-    if stats:
-        new_total_xp = stats.get("total_xp", 0) + xp_reward
-        level_info = get_level_from_xp(new_total_xp)
-        
-        await db.gamification_stats.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "total_xp": new_total_xp,
-                    "level": level_info["level"],
-                    "level_name": level_info["name"]
-                },
-                "$inc": {"attendance_count": 1}
-            }
-        )
-    else:
-        # Create new stats
-        level_info = get_level_from_xp(xp_reward)
-        new_stats = {
-            "user_id": user_id,
-            "total_xp": xp_reward,
-            "level": level_info["level"],
-            "level_name": level_info["name"],
-            "streak_days": 1,
-            "last_activity_date": record.date,
-            "badges": [],
-            "completed_challenges": [],
-            "pending_validations": [],
-            "attendance_count": 1,
-            "techniques_validated": 0,
-            "created_at": now.isoformat()
-        }
-        await db.gamification_stats.insert_one(new_stats)
+    updated_stats = await xp_service.gain(
+        user_id, xp_reward, "attendance",
+        counters={"attendance_count": 1},
+        on_insert={"streak_days": 1, "last_activity_date": record.date},
+        ref=record.date
+    )
     
     # Check for attendance badges
-    updated_stats = await db.gamification_stats.find_one({"user_id": user_id}, {"_id": 0})
-    new_badges = await check_and_award_badges(user_id, updated_stats)
+    new_badges = await award_badges(db, user_id, updated_stats, changed=("total_xp", "level", "attendance_count"))
     
     return {
         "success": True,
         "xp_awarded": xp_reward,
-        "attendance_count": updated_stats.get("attendance_count", 1),
+        "attendance_count": updated_stats["attendance_count"],
         "new_badges": new_badges
     }
 
@@ -5714,64 +5593,29 @@ async def validate_challenge_by_parent(
     challenge_id: str,
     user_id: str,
     approved: bool = True,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    token: dict = Depends(require_user_token)
 ):
     """Parent validates a pending challenge"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
     # TODO: Verify parent has permission to validate this user's challenges
     
     now = datetime.now(timezone.utc)
     
-    # Find the pending validation
-    stats = await db.gamification_stats.find_one({"user_id": user_id})
-    
-    if not stats:
-        raise HTTPException(status_code=404, detail="User stats not found")
-    
-    pending = None
-    for p in stats.get("pending_validations", []):
-        if p.get("challenge_id") == challenge_id:
-            pending = p
-            break
+    # Move the pending completion to its new status (atomic: a second validation finds nothing)
+    new_status = ChallengeStatus.VALIDATED if approved else ChallengeStatus.REJECTED
+    await challenge_log.ensure_migrated(user_id)
+    pending = await challenge_log.resolve(user_id, challenge_id, {
+        "status": new_status,
+        "validated_at": now.isoformat()
+    })
     
     if not pending:
         raise HTTPException(status_code=404, detail="Pending validation not found")
     
-    # Update the challenge status
-    new_status = ChallengeStatus.VALIDATED if approved else ChallengeStatus.REJECTED
     xp_to_award = pending.get("xp_reward", 0) if approved else 0
     
-    # Remove from pending validations
-    await db.gamification_stats.update_one(
-        {"user_id": user_id},
-        {
-            "$pull": {"pending_validations": {"challenge_id": challenge_id}},
-            "$set": {
-                "completed_challenges.$[elem].status": new_status,
-                "completed_challenges.$[elem].validated_at": now.isoformat()
-            }
-        },
-        array_filters=[{"elem.challenge_id": challenge_id}]
-    )
-    
     # Award XP if approved
     if approved and xp_to_award > 0:
-        current_xp = stats.get("total_xp", 0)
-        new_total_xp = current_xp + xp_to_award
-        level_info = get_level_from_xp(new_total_xp)
-        
-        await db.gamification_stats.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "total_xp": new_total_xp,
-                    "level": level_info["level"],
-                    "level_name": level_info["name"]
-                }
-            }
-        )
+        await xp_service.gain(user_id, xp_to_award, "challenge_validation", ref=challenge_id)
     
     return {
         "success": True,
@@ -5780,25 +5624,21 @@ async def validate_challenge_by_parent(
     }
 
 @api_router.get("/gamification/leaderboard")
-async def get_leaderboard(limit: int = 10):
-    """Get top players leaderboard"""
-    leaderboard = await db.gamification_stats.find(
-        {},
-        {"_id": 0, "user_id": 1, "total_xp": 1, "level": 1, "level_name": 1}
-    ).sort("total_xp", -1).limit(limit).to_list(length=limit)
-    
-    # Add user names
-    for i, entry in enumerate(leaderboard):
-        user = await db.users.find_one(
-            {"id": entry["user_id"]},
-            {"_id": 0, "first_name": 1}
-        )
-        entry["rank"] = i + 1
-        entry["name"] = user.get("first_name", "Ninja") if user else "Ninja"
-    
-    return leaderboard
+async def get_leaderboard(limit: int = Query(10, ge=1, le=100), dojo_id: Optional[str] = None):
+    """Get top players leaderboard, global or for one dojo"""
+    # Plain strings and numbers: rendered by orjson directly, without jsonable_encoder
+    return FastJSONResponse(await leaderboard.top(limit, dojo_id))
+
+@api_router.get("/gamification/leaderboard/me")
+async def get_my_leaderboard_rank(dojo_id: Optional[str] = None, token: dict = Depends(require_user_token)):
+    """Get the current player's rank, global or within one dojo"""
+    entry = await leaderboard.rank_of(token["user_id"], dojo_id)
+    if not entry:
+        return {"user_id": token["user_id"], "rank": None, "total_xp": 0}
+    return entry
 
 @api_router.get("/gamification/daily-challenges")
+@static_for_build
 async def get_daily_challenges():
     """Get available daily challenges"""
     # These could be stored in DB and rotated daily
@@ -5874,18 +5714,11 @@ class ParentValidationRequest(BaseModel):
 @api_router.post("/parent/link-child")
 async def link_child_to_parent(
     request: LinkChildRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    token: dict = Depends(require_user_token)
 ):
     """Link a child account to the parent's account"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
     # Get parent from token
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        parent_id = payload.get("user_id")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    parent_id = token["user_id"]
     
     parent = await db.users.find_one({"id": parent_id}, {"_id": 0})
     if not parent:
@@ -5909,12 +5742,14 @@ async def link_child_to_parent(
         {"id": child["id"]},
         {"$set": {"parent_id": parent_id}}
     )
+    principal_cache.invalidate(child["id"])
     
     # Update parent with child_id (add to list)
     await db.users.update_one(
         {"id": parent_id},
         {"$addToSet": {"children_ids": child["id"]}}
     )
+    principal_cache.invalidate(parent_id)
     
     return {
         "success": True,
@@ -5930,56 +5765,47 @@ async def link_child_to_parent(
 @api_router.delete("/parent/unlink-child/{child_id}")
 async def unlink_child_from_parent(
     child_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    token: dict = Depends(require_user_token)
 ):
     """Unlink a child from parent's account"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        parent_id = payload.get("user_id")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    parent_id = token["user_id"]
     
     # Remove parent_id from child
     await db.users.update_one(
         {"id": child_id, "parent_id": parent_id},
         {"$unset": {"parent_id": ""}}
     )
+    principal_cache.invalidate(child_id)
     
     # Remove child from parent's list
     await db.users.update_one(
         {"id": parent_id},
         {"$pull": {"children_ids": child_id}}
     )
+    principal_cache.invalidate(parent_id)
     
     return {"success": True, "message": "Enfant délié avec succès"}
 
 @api_router.get("/parent/children")
-async def get_parent_children(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_parent_children(token: dict = Depends(require_user_token)):
     """Get list of children linked to parent account"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        parent_id = payload.get("user_id")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    parent_id = token["user_id"]
     
-    parent = await db.users.find_one({"id": parent_id}, {"_id": 0})
+    parent = await db.users.find_one({"id": parent_id}, {"_id": 0, "children_ids": 1})
     if not parent:
         raise HTTPException(status_code=404, detail="User not found")
     
     children_ids = parent.get("children_ids", [])
     
+    await asyncio.gather(*(challenge_log.ensure_migrated(child_id) for child_id in children_ids))
+    family, pending = await asyncio.gather(
+        load_children(db, children_ids, ["first_name", "last_name", "email", "belt_level"], ["total_xp", "level", "level_name"]),
+        challenge_log.pending(children_ids)
+    )
+    
     children = []
-    for child_id in children_ids:
-        child = await db.users.find_one({"id": child_id}, {"_id": 0, "password_hash": 0})
+    for child_id, child, stats in family:
         if child:
-            # Get child's gamification stats
-            stats = await db.gamification_stats.find_one({"user_id": child_id}, {"_id": 0})
             children.append({
                 "id": child["id"],
                 "first_name": child["first_name"],
@@ -5990,47 +5816,42 @@ async def get_parent_children(credentials: HTTPAuthorizationCredentials = Depend
                     "total_xp": stats.get("total_xp", 0) if stats else 0,
                     "level": stats.get("level", 1) if stats else 1,
                     "level_name": stats.get("level_name", "Petit Scarabée") if stats else "Petit Scarabée",
-                    "pending_validations": stats.get("pending_validations", []) if stats else []
+                    "pending_validations": pending[child_id]
                 }
             })
     
     return {"children": children}
 
 @api_router.get("/parent/pending-validations")
-async def get_parent_pending_validations(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_parent_pending_validations(token: dict = Depends(require_user_token)):
     """Get all pending validations for parent's children"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
+    parent_id = token["user_id"]
     
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        parent_id = payload.get("user_id")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    parent = await db.users.find_one({"id": parent_id}, {"_id": 0})
+    parent = await db.users.find_one({"id": parent_id}, {"_id": 0, "children_ids": 1})
     if not parent:
         raise HTTPException(status_code=404, detail="User not found")
     
     children_ids = parent.get("children_ids", [])
     
+    await asyncio.gather(*(challenge_log.ensure_migrated(child_id) for child_id in children_ids))
+    family, pending_by_child = await asyncio.gather(
+        load_children(db, children_ids, ["first_name", "last_name"]),
+        challenge_log.pending(children_ids)
+    )
+    
     all_pending = []
-    for child_id in children_ids:
-        child = await db.users.find_one({"id": child_id}, {"_id": 0})
-        stats = await db.gamification_stats.find_one({"user_id": child_id}, {"_id": 0})
-        
-        if stats and stats.get("pending_validations"):
-            for pending in stats["pending_validations"]:
-                all_pending.append({
-                    "child_id": child_id,
-                    "child_name": f"{child['first_name']} {child['last_name']}" if child else "Inconnu",
-                    "challenge_id": pending.get("challenge_id"),
-                    "challenge_name": pending.get("challenge_name"),
-                    "challenge_type": pending.get("challenge_type"),
-                    "xp_reward": pending.get("xp_reward", 0),
-                    "completed_at": pending.get("completed_at"),
-                    "status": pending.get("status", "pending")
-                })
+    for child_id, child, _ in family:
+        for pending in pending_by_child[child_id]:
+            all_pending.append({
+                "child_id": child_id,
+                "child_name": f"{child['first_name']} {child['last_name']}" if child else "Inconnu",
+                "challenge_id": pending.get("challenge_id"),
+                "challenge_name": pending.get("challenge_name"),
+                "challenge_type": pending.get("challenge_type"),
+                "xp_reward": pending.get("xp_reward", 0),
+                "completed_at": pending.get("completed_at"),
+                "status": pending.get("status", "pending")
+            })
     
     # Sort by completed_at (most recent first)
     all_pending.sort(key=lambda x: x.get("completed_at", ""), reverse=True)
@@ -6042,17 +5863,10 @@ async def parent_validate_challenge(
     child_id: str,
     challenge_id: str,
     request: ParentValidationRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    token: dict = Depends(require_user_token)
 ):
     """Parent validates or rejects a child's challenge"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        parent_id = payload.get("user_id")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    parent_id = token["user_id"]
     
     # Verify parent-child relationship
     parent = await db.users.find_one({"id": parent_id}, {"_id": 0})
@@ -6063,55 +5877,26 @@ async def parent_validate_challenge(
     if not child:
         raise HTTPException(status_code=404, detail="Enfant non trouvé")
     
-    # Find the pending validation
-    stats = await db.gamification_stats.find_one({"user_id": child_id})
-    if not stats:
-        raise HTTPException(status_code=404, detail="Stats non trouvées pour cet enfant")
+    now = datetime.now(timezone.utc)
+    new_status = ChallengeStatus.VALIDATED if request.approved else ChallengeStatus.REJECTED
     
-    pending = None
-    for p in stats.get("pending_validations", []):
-        if p.get("challenge_id") == challenge_id:
-            pending = p
-            break
+    # Move the pending completion to its new status (atomic: a second validation finds nothing)
+    await challenge_log.ensure_migrated(child_id)
+    pending = await challenge_log.resolve(child_id, challenge_id, {
+        "status": new_status,
+        "validated_at": now.isoformat(),
+        "validated_by": parent_id,
+        "validation_comment": request.comment
+    })
     
     if not pending:
         raise HTTPException(status_code=404, detail="Défi en attente non trouvé")
     
-    now = datetime.now(timezone.utc)
-    new_status = ChallengeStatus.VALIDATED if request.approved else ChallengeStatus.REJECTED
     xp_to_award = pending.get("xp_reward", 0) if request.approved else 0
     
-    # Update challenge status in completed_challenges
-    await db.gamification_stats.update_one(
-        {"user_id": child_id},
-        {
-            "$pull": {"pending_validations": {"challenge_id": challenge_id}},
-            "$set": {
-                "completed_challenges.$[elem].status": new_status,
-                "completed_challenges.$[elem].validated_at": now.isoformat(),
-                "completed_challenges.$[elem].validated_by": parent_id,
-                "completed_challenges.$[elem].validation_comment": request.comment
-            }
-        },
-        array_filters=[{"elem.challenge_id": challenge_id}]
-    )
-    
     # Award XP if approved
     if request.approved and xp_to_award > 0:
-        current_xp = stats.get("total_xp", 0)
-        new_total_xp = current_xp + xp_to_award
-        level_info = get_level_from_xp(new_total_xp)
-        
-        await db.gamification_stats.update_one(
-            {"user_id": child_id},
-            {
-                "$set": {
-                    "total_xp": new_total_xp,
-                    "level": level_info["level"],
-                    "level_name": level_info["name"]
-                }
-            }
-        )
+        stats = await xp_service.gain(child_id, xp_to_award, "parent_validation", ref=challenge_id)
         
         # Check for badges
         new_badges = []
@@ -6143,17 +5928,10 @@ async def parent_validate_challenge(
 @api_router.get("/parent/child-stats/{child_id}")
 async def get_child_stats_for_parent(
     child_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    token: dict = Depends(require_user_token)
 ):
     """Get detailed stats for a specific child"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        parent_id = payload.get("user_id")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    parent_id = token["user_id"]
     
     # Verify parent-child relationship
     parent = await db.users.find_one({"id": parent_id}, {"_id": 0})
@@ -6164,7 +5942,16 @@ async def get_child_stats_for_parent(
     if not child:
         raise HTTPException(status_code=404, detail="Enfant non trouvé")
     
-    stats = await db.gamification_stats.find_one({"user_id": child_id}, {"_id": 0})
+    await challenge_log.ensure_migrated(child_id)
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    stats, completed_today, pending = await asyncio.gather(
+        db.gamification_stats.find_one({"user_id": child_id}, {"_id": 0}),
+        challenge_log.of_day(child_id, today),
+        challenge_log.pending([child_id])
+    )
+    if stats:
+        stats["completed_challenges"] = completed_today
+        stats["pending_validations"] = pending[child_id]
     
     return {
         "child": {
@@ -6215,15 +6002,7 @@ async def verify_club_admin_token(credentials: HTTPAuthorizationCredentials = De
     if not credentials:
         raise HTTPException(status_code=401, detail="Token d'authentification requis")
     
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        if payload.get("role") != "club_admin":
-            raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs de club")
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expiré")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Token invalide")
+    return token_verifier.verify(credentials.credentials, "club_admin")
 
 @api_router.get("/club/members")
 async def get_club_members(dojo_id: str, club_admin: dict = Depends(verify_club_admin_token)):
@@ -6239,6 +6018,48 @@ async def get_club_members(dojo_id: str, club_admin: dict = Depends(verify_club_
     
     return {"members": members}
 
+CLUB_MEMBER_EXPORT_COLUMNS = [
+    "id", "firstName", "lastName", "email", "phone", "birthDate", "belt",
+    "subscriptionPaid", "isActive", "dojo_id", "joinDate", "created_at"
+]
+
+USER_EXPORT_COLUMNS = [
+    "id", "first_name", "last_name", "email", "belt_level", "dojo_id", "dojo_name",
+    "subscription_status", "subscription_plan", "created_at"
+]
+
+@api_router.get("/club/members/export")
+async def export_club_members(
+    dojo_id: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    club_admin: dict = Depends(verify_club_admin_token)
+):
+    """Stream the club roster as CSV or NDJSON (Club Admin only)"""
+    if club_admin.get("dojo_id") != dojo_id:
+        raise HTTPException(status_code=403, detail="Vous n'avez pas accès à ce dojo")
+    
+    cursor = db.club_members.find(
+        {"dojo_id": dojo_id},
+        {"_id": 0, **{column: 1 for column in CLUB_MEMBER_EXPORT_COLUMNS}}
+    ).sort([("dojo_id", 1), ("email", 1)])
+    return stream_export(cursor, format, CLUB_MEMBER_EXPORT_COLUMNS, f"adherents_{dojo_id}")
+
+@api_router.get("/club/users/export")
+async def export_club_users(
+    dojo_id: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    club_admin: dict = Depends(verify_club_admin_token)
+):
+    """Stream the registered users of the club's dojo as CSV or NDJSON (Club Admin only)"""
+    if club_admin.get("dojo_id") != dojo_id:
+        raise HTTPException(status_code=403, detail="Vous n'avez pas accès à ce dojo")
+    
+    cursor = db.users.find(
+        {"dojo_id": dojo_id},
+        {"_id": 0, **{column: 1 for column in USER_EXPORT_COLUMNS}}
+    ).sort([("dojo_id", 1), ("id", 1)])
+    return stream_export(cursor, format, USER_EXPORT_COLUMNS, f"utilisateurs_{dojo_id}")
+
 @api_router.post("/club/members")
 async def create_club_member(member: ClubMemberCreate, club_admin: dict = Depends(verify_club_admin_token)):
     """Create a new member for a club (Club Admin only)"""
@@ -6270,6 +6091,7 @@ async def create_club_member(member: ClubMemberCreate, club_admin: dict = Depend
     }
     
     await db.club_members.insert_one(new_member)
+    clubs_rollup.invalidate()
     logger.info(f"New club member created: {member.firstName} {member.lastName} for dojo {member.dojoId}")
     
     return {"success": True, "member": {k: v for k, v in new_member.items() if k != "_id"}}
@@ -6328,6 +6150,7 @@ async def delete_club_member(member_id: str, club_admin: dict = Depends(verify_c
         raise HTTPException(status_code=403, detail="Vous n'avez pas accès à ce membre")
     
     await db.club_members.delete_one({"id": member_id})
+    clubs_rollup.invalidate()
     logger.info(f"Club member deleted: {member_id} from dojo {member['dojo_id']}")
     
     return {"success": True, "message": "Membre supprimé"}
@@ -6407,6 +6230,8 @@ async def update_club_dojo(dojo_id: str, update: DojoUpdate, club_admin: dict =
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
     await db.dojos.update_one({"id": dojo_id}, {"$set": update_data})
+    dojo_list_cache.clear()
+    clubs_rollup.invalidate()
     
     # Get updated dojo
     updated_dojo = await db.dojos.find_one({"id": dojo_id}, {"_id": 0, "admin_password": 0})
@@ -6418,28 +6243,104 @@ async def update_club_dojo(dojo_id: str, update: DojoUpdate, club_admin: dict =
 # ADMIN - CLUBS MANAGEMENT (Platform Admin only)
 # ═══════════════════════════════════════════════════════════════════════════════════
 
+async def compute_clubs_rollup() -> List[dict]:
+    """All clubs with their dojo and member count, joined server-side in one aggregation"""
+    return await db.club_admins.aggregate([
+        {"$lookup": {
+            "from": "dojos",
+            "let": {"dojo_id": "$dojo_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$dojo_id"]}}},
+                {"$project": {"_id": 0, "admin_password": 0}}
+            ],
+            "as": "dojo"
+        }},
+        {"$lookup": {
+            "from": "club_members",
+            "let": {"dojo_id": "$dojo_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$dojo_id", "$$dojo_id"]}}},
+                {"$count": "count"}
+            ],
+            "as": "members"
+        }},
+        {"$project": {
+            "_id": 0,
+            "admin_id": {"$ifNull": ["$id", None]},
+            "admin_email": {"$ifNull": ["$email", None]},
+            "admin_name": {"$trim": {"input": {"$concat": [
+                {"$ifNull": ["$first_name", ""]}, " ", {"$ifNull": ["$last_name", ""]}
+            ]}}},
+            "dojo": {"$ifNull": [{"$arrayElemAt": ["$dojo", 0]}, None]},
+            "members_count": {"$ifNull": [{"$arrayElemAt": ["$members.count", 0]}, 0]},
+            "created_at": {"$ifNull": ["$created_at", None]}
+        }}
+    ]).to_list(length=None)
+
+# Platform-wide clubs rollup, refreshed in the background and after club/dojo/member writes
+clubs_rollup = RollupSnapshot(
+    "clubs",
+    compute_clubs_rollup,
+    refresh_interval=float(os.environ.get('CLUBS_ROLLUP_REFRESH_SECONDS', 300))
+)
+
+CLUB_SORT_KEYS = {
+    "members_count": lambda club: club["members_count"],
+    "created_at": lambda club: club["created_at"] or "",
+    "name": lambda club: ((club["dojo"] or {}).get("name") or "").lower(),
+}
+
 @api_router.get("/admin/clubs")
-async def get_all_clubs(current_user: dict = Depends(get_current_user)):
-    """Get all registered clubs (Platform Admin only)"""
+async def get_all_clubs(
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    sort: Optional[str] = Query(None, pattern="^(members_count|created_at|name)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get all registered clubs, optionally sorted and paginated (Platform Admin only)"""
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
     
-    # Get all club admins with their dojo info
-    clubs = []
-    async for admin in db.club_admins.find({}, {"_id": 0, "password": 0}):
-        dojo = await db.dojos.find_one({"id": admin.get("dojo_id")}, {"_id": 0, "admin_password": 0})
-        members_count = await db.club_members.count_documents({"dojo_id": admin.get("dojo_id")})
-        
-        clubs.append({
-            "admin_id": admin.get("id"),
-            "admin_email": admin.get("email"),
-            "admin_name": f"{admin.get('first_name', '')} {admin.get('last_name', '')}".strip(),
-            "dojo": dojo,
-            "members_count": members_count,
-            "created_at": admin.get("created_at")
-        })
+    clubs = await clubs_rollup.get()
+    if sort:
+        clubs = sorted(clubs, key=CLUB_SORT_KEYS[sort], reverse=order == "desc")
+    page = clubs[skip:skip + limit] if limit else clubs[skip:]
     
-    return {"clubs": clubs, "total": len(clubs)}
+    return {"clubs": page, "total": len(clubs), "computed_at": clubs_rollup.computed_at}
+
+
+@api_router.get("/admin/metrics")
+async def get_runtime_metrics(current_user: dict = Depends(get_current_user)):
+    """Runtime metrics of the worker pools and caches (Platform Admin only)"""
+    if not current_user or current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    
+    return {
+        "hashing_pool": hashing_pool.stats(),
+        "principal_cache": principal_cache.stats(),
+        "tokens": token_verifier.stats(),
+        "journal_migration": journal_store.stats(),
+        "virtue_actions_migration": virtue_log.stats(),
+        "challenge_completions_migration": challenge_log.stats(),
+        "xp_ledger": xp_ledger.stats(),
+        "streak_maintenance": streak_maintenance.stats(),
+        "curriculum": curriculum_cache.stats(),
+        "snapshots": {cache.name: cache.stats() for cache in (dojo_list_cache, clubs_rollup, members_stats_rollup)}
+    }
+
+
+@api_router.get("/admin/indexes")
+async def get_index_audit(current_user: dict = Depends(get_current_user)):
+    """Index audit: missing, unused and redundant indexes per collection (Platform Admin only)"""
+    if not current_user or current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    
+    bootstrap = background_tasks.get("indexes")
+    return {
+        "bootstrap": bootstrap.result() if bootstrap and bootstrap.done() else None,
+        "collections": await audit_indexes(db)
+    }
 
 
 # Include the router in the main app
@@ -6465,12 +6366,15 @@ from routes.grades_routes import router as grades_router, set_database as set_gr
 set_grades_db(db)
 app.include_router(grades_router, prefix="/api")
 
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 # ═══════════════════════════════════════════════════════════════════════════════════
@@ -6482,6 +6386,31 @@ async def health_check():
     """Health check endpoint for Kubernetes liveness/readiness probes"""
     return {"status": "healthy", "service": "wayofdojo-backend"}
 
+# Background startup tasks, kept referenced so they are not garbage-collected
+background_tasks = {}
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Apply the declared indexes, keep the platform rollups fresh and run the XP / streak jobs, without delaying startup"""
+    background_tasks["indexes"] = asyncio.create_task(ensure_indexes(db))
+    background_tasks["clubs_rollup"] = asyncio.create_task(clubs_rollup.run_periodic())
+    background_tasks["xp_ledger_compaction"] = asyncio.create_task(xp_ledger.run_periodic(
+        XP_COMPACTION_INTERVAL_SECONDS, timedelta(hours=XP_COMPACTION_AGE_HOURS)
+    ))
+    background_tasks["streak_maintenance"] = asyncio.create_task(streak_maintenance.run_nightly(
+        STREAK_JOB_HOUR_UTC, STREAK_JOB_MINUTE_UTC
+    ))
+    if CURRICULUM_CHANGE_STREAM:
+        background_tasks["curriculum_watch"] = asyncio.create_task(curriculum_cache.watch())
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """Stop the background tasks, release the hashing workers and the MongoDB connection"""
+    for task in background_tasks.values():
+        task.cancel()
+    hashing_pool.shutdown()
+    client.close()
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
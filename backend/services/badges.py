@@ -0,0 +1,179 @@
+"""
+Badge Rules
+The badge catalog is declared once as data and compiled at import into rules
+indexed by the stat they depend on, sorted by threshold. A check only walks
+the rules of the stats that changed, and stops at the first threshold above
+the current value. Belt badges compare belt ordinals instead of membership in
+a list of belts.
+
+Newly earned badges are written with a single $push/$each.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# Grades in ascending order; a belt badge is earned from its grade upwards
+BELT_ORDER = ["6e_kyu", "5e_kyu", "4e_kyu", "3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]
+BELT_ORDINALS = {belt: i for i, belt in enumerate(BELT_ORDER)}
+
+# Derived stats: name -> (source field of the stats document, conversion)
+DERIVED_STATS = {
+    "belt_ordinal": ("belt_level", lambda belt: BELT_ORDINALS.get(belt, -1) if isinstance(belt, str) else -1),
+}
+
+# Default value of each stat when missing from the stats document
+STAT_DEFAULTS = {"level": 1}
+
+# (badge_id, badge_name, badge_icon, badge_description, stat, threshold); threshold True = boolean flag
+BADGE_CATALOG = [
+    # === BADGES DE DÉBUT DE PARCOURS ===
+    ("first_step", "Premier Pas", "👣", "Premier entraînement", "attendance_count", 1),
+
+    # === BADGES DE RÉGULARITÉ (Streak) ===
+    ("streak_3", "Persévérant", "🔥", "3 jours d'affilée", "streak_days", 3),
+    ("streak_7", "Assidu", "💪", "7 jours d'affilée", "streak_days", 7),
+    ("streak_14", "Marathonien", "🏃", "14 jours d'affilée", "streak_days", 14),
+    ("streak_21", "Esprit du Budo", "🧘", "21 jours d'affilée", "streak_days", 21),
+
+    # === BADGES DE DURÉE DE PRATIQUE (Long terme - Aïkido) ===
+    ("practice_1month", "Initié", "🌱", "1 mois de pratique", "days_since_registration", 30),
+    ("practice_3months", "Disciple", "🌿", "3 mois de pratique", "days_since_registration", 90),
+    ("practice_6months", "Pratiquant Confirmé", "🌳", "6 mois de pratique", "days_since_registration", 180),
+    ("practice_1year", "Fidèle du Dojo", "🥋", "1 an de pratique", "days_since_registration", 365),
+    ("practice_2years", "Pilier du Dojo", "🏯", "2 ans de pratique", "days_since_registration", 730),
+    ("practice_5years", "Vétéran", "⛩️", "5 ans de pratique", "days_since_registration", 1825),
+
+    # === BADGES DE PASSAGE DE GRADE (Kyu) ===
+    ("grade_6kyu", "Ceinture Blanche", "⬜", "6e Kyu - Début du chemin", "belt_ordinal", BELT_ORDINALS["6e_kyu"]),
+    ("grade_5kyu", "Ceinture Jaune", "🟡", "5e Kyu obtenu", "belt_ordinal", BELT_ORDINALS["5e_kyu"]),
+    ("grade_4kyu", "Ceinture Orange", "🟠", "4e Kyu obtenu", "belt_ordinal", BELT_ORDINALS["4e_kyu"]),
+    ("grade_3kyu", "Ceinture Verte", "🟢", "3e Kyu obtenu", "belt_ordinal", BELT_ORDINALS["3e_kyu"]),
+    ("grade_2kyu", "Ceinture Bleue", "🔵", "2e Kyu obtenu", "belt_ordinal", BELT_ORDINALS["2e_kyu"]),
+    ("grade_1kyu", "Ceinture Marron", "🟤", "1er Kyu obtenu", "belt_ordinal", BELT_ORDINALS["1er_kyu"]),
+
+    # === BADGES DE PASSAGE DE GRADE (Dan) ===
+    ("grade_shodan", "Ceinture Noire", "⬛", "Shodan - 1er Dan", "belt_ordinal", BELT_ORDINALS["shodan"]),
+    ("grade_nidan", "Maître Confirmé", "🎌", "Nidan - 2e Dan", "belt_ordinal", BELT_ORDINALS["nidan"]),
+    ("grade_sandan", "Enseignant", "📜", "Sandan - 3e Dan", "belt_ordinal", BELT_ORDINALS["sandan"]),
+    ("grade_yondan", "Maître", "👘", "Yondan - 4e Dan", "belt_ordinal", BELT_ORDINALS["yondan"]),
+
+    # === BADGES D'XP ===
+    ("xp_100", "Débutant", "⭐", "100 XP gagnés", "total_xp", 100),
+    ("xp_500", "Apprenti", "🌟", "500 XP gagnés", "total_xp", 500),
+    ("xp_1000", "Confirmé", "✨", "1000 XP gagnés", "total_xp", 1000),
+    ("xp_5000", "Expert", "💫", "5000 XP gagnés", "total_xp", 5000),
+    ("xp_10000", "Maître du Ki", "🌀", "10000 XP gagnés", "total_xp", 10000),
+
+    # === BADGES DE NIVEAU ===
+    ("level_5", "Ninja Rapide", "🥷", "Niveau 5 atteint", "level", 5),
+    ("level_10", "Dragon Suprême", "🐉", "Niveau 10 atteint", "level", 10),
+    ("level_20", "Légende Vivante", "🏆", "Niveau 20 atteint", "level", 20),
+
+    # === BADGES DE TECHNIQUES VALIDÉES ===
+    ("tech_5", "Technicien", "🥋", "5 techniques validées", "techniques_validated", 5),
+    ("tech_10", "Pratiquant Technique", "🎯", "10 techniques validées", "techniques_validated", 10),
+    ("tech_25", "Artiste Martial", "🎨", "25 techniques validées", "techniques_validated", 25),
+    ("tech_50", "Maître Technique", "🏅", "50 techniques validées", "techniques_validated", 50),
+    ("tech_100", "Encyclopédie Vivante", "📚", "100 techniques validées", "techniques_validated", 100),
+
+    # === BADGES DE PRÉSENCE AU DOJO ===
+    ("attendance_10", "Habitué", "🏠", "10 séances au dojo", "attendance_count", 10),
+    ("attendance_50", "Régulier", "📅", "50 séances au dojo", "attendance_count", 50),
+    ("attendance_100", "Fidèle", "🎖️", "100 séances au dojo", "attendance_count", 100),
+    ("attendance_200", "Dévoué", "🏆", "200 séances au dojo", "attendance_count", 200),
+    ("attendance_500", "Légende du Dojo", "👑", "500 séances au dojo", "attendance_count", 500),
+
+    # === BADGES SPÉCIAUX AÏKIDO ===
+    ("ukemi_master", "Maître des Chutes", "🔄", "Ukemis parfaits validés", "ukemi_validated", True),
+    ("weapons_intro", "Initié aux Armes", "⚔️", "Buki waza découvert", "weapons_started", True),
+    ("tanto_master", "Maître du Tanto", "🔪", "Tanto-dori maîtrisé", "tanto_mastered", True),
+    ("jo_master", "Maître du Jo", "🪵", "Jo-waza maîtrisé", "jo_mastered", True),
+    ("bokken_master", "Maître du Bokken", "⚔️", "Aïki-ken maîtrisé", "bokken_mastered", True),
+]
+
+
+class BadgeRule(NamedTuple):
+    order: int
+    badge_id: str
+    badge_name: str
+    badge_icon: str
+    badge_description: str
+    stat: str
+    threshold: object
+
+
+def _compile(catalog) -> Dict[str, List[BadgeRule]]:
+    rules_by_stat: Dict[str, List[BadgeRule]] = {}
+    for order, entry in enumerate(catalog):
+        rule = BadgeRule(order, *entry)
+        rules_by_stat.setdefault(rule.stat, []).append(rule)
+    for rules in rules_by_stat.values():
+        rules.sort(key=lambda r: (r.threshold is True, r.threshold))
+    return rules_by_stat
+
+
+RULES_BY_STAT = _compile(BADGE_CATALOG)
+
+# Stats document field -> rule stats depending on it
+_STATS_OF_FIELD = {field: stat for stat, (field, _) in DERIVED_STATS.items()}
+
+
+def _stat_value(stats: dict, stat: str):
+    if stat in DERIVED_STATS:
+        field, convert = DERIVED_STATS[stat]
+        return convert(stats.get(field))
+    return stats.get(stat, STAT_DEFAULTS.get(stat, 0))
+
+
+def earned_badges(stats: dict, owned: Iterable[str], changed: Optional[Iterable[str]] = None) -> List[BadgeRule]:
+    """
+    Rules newly satisfied by `stats`, in catalog order. `changed` lists the
+    fields of the stats document that changed (None: evaluate every rule).
+    """
+    owned = set(owned)
+    if changed is None:
+        stat_names = RULES_BY_STAT.keys()
+    else:
+        stat_names = {_STATS_OF_FIELD.get(field, field) for field in changed}
+
+    earned = []
+    for stat in stat_names:
+        rules = RULES_BY_STAT.get(stat)
+        if not rules:
+            continue
+        value = _stat_value(stats, stat)
+        for rule in rules:
+            if rule.threshold is True:
+                satisfied = bool(value)
+            else:
+                satisfied = value >= rule.threshold
+                if not satisfied:
+                    # Sorted by threshold: the next ones cannot be satisfied either
+                    break
+            if satisfied and rule.badge_id not in owned:
+                earned.append(rule)
+    earned.sort(key=lambda r: r.order)
+    return earned
+
+
+def badge_award(rule: BadgeRule, awarded_at: str) -> dict:
+    return {
+        "badge_id": rule.badge_id,
+        "badge_name": rule.badge_name,
+        "badge_icon": rule.badge_icon,
+        "badge_description": rule.badge_description,
+        "awarded_at": awarded_at
+    }
+
+
+async def award_badges(db, user_id: str, stats: dict, changed: Optional[Iterable[str]] = None) -> List[dict]:
+    """Award the badges newly earned by `stats` in one write; returns them"""
+    owned = (b.get("badge_id") for b in stats.get("badges", []))
+    now = datetime.now(timezone.utc).isoformat()
+    new_badges = [badge_award(rule, now) for rule in earned_badges(stats, owned, changed)]
+    if new_badges:
+        await db.gamification_stats.update_one(
+            {"user_id": user_id},
+            {"$push": {"badges": {"$each": new_badges}}}
+        )
+    return new_badges
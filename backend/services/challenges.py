@@ -0,0 +1,170 @@
+"""
+Challenge Completions
+Daily challenge completions live in the `challenge_completions` collection,
+one document per completion, instead of the `completed_challenges` /
+`pending_validations` arrays of gamification_stats. The stats document only
+keeps the `challenges_completed` aggregate.
+
+A unique key on (user_id, completed_date, challenge_id) makes "once per day" a
+single insert that either succeeds or raises DuplicateKeyError, so concurrent
+double-taps cannot both go through. The date comes before challenge_id in the
+key so that the same index also serves "today's completions". Pending
+validations are read from the (user_id, status, completed_at) index.
+
+Stats written before this collection still carry the arrays; they are moved on
+the user's first access (same pattern as JournalStore), or all at once with
+`python maintenance.py migrate-challenge-completions`.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from cachetools import LRUCache
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+COMPLETION_FIELDS = (
+    "challenge_id", "challenge_type", "challenge_name", "xp_reward", "completed_date", "completed_at",
+    "status", "validated_at", "validated_by", "validation_comment",
+)
+COMPLETION_PROJECTION = {"_id": 0, **{field: 1 for field in COMPLETION_FIELDS}}
+
+
+def completion_document(user_id: str, record: dict) -> dict:
+    """Collection document for a challenge record (extra keys are dropped, missing ones omitted)"""
+    doc = {field: record[field] for field in COMPLETION_FIELDS if record.get(field) is not None}
+    doc["user_id"] = user_id
+    return doc
+
+
+def legacy_completions(stats: dict) -> List[dict]:
+    """
+    Records of the legacy arrays, one per (completed_date, challenge_id). The
+    entries of completed_challenges carry the final status; pending_validations
+    only duplicates the ones still waiting.
+    """
+    records = {}
+    for record in (stats.get("pending_validations") or []) + (stats.get("completed_challenges") or []):
+        if isinstance(record, dict) and record.get("challenge_id") and record.get("completed_date"):
+            records[(record["completed_date"], record["challenge_id"])] = record
+    return list(records.values())
+
+
+class ChallengeLog:
+    """Inserts, validations and reads of challenge_completions, migrating embedded arrays on first access"""
+
+    def __init__(self, db, migrated_cache_size: int = 100000):
+        self.db = db
+        self.collection = db.challenge_completions
+        # Users known to have no embedded arrays left (saves the stats lookup)
+        self._migrated = LRUCache(maxsize=migrated_cache_size)
+        self.migrated_users = 0
+        self.migrated_completions = 0
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    async def record(self, user_id: str, record: dict):
+        """Insert one completion; raises DuplicateKeyError if already completed that day"""
+        await self.collection.insert_one(completion_document(user_id, record))
+
+    async def resolve(self, user_id: str, challenge_id: str, fields: dict) -> Optional[dict]:
+        """
+        Atomically move the latest pending completion of a challenge out of
+        "pending" (fields holds the new status and validation details).
+        Returns the completion as it was, or None if nothing was pending.
+        """
+        return await self.collection.find_one_and_update(
+            {"user_id": user_id, "challenge_id": challenge_id, "status": PENDING},
+            {"$set": fields},
+            sort=[("completed_at", -1)],
+            projection=COMPLETION_PROJECTION,
+            return_document=ReturnDocument.BEFORE
+        )
+
+    # ── Migration ─────────────────────────────────────────────────────────────
+
+    async def migrate_user(self, user_id: str, stats: Optional[dict] = None) -> int:
+        """
+        Move a user's embedded arrays into the collection and store the
+        challenges_completed aggregate. Idempotent: completions are upserted on
+        the unique daily key.
+        """
+        if stats is None:
+            stats = await self.db.gamification_stats.find_one(
+                {"user_id": user_id, "$or": [
+                    {"completed_challenges": {"$exists": True}}, {"pending_validations": {"$exists": True}}
+                ]},
+                {"_id": 0, "completed_challenges": 1, "pending_validations": 1}
+            )
+            if stats is None:
+                self._migrated[user_id] = True
+                return 0
+
+        records = legacy_completions(stats)
+        if records:
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {"user_id": user_id, "completed_date": r["completed_date"], "challenge_id": r["challenge_id"]},
+                    {"$setOnInsert": completion_document(user_id, r)},
+                    upsert=True
+                )
+                for r in records
+            ], ordered=False)
+        # Counted after the upserts, so completions recorded meanwhile are included
+        completed = await self.collection.count_documents({"user_id": user_id})
+        await self.db.gamification_stats.update_one(
+            {"user_id": user_id},
+            {"$set": {"challenges_completed": completed}, "$unset": {"completed_challenges": "", "pending_validations": ""}}
+        )
+
+        self._migrated[user_id] = True
+        self.migrated_users += 1
+        self.migrated_completions += len(records)
+        return len(records)
+
+    async def ensure_migrated(self, user_id: str) -> bool:
+        """Compatibility path: True if the user's embedded arrays had to be moved now"""
+        if user_id in self._migrated:
+            return False
+        return await self.migrate_user(user_id) > 0
+
+    async def migrate_all(self, batch_size: int = 500) -> dict:
+        """Move every embedded array still present; resumable at any point"""
+        users = moved = 0
+        cursor = self.db.gamification_stats.find(
+            {"$or": [{"completed_challenges": {"$exists": True}}, {"pending_validations": {"$exists": True}}]},
+            {"_id": 0, "user_id": 1, "completed_challenges": 1, "pending_validations": 1}
+        ).batch_size(batch_size)
+        async for stats in cursor:
+            moved += await self.migrate_user(stats["user_id"], stats)
+            users += 1
+        return {"users": users, "completions": moved}
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    async def of_day(self, user_id: str, date: str) -> List[dict]:
+        """Completions of one day: at most one per challenge"""
+        return await self.collection.find(
+            {"user_id": user_id, "completed_date": date}, COMPLETION_PROJECTION
+        ).to_list(None)
+
+    async def pending(self, user_ids: List[str]) -> Dict[str, List[dict]]:
+        """Pending completions of several users, most recent first, in one query"""
+        by_user = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return by_user
+        cursor = self.collection.find(
+            {"user_id": {"$in": user_ids}, "status": PENDING}, {**COMPLETION_PROJECTION, "user_id": 1}
+        ).sort("completed_at", -1)
+        async for completion in cursor:
+            by_user[completion.pop("user_id")].append(completion)
+        return by_user
+
+    def stats(self) -> dict:
+        return {
+            "migrated_users": self.migrated_users,
+            "migrated_completions": self.migrated_completions,
+            "known_migrated": len(self._migrated),
+        }
@@ -0,0 +1,134 @@
+"""
+Curriculum Cache
+The kyu levels and their techniques only change through the admin endpoints
+(kyu/technique CRUD, practice recording, /seed, /reseed), yet /kyu-levels,
+/statistics and /public-stats read the whole collection on every request.
+The collection is loaded once per process, with the derived counts computed
+at load time; the write endpoints call invalidate() and the next read reloads.
+
+Writes made outside this process (another worker, the shell) can be picked up
+by watching the collection's change stream, which needs a replica set.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Categories of the curriculum that are not grades
+WEAPON_CATEGORIES = ['bokken', 'jo', 'tanto', 'aïkiken', 'aikiken', 'aïkijo', 'aikijo']
+DAN_NAMES = ['dan', 'shodan', 'nidan', 'sandan', 'yondan']
+
+
+def grade_kind(name: str) -> Optional[str]:
+    """"kyu", "dan", or None for a weapon category or another level"""
+    name = (name or '').lower()
+    if any(weapon in name for weapon in WEAPON_CATEGORIES):
+        return None
+    if any(dan in name for dan in DAN_NAMES):
+        return "dan"
+    if 'kyu' in name:
+        return "kyu"
+    return None
+
+
+class Curriculum:
+    """A loaded curriculum and the values derived from it"""
+
+    def __init__(self, levels: List[dict]):
+        self.levels = levels
+        # /kyu-levels order; sorted() is stable so ties keep the collection order
+        self.by_order = sorted(levels, key=lambda kyu: kyu.get('order', 0), reverse=True)
+        self.by_id: Dict[str, dict] = {kyu['id']: kyu for kyu in levels if 'id' in kyu}
+        self.techniques_by_level = [
+            {"name": kyu.get('name'), "color": kyu.get('color'), "total": len(kyu.get('techniques', []))}
+            for kyu in levels
+        ]
+        self.total_techniques = sum(level["total"] for level in self.techniques_by_level)
+        kinds = [grade_kind(kyu.get('name')) for kyu in levels]
+        self.kyu_count = kinds.count("kyu")
+        self.dan_count = kinds.count("dan")
+        self._rendered: Dict[str, bytes] = {}
+
+    def rendered(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """Response body computed once for this load of the curriculum"""
+        if key not in self._rendered:
+            self._rendered[key] = render()
+        return self._rendered[key]
+
+
+class CurriculumCache:
+    """kyu_levels loaded once per process, reloaded after invalidate()"""
+
+    def __init__(self, db, prepare: Optional[Callable[[dict], object]] = None):
+        self.db = db
+        self.prepare = prepare
+        self._curriculum: Optional[Curriculum] = None
+        self._loading: Optional[asyncio.Future] = None
+        self._generation = 0
+        self.loads = 0
+        self.hits = 0
+        self.invalidations = 0
+        self.loaded_at: Optional[str] = None
+        self.watching = False
+
+    async def get(self) -> Curriculum:
+        if self._curriculum is not None:
+            self.hits += 1
+            return self._curriculum
+        # Concurrent misses share one load
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load(self._generation))
+        return await asyncio.shield(self._loading)
+
+    async def _load(self, generation: int) -> Curriculum:
+        try:
+            levels = await self.db.kyu_levels.find({}, {"_id": 0}).to_list(None)
+            if self.prepare:
+                for kyu in levels:
+                    self.prepare(kyu)
+            curriculum = Curriculum(levels)
+            self.loads += 1
+            # A load that started before an invalidate() may predate the write: serve it, do not keep it
+            if generation == self._generation:
+                self._curriculum = curriculum
+                self.loaded_at = datetime.now(timezone.utc).isoformat()
+            return curriculum
+        finally:
+            if generation == self._generation:
+                self._loading = None
+
+    def invalidate(self):
+        self.invalidations += 1
+        self._generation += 1
+        self._curriculum = None
+        self._loading = None
+
+    async def watch(self, retry_interval: float = 30):
+        """Invalidate on every change of kyu_levels, including writes from other processes"""
+        while True:
+            try:
+                async with self.db.kyu_levels.watch() as stream:
+                    self.watching = True
+                    # Changes made before the stream opened
+                    self.invalidate()
+                    async for _ in stream:
+                        self.invalidate()
+            except PyMongoError as e:
+                logger.warning(f"Curriculum change stream unavailable ({e}), retrying in {retry_interval}s")
+            self.watching = False
+            await asyncio.sleep(retry_interval)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._curriculum is not None,
+            "loaded_at": self.loaded_at,
+            "loads": self.loads,
+            "hits": self.hits,
+            "invalidations": self.invalidations,
+            "watching": self.watching,
+        }
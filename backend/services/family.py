@@ -0,0 +1,36 @@
+"""
+Family Loading
+The parent routes show each child of a family, sometimes with their
+gamification stats. The children are loaded with one $in query per
+collection, run concurrently, whatever the size of the family.
+"""
+
+import asyncio
+from typing import List, Optional
+
+
+async def load_children(db, children_ids: List[str], user_fields: List[str], stats_fields: Optional[List[str]] = None):
+    """
+    Charge en lot les enfants d'une famille : une requête $in sur users et, si
+    stats_fields est fourni, une sur gamification_stats, quel que soit le nombre
+    d'enfants. Retourne [(child_id, enfant ou None, stats ou None)] dans l'ordre
+    de children_ids.
+    """
+    if not children_ids:
+        return []
+
+    users_query = db.users.find(
+        {"id": {"$in": children_ids}},
+        {"_id": 0, "id": 1, **{field: 1 for field in user_fields}}
+    ).to_list(len(children_ids))
+    if stats_fields is None:
+        children, stats = await users_query, []
+    else:
+        children, stats = await asyncio.gather(users_query, db.gamification_stats.find(
+            {"user_id": {"$in": children_ids}},
+            {"_id": 0, "user_id": 1, **{field: 1 for field in stats_fields}}
+        ).to_list(len(children_ids)))
+
+    children_by_id = {child["id"]: child for child in children}
+    stats_by_id = {entry["user_id"]: entry for entry in stats}
+    return [(child_id, children_by_id.get(child_id), stats_by_id.get(child_id)) for child_id in children_ids]
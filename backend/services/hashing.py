@@ -0,0 +1,96 @@
+"""
+Password Hashing Service
+Runs bcrypt hashing and verification on a bounded worker pool so that
+credential checks never block the event loop.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# bcrypt releases the GIL while hashing, so a thread pool gives real parallelism.
+HASHING_MAX_WORKERS = int(os.environ.get('HASHING_MAX_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+class HashingPool:
+    """Thread pool dedicated to bcrypt, with queue-depth metrics"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._max_queued = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def _track(self, func, submitted_at: float):
+        def run(*args):
+            started_at = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._total_wait += started_at - submitted_at
+            try:
+                return func(*args)
+            finally:
+                finished_at = time.perf_counter()
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    self._total_run += finished_at - started_at
+        return run
+
+    async def run(self, func, *args):
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._track(func, time.perf_counter()), *args)
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "active": self._active,
+                "max_queued": self._max_queued,
+                "completed": completed,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 2) if completed else 0.0,
+                "avg_run_ms": round(self._total_run / completed * 1000, 2) if completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+hashing_pool = HashingPool(HASHING_MAX_WORKERS)
+
+
+def _hashpw(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _checkpw(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    return await hashing_pool.run(_hashpw, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Check a password against its bcrypt hash on the hashing pool"""
+    return await hashing_pool.run(_checkpw, password, hashed)
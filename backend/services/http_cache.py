@@ -0,0 +1,112 @@
+"""
+HTTP Cache
+Payloads that only change with the code are serialized once, at import, into
+the bytes sent on the wire together with a strong ETag (hash of those bytes).
+Serving them costs no validation and no serialization, and a client sending
+the ETag back in If-None-Match gets an empty 304.
+
+Routes returning reference data declare it with @static_for_build: their
+result is computed on the first call and then served as a StaticPayload with
+a long max-age. ETags include BUILD_VERSION, so a deployment bumping it
+invalidates every cached copy.
+
+Payloads also keep their gzip/brotli variants, compressed once, each with its
+own ETag; the compression middleware passes them through as they are.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+from typing import Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from services.compression import choose_encoding, precompress
+
+# Identifies the deployed build; changing it changes every ETag
+BUILD_VERSION = os.environ.get('BUILD_VERSION', 'dev')
+STATIC_MAX_AGE_SECONDS = int(os.environ.get('STATIC_MAX_AGE_SECONDS', 86400))
+STATIC_CACHE_CONTROL = f"public, max-age={STATIC_MAX_AGE_SECONDS}"
+
+
+def dump_json(content) -> bytes:
+    """Same bytes as FastAPI's JSONResponse for `content`"""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class StaticPayload:
+    """A JSON body serialized once, with its strong ETag and its compressed variants"""
+
+    __slots__ = ("body", "etag", "encoded")
+
+    def __init__(self, content):
+        self.body = dump_json(content)
+        digest = hashlib.sha256(BUILD_VERSION.encode("utf-8") + b"\0" + self.body).hexdigest()
+        self.etag = f'"{digest[:32]}"'
+        # encoding -> (body, ETag): a strong ETag identifies one representation
+        self.encoded = {
+            encoding: (body, f'"{digest[:32]}-{encoding}"')
+            for encoding, body in precompress(self.body).items()
+        }
+
+    def variant(self, accept_encoding: Optional[str]):
+        """(body, ETag, Content-Encoding or None) to send for this Accept-Encoding"""
+        encoding = choose_encoding(accept_encoding)
+        if encoding in self.encoded:
+            body, etag = self.encoded[encoding]
+            return body, etag, encoding
+        return self.body, self.etag, None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def cached_response(request: Request, payload: StaticPayload, cache_control: str) -> Response:
+    """200 with the pre-serialized body, or 304 if the client already has it"""
+    body, etag, encoding = payload.variant(request.headers.get("accept-encoding"))
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def static_for_build(endpoint):
+    """
+    Decorator for a route without parameters whose result only changes with
+    the build: computed once, then served pre-serialized with ETag/304.
+    """
+    if inspect.signature(endpoint).parameters:
+        raise TypeError(f"{endpoint.__name__}: a static route takes no parameters")
+    payload: Optional[StaticPayload] = None
+
+    @functools.wraps(endpoint)
+    async def serve(request: Request) -> Response:
+        nonlocal payload
+        if payload is None:
+            payload = StaticPayload(await endpoint())
+        return cached_response(request, payload, STATIC_CACHE_CONTROL)
+
+    # FastAPI reads the signature: the wrapper only needs the request
+    serve.__signature__ = inspect.Signature([
+        inspect.Parameter("request", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request)
+    ])
+    return serve
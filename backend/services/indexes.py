@@ -0,0 +1,216 @@
+"""
+MongoDB Index Registry
+Declares the indexes every hot query path relies on, applies them at startup
+(idempotently, in the background) and audits the live indexes against the
+registry: missing, unused (from $indexStats) and redundant (prefix of another
+index on the same collection).
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = Tuple[Tuple[str, int], ...]
+
+
+class IndexSpec:
+    """One declared index: key pattern plus options"""
+
+    def __init__(self, *keys: Tuple[str, int], unique: bool = False):
+        self.keys: IndexKeys = tuple(keys)
+        self.unique = unique
+
+    @property
+    def name(self) -> str:
+        # Same naming scheme as the MongoDB default (e.g. "user_id_1_date_1")
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "keys": [list(k) for k in self.keys], "unique": self.unique}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# REGISTRY
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+INDEX_REGISTRY: Dict[str, List[IndexSpec]] = {
+    "users": [
+        IndexSpec(("id", ASCENDING), unique=True),
+        IndexSpec(("email", ASCENDING)),
+        IndexSpec(("dojo_id", ASCENDING), ("id", ASCENDING)),
+    ],
+    "gamification_stats": [
+        IndexSpec(("user_id", ASCENDING), unique=True),
+        IndexSpec(("last_activity_date", ASCENDING)),
+    ],
+    "leaderboard": [
+        IndexSpec(("user_id", ASCENDING), unique=True),
+        IndexSpec(("total_xp", DESCENDING), ("user_id", ASCENDING)),
+        IndexSpec(("dojo_id", ASCENDING), ("total_xp", DESCENDING), ("user_id", ASCENDING)),
+    ],
+    "challenge_completions": [
+        IndexSpec(("user_id", ASCENDING), ("completed_date", ASCENDING), ("challenge_id", ASCENDING), unique=True),
+        IndexSpec(("user_id", ASCENDING), ("status", ASCENDING), ("completed_at", DESCENDING)),
+    ],
+    "xp_events": [
+        IndexSpec(("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)),
+        IndexSpec(("created_at", ASCENDING), ("user_id", ASCENDING)),
+    ],
+    "xp_snapshots": [
+        IndexSpec(("user_id", ASCENDING), unique=True),
+    ],
+    "attendance_records": [
+        IndexSpec(("user_id", ASCENDING), ("date", ASCENDING)),
+    ],
+    "messages": [
+        IndexSpec(("recipient_id", ASCENDING), ("created_at", DESCENDING)),
+        IndexSpec(("sender_id", ASCENDING), ("created_at", DESCENDING)),
+    ],
+    "journal_entries": [
+        IndexSpec(("id", ASCENDING), unique=True),
+        IndexSpec(("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)),
+    ],
+    "virtue_actions": [
+        IndexSpec(("user_id", ASCENDING), ("month", ASCENDING), ("action_id", ASCENDING), unique=True),
+        IndexSpec(("user_id", ASCENDING), ("logged_at", ASCENDING)),
+    ],
+    "virtue_totals": [
+        IndexSpec(("user_id", ASCENDING), unique=True),
+    ],
+    "observations": [
+        IndexSpec(("student_id", ASCENDING), ("created_at", DESCENDING)),
+        IndexSpec(("dojo_id", ASCENDING), ("created_at", DESCENDING)),
+    ],
+    "parents": [
+        IndexSpec(("id", ASCENDING), unique=True),
+        IndexSpec(("email", ASCENDING)),
+        IndexSpec(("child_user_ids", ASCENDING)),
+    ],
+    "enseignants": [
+        IndexSpec(("id", ASCENDING), unique=True),
+        IndexSpec(("email", ASCENDING)),
+        IndexSpec(("dojo_id", ASCENDING)),
+    ],
+    "payment_transactions": [
+        IndexSpec(("session_id", ASCENDING)),
+    ],
+    "subscriptions": [
+        IndexSpec(("id", ASCENDING)),
+        IndexSpec(("user_id", ASCENDING), ("status", ASCENDING)),
+    ],
+    "dojos": [
+        IndexSpec(("id", ASCENDING), unique=True),
+        IndexSpec(("email", ASCENDING)),
+    ],
+    "club_admins": [
+        IndexSpec(("email", ASCENDING)),
+        IndexSpec(("dojo_id", ASCENDING)),
+    ],
+    "club_members": [
+        IndexSpec(("id", ASCENDING)),
+        IndexSpec(("dojo_id", ASCENDING), ("email", ASCENDING)),
+    ],
+    "dojo_members": [
+        IndexSpec(("id", ASCENDING)),
+        IndexSpec(("dojo_id", ASCENDING), ("id", ASCENDING)),
+    ],
+    "members": [
+        IndexSpec(("id", ASCENDING)),
+        IndexSpec(("email", ASCENDING)),
+        IndexSpec(("created_at", DESCENDING), ("id", DESCENDING)),
+    ],
+    "kyu_levels": [
+        IndexSpec(("id", ASCENDING)),
+    ],
+    "password_resets": [
+        IndexSpec(("token", ASCENDING)),
+    ],
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# BOOTSTRAP
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+async def ensure_indexes(db, registry: Dict[str, List[IndexSpec]] = INDEX_REGISTRY) -> dict:
+    """Create every declared index; existing identical indexes are a no-op. Failures are logged, not raised."""
+    created, failed = [], []
+    for collection, specs in registry.items():
+        for spec in specs:
+            try:
+                await db[collection].create_index(list(spec.keys), name=spec.name, unique=spec.unique)
+                created.append(f"{collection}.{spec.name}")
+            except ConnectionFailure as e:
+                # No point trying the remaining indexes: each would wait for the server selection timeout
+                logger.error(f"Index bootstrap aborted, MongoDB unreachable: {e}")
+                failed.append({"index": f"{collection}.{spec.name}", "error": str(e)})
+                return {"ensured": len(created), "failed": failed}
+            except PyMongoError as e:
+                # e.g. duplicates preventing a unique index, or an existing index with other options
+                logger.warning(f"Index {collection}.{spec.name} not created: {e}")
+                failed.append({"index": f"{collection}.{spec.name}", "error": str(e)})
+    logger.info(f"Index bootstrap done: {len(created)} ensured, {len(failed)} failed")
+    return {"ensured": len(created), "failed": failed}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# AUDIT
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def _normalize_keys(key) -> IndexKeys:
+    """Key pattern from list_indexes() (SON/dict) as a tuple of (field, direction)"""
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in key.items())
+
+
+def find_missing(declared: List[IndexSpec], existing: Dict[str, IndexKeys]) -> List[dict]:
+    """Declared indexes whose key pattern does not exist on the collection"""
+    present = set(existing.values())
+    return [spec.to_dict() for spec in declared if spec.keys not in present]
+
+
+def find_redundant(existing: Dict[str, IndexKeys], unique: Dict[str, bool]) -> List[dict]:
+    """Non-unique indexes whose key pattern is a strict prefix of another index"""
+    redundant = []
+    for name, keys in existing.items():
+        if name == "_id_" or unique.get(name):
+            continue
+        for other_name, other_keys in existing.items():
+            if other_name != name and len(other_keys) > len(keys) and other_keys[:len(keys)] == keys:
+                redundant.append({"name": name, "covered_by": other_name})
+                break
+    return redundant
+
+
+async def audit_indexes(db, registry: Dict[str, List[IndexSpec]] = INDEX_REGISTRY) -> dict:
+    """Compare live indexes with the registry, per collection"""
+    collections = sorted(set(registry) | set(await db.list_collection_names()))
+    report = {}
+    for collection in collections:
+        existing, unique = {}, {}
+        async for index in db[collection].list_indexes():
+            existing[index["name"]] = _normalize_keys(index["key"])
+            unique[index["name"]] = bool(index.get("unique"))
+
+        unused = []
+        try:
+            async for stat in db[collection].aggregate([{"$indexStats": {}}]):
+                if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0:
+                    unused.append({"name": stat["name"], "since": stat["accesses"]["since"]})
+        except OperationFailure as e:
+            # $indexStats needs the indexStats privilege
+            logger.warning(f"$indexStats unavailable on {collection}: {e}")
+
+        declared = registry.get(collection, [])
+        declared_names = {spec.name for spec in declared}
+        report[collection] = {
+            "missing": find_missing(declared, existing),
+            "unused": unused,
+            "redundant": find_redundant(existing, unique),
+            "undeclared": sorted(name for name in existing if name != "_id_" and name not in declared_names),
+        }
+    return report
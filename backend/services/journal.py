@@ -0,0 +1,146 @@
+"""
+Private Journal
+Journal entries live in the `journal_entries` collection, one document per
+entry, instead of an ever-growing `journal` array on the user document (which
+is loaded on every authenticated request). Pages are keyset walks of the
+(user_id, created_at desc, id desc) index.
+
+Online migration: users written before this collection still carry an embedded
+`journal`. The first access to such a user's journal moves its entries into
+the collection, then removes them from the user document; the read that
+triggered it already sees them. `python maintenance.py migrate-journal`
+moves the remaining users in the background. Legacy entries without an id are
+moved too, under an id derived from the user and their rank among those
+entries, so that concurrent migrations agree on it.
+"""
+
+import logging
+import uuid
+from typing import List, Optional, Tuple
+
+from cachetools import LRUCache
+from pymongo import UpdateOne
+
+from services.pagination import fetch_page
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SORT = [("created_at", -1), ("id", -1)]
+ENTRY_FIELDS = ("id", "content", "mood", "tags", "created_at", "updated_at")
+ENTRY_PROJECTION = {"_id": 0, **{field: 1 for field in ENTRY_FIELDS}}
+
+
+def entry_document(user_id: str, entry: dict) -> dict:
+    """Collection document for an embedded journal entry"""
+    doc = {field: entry.get(field) for field in ENTRY_FIELDS}
+    doc["tags"] = doc["tags"] or []
+    doc["user_id"] = user_id
+    return doc
+
+
+def legacy_entry_id(user_id: str, rank: int) -> str:
+    """Stable id of the rank-th embedded entry without one (same id on every migration attempt)"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"journal/{user_id}/{rank}"))
+
+
+class JournalStore:
+    """Reads and writes of journal_entries, migrating embedded journals on first access"""
+
+    def __init__(self, db, migrated_cache_size: int = 100000):
+        self.db = db
+        self.collection = db.journal_entries
+        # Users known to have no embedded journal left (saves the users lookup)
+        self._migrated = LRUCache(maxsize=migrated_cache_size)
+        self.migrated_users = 0
+        self.migrated_entries = 0
+
+    # ── Migration ─────────────────────────────────────────────────────────────
+
+    async def migrate_user(self, user_id: str, journal: Optional[list] = None) -> int:
+        """
+        Move a user's embedded entries into the collection. Idempotent and safe
+        against concurrent calls: entries are upserted by id, and only the
+        entries moved here are pulled from the user document.
+        """
+        if journal is None:
+            user = await self.db.users.find_one(
+                {"id": user_id, "journal": {"$exists": True}}, {"_id": 0, "journal": 1}
+            )
+            journal = (user or {}).get("journal")
+            if journal is None:
+                self._migrated[user_id] = True
+                return 0
+
+        entries = [e for e in journal if isinstance(e, dict) and e.get("id")]
+        # Entries without an id were never written by the API; they get a stable one
+        without_id = [e for e in journal if isinstance(e, dict) and not e.get("id")]
+        entries += [{**e, "id": legacy_entry_id(user_id, rank)} for rank, e in enumerate(without_id)]
+        if entries:
+            await self.collection.bulk_write([
+                UpdateOne({"id": e["id"]}, {"$setOnInsert": entry_document(user_id, e)}, upsert=True)
+                for e in entries
+            ], ordered=False)
+            # $in with null also matches the entries that had no id
+            moved_ids = [e["id"] for e in entries] + ([None, ""] if without_id else [])
+            await self.db.users.update_one(
+                {"id": user_id},
+                {"$pull": {"journal": {"id": {"$in": moved_ids}}}}
+            )
+        # Only items that are not entries at all are left to drop with the array
+        await self.db.users.update_one(
+            {"id": user_id, "journal": {"$not": {"$elemMatch": {"id": {"$exists": True}}}}},
+            {"$unset": {"journal": ""}}
+        )
+
+        self._migrated[user_id] = True
+        self.migrated_users += 1
+        self.migrated_entries += len(entries)
+        return len(entries)
+
+    async def ensure_migrated(self, user_id: str) -> bool:
+        """Compatibility path: True if the user's embedded journal had to be moved now"""
+        if user_id in self._migrated:
+            return False
+        return await self.migrate_user(user_id) > 0
+
+    async def migrate_all(self, batch_size: int = 500) -> dict:
+        """Move every embedded journal still present; resumable at any point"""
+        users = moved = 0
+        cursor = self.db.users.find(
+            {"journal": {"$exists": True}}, {"_id": 0, "id": 1, "journal": 1}
+        ).batch_size(batch_size)
+        async for user in cursor:
+            moved += await self.migrate_user(user["id"], user.get("journal") or [])
+            users += 1
+        return {"users": users, "entries": moved}
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    async def page(self, user_id: str, limit: int, after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Most recent entries first; returns (entries, next_cursor)"""
+        return await fetch_page(
+            self.collection, {"user_id": user_id}, ENTRY_PROJECTION, JOURNAL_SORT, limit, after
+        )
+
+    async def count(self, user_id: str) -> int:
+        return await self.collection.count_documents({"user_id": user_id})
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    async def create(self, user_id: str, entry: dict):
+        await self.collection.insert_one(entry_document(user_id, entry))
+
+    async def update(self, user_id: str, entry_id: str, fields: dict) -> bool:
+        result = await self.collection.update_one({"id": entry_id, "user_id": user_id}, {"$set": fields})
+        return result.matched_count > 0
+
+    async def delete(self, user_id: str, entry_id: str) -> bool:
+        result = await self.collection.delete_one({"id": entry_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+    def stats(self) -> dict:
+        return {
+            "migrated_users": self.migrated_users,
+            "migrated_entries": self.migrated_entries,
+            "known_migrated": len(self._migrated),
+        }
@@ -0,0 +1,112 @@
+"""
+Materialized Leaderboard
+One document per player in the `leaderboard` collection, with the player's
+name and dojo denormalized, kept in sync on every XP change.
+
+Readers never touch `users`: the top-N is an index walk on
+(total_xp desc, user_id asc), globally or within a dojo, and a player's rank
+is a covered count of the index keys ranked above them.
+Run `python maintenance.py rebuild-leaderboard` to (re)build it from
+gamification_stats.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = "Ninja"
+ENTRY_PROJECTION = {"_id": 0, "user_id": 1, "name": 1, "dojo_id": 1, "total_xp": 1, "level": 1, "level_name": 1}
+
+
+class Leaderboard:
+    """Reads and incremental updates of the materialized leaderboard"""
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.leaderboard
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    async def record_xp(self, user_id: str, total_xp: int, level: int, level_name: str):
+        """Store a player's new XP; the name and dojo are read from users only for a new entry"""
+        fields = {
+            "total_xp": total_xp,
+            "level": level,
+            "level_name": level_name,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        result = await self.collection.update_one({"user_id": user_id}, {"$set": fields})
+        if result.matched_count:
+            return
+
+        user = await self.db.users.find_one({"id": user_id}, {"_id": 0, "first_name": 1, "dojo_id": 1})
+        await self.collection.update_one(
+            {"user_id": user_id},
+            {
+                "$set": fields,
+                "$setOnInsert": {
+                    "name": (user or {}).get("first_name") or DEFAULT_NAME,
+                    "dojo_id": (user or {}).get("dojo_id")
+                }
+            },
+            upsert=True
+        )
+
+    async def move_player(self, user_id: str, dojo_id: str):
+        await self.collection.update_one({"user_id": user_id}, {"$set": {"dojo_id": dojo_id}})
+
+    async def move_dojo(self, from_dojo_id: str, to_dojo_id: str):
+        await self.collection.update_many({"dojo_id": from_dojo_id}, {"$set": {"dojo_id": to_dojo_id}})
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    async def top(self, limit: int, dojo_id: Optional[str] = None) -> List[dict]:
+        query = {"dojo_id": dojo_id} if dojo_id else {}
+        entries = await self.collection.find(query, ENTRY_PROJECTION).sort(
+            [("total_xp", -1), ("user_id", 1)]
+        ).limit(limit).to_list(length=limit)
+        for i, entry in enumerate(entries):
+            entry["rank"] = i + 1
+        return entries
+
+    async def rank_of(self, user_id: str, dojo_id: Optional[str] = None) -> Optional[dict]:
+        """A player's entry with its rank, using the same order as top(); None if not ranked"""
+        entry = await self.collection.find_one({"user_id": user_id}, ENTRY_PROJECTION)
+        if not entry or (dojo_id and entry.get("dojo_id") != dojo_id):
+            return None
+
+        ahead = {"$or": [
+            {"total_xp": {"$gt": entry["total_xp"]}},
+            {"total_xp": entry["total_xp"], "user_id": {"$lt": user_id}}
+        ]}
+        if dojo_id:
+            ahead["dojo_id"] = dojo_id
+        entry["rank"] = await self.collection.count_documents(ahead) + 1
+        return entry
+
+    # ── Rebuild ───────────────────────────────────────────────────────────────
+
+    async def rebuild(self) -> dict:
+        """Recompute every entry from gamification_stats and users, then drop players without stats"""
+        started_at = datetime.now(timezone.utc).isoformat()
+        await self.db.gamification_stats.aggregate([
+            {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+            {"$project": {
+                "_id": 0,
+                "user_id": 1,
+                "total_xp": {"$ifNull": ["$total_xp", 0]},
+                "level": {"$ifNull": ["$level", 1]},
+                "level_name": {"$ifNull": ["$level_name", "Petit Scarabée"]},
+                "name": {"$ifNull": [{"$arrayElemAt": ["$user.first_name", 0]}, DEFAULT_NAME]},
+                "dojo_id": {"$arrayElemAt": ["$user.dojo_id", 0]},
+                "updated_at": started_at
+            }},
+            {"$merge": {"into": "leaderboard", "on": "user_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]).to_list(length=None)
+
+        removed = await self.collection.delete_many({"updated_at": {"$lt": started_at}})
+        total = await self.collection.count_documents({})
+        logger.info(f"Leaderboard rebuilt: {total} players, {removed.deleted_count} stale entries removed")
+        return {"players": total, "removed": removed.deleted_count}
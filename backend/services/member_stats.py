@@ -0,0 +1,56 @@
+"""
+Members Statistics
+The /members-stats counters. Each collection is counted with a single $facet
+aggregation (one pass whatever the number of counts) and the three
+collections are counted concurrently. The result is served by a
+RollupSnapshot (services/snapshots.py) refreshed in the background.
+"""
+
+import asyncio
+
+
+async def count_facets(collection, counts: dict) -> dict:
+    """Run several counts on a collection in one $facet aggregation; counts maps name -> $match filter"""
+    facets = {
+        name: ([{"$match": query}] if query else []) + [{"$count": "count"}]
+        for name, query in counts.items()
+    }
+    result = await collection.aggregate([{"$facet": facets}]).to_list(length=1)
+    # $count emits no document when nothing matches: the facet is [] (empty collection included)
+    rows = result[0] if result else {}
+    return {name: rows[name][0]["count"] if rows.get(name) else 0 for name in counts}
+
+
+async def compute_members_stats(db) -> dict:
+    """Members statistics: one $facet per collection, the three run concurrently"""
+    users, dojos, legacy = await asyncio.gather(
+        count_facets(db.users, {
+            "total": {},
+            "active": {"is_active": True},
+            "inactive": {"is_active": False},
+            "active_subscriptions": {"subscription_status": {"$in": ["active", "trialing"]}},
+            # Children: users with role 'enfant' or parent_id set
+            "children": {"$or": [
+                {"role": "enfant"},
+                {"parent_id": {"$exists": True, "$ne": None}}
+            ]}
+        }),
+        count_facets(db.dojos, {"total": {}, "active": {"is_active": True}}),
+        # Also check legacy members collection
+        count_facets(db.members, {"total": {}, "active": {"status": "active"}})
+    )
+
+    total_users = users["total"]
+    total_children = users["children"]
+    return {
+        "total_members": total_users + legacy["total"],
+        "totalUsers": total_users,
+        "totalDojos": dojos["total"],
+        "activeDojos": dojos["active"],
+        "activeSubscriptions": users["active_subscriptions"],
+        "pending": 0,
+        "active": users["active"] + legacy["active"],
+        "inactive": users["inactive"],
+        "total_children": total_children,
+        "adult_members": total_users - total_children
+    }
@@ -0,0 +1,69 @@
+"""
+Keyset Pagination
+Cursor-based pages over an indexed sort key: each page is one bounded index
+walk starting after the last document of the previous page, so memory per
+request is flat whatever the collection size.
+
+The cursor is an opaque token holding the sort values of the last document;
+the sort must end with a unique field (usually "id") to be a total order.
+Cursors come from the client: only scalar values are accepted, so that a
+crafted cursor cannot put an operator ({"$ne": null}...) in the filter.
+"""
+
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+from fastapi import HTTPException
+
+SortSpec = List[Tuple[str, int]]
+CURSOR_VALUE_TYPES = (str, int, float, bool, type(None), datetime, ObjectId)
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    # Malformed extended JSON ({"$oid": "zz"}, {"$date": "nope"}...) raises any of these
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError, IndexError, TypeError, ArithmeticError, BSONError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    if (not isinstance(values, list) or len(values) != size
+            or not all(isinstance(value, CURSOR_VALUE_TYPES) for value in values)):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: list) -> dict:
+    """Filter matching the documents strictly after `values` in `sort` order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+async def fetch_page(collection, query: dict, projection: dict, sort: SortSpec,
+                     limit: int, after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of `collection` in `sort` order, after the `after` cursor.
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    The projection must keep the sort fields.
+    """
+    if after:
+        keyset = keyset_filter(sort, decode_cursor(after, len(sort)))
+        query = {"$and": [query, keyset]} if query else keyset
+
+    # One extra document tells whether another page exists
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+
+    docs = docs[:limit]
+    return docs, encode_cursor([docs[-1].get(field) for field, _ in sort])
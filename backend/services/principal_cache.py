@@ -0,0 +1,100 @@
+"""
+Principal Cache
+Per-process TTL/LRU cache of authenticated user documents, keyed by user id.
+Entries may hold the full document or only the fields loaded by a projected
+query; a lookup hits only if every requested field has been loaded.
+Handlers that modify a user must call invalidate() so the next request
+reloads the document from MongoDB.
+"""
+
+import os
+import time
+import threading
+from typing import Iterable, Optional
+
+from cachetools import TTLCache
+
+# Configuration
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 2048))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 30))
+
+# Marker for entries holding the whole user document
+FULL_DOCUMENT = None
+
+
+class _Entry:
+    __slots__ = ("doc", "fields", "loaded_at")
+
+    def __init__(self, doc: dict, fields: Optional[frozenset], loaded_at: float):
+        self.doc = doc
+        self.fields = fields
+        self.loaded_at = loaded_at
+
+    def covers(self, fields: Optional[frozenset]) -> bool:
+        if self.fields is FULL_DOCUMENT:
+            return True
+        return fields is not FULL_DOCUMENT and fields <= self.fields
+
+
+class PrincipalCache:
+    """Bounded cache of (possibly partial) user documents with hit/miss counters"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str, fields: Optional[Iterable[str]] = FULL_DOCUMENT) -> Optional[dict]:
+        """Return a copy of the cached user restricted to `fields` (all fields if None)"""
+        wanted = FULL_DOCUMENT if fields is FULL_DOCUMENT else frozenset(fields)
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is None or not entry.covers(wanted) or time.monotonic() - entry.loaded_at > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if wanted is FULL_DOCUMENT:
+                # Shallow copy: handlers may add keys to the dict they receive
+                return dict(entry.doc)
+            return {k: entry.doc[k] for k in wanted if k in entry.doc}
+
+    def set(self, user_id: str, user: dict, fields: Optional[Iterable[str]] = FULL_DOCUMENT):
+        """Store a user document, or the result of a query projected on `fields`"""
+        loaded = FULL_DOCUMENT if fields is FULL_DOCUMENT else frozenset(fields)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if loaded is not FULL_DOCUMENT and entry is not None and now - entry.loaded_at <= self.ttl:
+                # Merge with the fields already loaded; the oldest load time bounds staleness
+                doc = {**entry.doc, **user}
+                merged = FULL_DOCUMENT if entry.fields is FULL_DOCUMENT else entry.fields | loaded
+                self._cache[user_id] = _Entry(doc, merged, entry.loaded_at)
+            else:
+                self._cache[user_id] = _Entry(dict(user), loaded, now)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self.invalidations += 1
+            self._cache.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += 1
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
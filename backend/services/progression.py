@@ -0,0 +1,100 @@
+"""
+Progression Counters
+Keeps `progression_stats` (techniques mastered / in progress, total practice
+sessions) on the user document, updated in the same atomic pipeline update as
+the technique entry it summarizes.
+
+Users written before these counters existed get them computed from their whole
+`progression` on their next update, or all at once with
+`python maintenance.py backfill-progression-stats`.
+"""
+
+from typing import Optional
+
+MASTERED_LEVELS = ["mastered"]
+IN_PROGRESS_LEVELS = ["learning", "practiced"]
+
+EMPTY_STATS = {"techniques_mastered": 0, "techniques_in_progress": 0, "total_sessions": 0}
+
+
+def practice_sessions(entry: dict):
+    """
+    An entry's practice_count as stats_expression counts it: missing or null is
+    0 ($ifNull), and values that are not numbers are ignored by $sum.
+    """
+    count = entry.get("practice_count")
+    if isinstance(count, (int, float)) and not isinstance(count, bool):
+        return count
+    return 0
+
+
+def summarize(progression: dict) -> dict:
+    """Counters of a progression dict, computed in Python (same rules as stats_expression)"""
+    entries = [p for p in (progression or {}).values() if isinstance(p, dict)]
+    return {
+        "techniques_mastered": sum(1 for p in entries if p.get("mastery_level") in MASTERED_LEVELS),
+        "techniques_in_progress": sum(1 for p in entries if p.get("mastery_level") in IN_PROGRESS_LEVELS),
+        "total_sessions": sum(practice_sessions(p) for p in entries),
+    }
+
+
+# ── Aggregation expressions ───────────────────────────────────────────────────
+
+def _is_in(expression, values) -> dict:
+    return {"$cond": [{"$in": [{"$ifNull": [expression, None]}, values]}, 1, 0]}
+
+
+def _entries() -> dict:
+    return {"$objectToArray": {"$ifNull": ["$progression", {}]}}
+
+
+def stats_expression() -> dict:
+    """Aggregation expression recomputing every counter from the whole progression (same rules as summarize)"""
+    return {
+        "techniques_mastered": {"$sum": {"$map": {"input": _entries(), "in": _is_in("$$this.v.mastery_level", MASTERED_LEVELS)}}},
+        "techniques_in_progress": {"$sum": {"$map": {"input": _entries(), "in": _is_in("$$this.v.mastery_level", IN_PROGRESS_LEVELS)}}},
+        "total_sessions": {"$sum": {"$map": {"input": _entries(), "in": {"$ifNull": ["$$this.v.practice_count", 0]}}}},
+    }
+
+
+def progression_update(technique_id: str, mastery_level: Optional[str] = None,
+                       practice_count: Optional[int] = None, practice_increment: int = 0,
+                       timestamps: Optional[dict] = None) -> list:
+    """
+    Pipeline update setting one technique entry and adjusting the counters by the
+    transition from its previous state. Every expression reads the document as it
+    was before the update, so the whole change is atomic.
+    """
+    entry = f"progression.{technique_id}"
+    old_level = f"${entry}.mastery_level"
+    old_count = {"$ifNull": [f"${entry}.practice_count", 0]}
+    recomputed = stats_expression()
+
+    def counter(name, delta):
+        # Counters not yet materialized are rebuilt from the whole progression first
+        return {"$add": [{"$ifNull": [f"$progression_stats.{name}", recomputed[name]]}, delta]}
+
+    fields = {}
+    mastered_delta = in_progress_delta = 0
+    if mastery_level is not None:
+        fields[f"{entry}.mastery_level"] = {"$literal": mastery_level}
+        mastered_delta = {"$subtract": [int(mastery_level in MASTERED_LEVELS), _is_in(old_level, MASTERED_LEVELS)]}
+        in_progress_delta = {"$subtract": [int(mastery_level in IN_PROGRESS_LEVELS), _is_in(old_level, IN_PROGRESS_LEVELS)]}
+
+    if practice_count is not None:
+        new_count = {"$literal": practice_count}
+    else:
+        new_count = {"$add": [old_count, practice_increment]}
+    if practice_count is not None or practice_increment:
+        fields[f"{entry}.practice_count"] = new_count
+    sessions_delta = {"$subtract": [new_count, old_count]}
+
+    for name, value in (timestamps or {}).items():
+        fields[f"{entry}.{name}"] = {"$literal": value}
+
+    fields["progression_stats"] = {
+        "techniques_mastered": counter("techniques_mastered", mastered_delta),
+        "techniques_in_progress": counter("techniques_in_progress", in_progress_delta),
+        "total_sessions": counter("total_sessions", sessions_delta),
+    }
+    return [{"$set": fields}]
@@ -0,0 +1,45 @@
+"""
+JSON Serialization
+FastJSONResponse is the application's default response class: bodies are
+rendered by orjson, which handles datetime, UUID and enums natively, instead
+of json.dumps.
+
+Routes with a response_model are otherwise validated then encoded by FastAPI
+on every call. model_response() validates once (models already of the right
+type are not revalidated) and serializes straight to bytes in pydantic-core;
+FastAPI returns a Response as it is. model_json() gives the same bytes, for
+bodies cached across requests.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        # Types orjson does not know (models, Decimal, sets...) go through FastAPI's encoder
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def adapter_of(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def model_json(model, content: Any) -> bytes:
+    """`content` validated as `model` and serialized as FastAPI would (by alias)"""
+    adapter = adapter_of(model)
+    return adapter.dump_json(adapter.validate_python(content), by_alias=True)
+
+
+def model_response(model, content: Any, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """Response for a route declaring response_model=`model`, validated only once"""
+    return Response(model_json(model, content), status_code=status_code,
+                    media_type="application/json", headers=headers)
@@ -0,0 +1,157 @@
+"""
+Snapshot Cache
+Short-lived, per-process cache of computed endpoint payloads (lists, counts).
+Concurrent misses on the same key share a single load, and write paths call
+clear() so readers never wait out the TTL after a change they made.
+
+RollupSnapshot holds a single platform-wide rollup refreshed in the background:
+readers get the last computed value (stale-while-revalidate) and only the very
+first read waits for a computation.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """Keyed TTL cache of awaitable results, with single-flight loading"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, timer=time.monotonic)
+        self._inflight = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, or await `loader()` once and cache its result"""
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+
+        self.misses += 1
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._load(key, loader, self._generation, self._inflight))
+            self._inflight[key] = inflight
+        # shield: a cancelled request must not cancel the load shared with other waiters
+        return await asyncio.shield(inflight)
+
+    async def _load(self, key: Hashable, loader, generation: int, inflight: dict):
+        try:
+            value = await loader()
+            # Do not cache a value computed before a clear(): it may predate the write
+            if generation == self._generation:
+                self._cache[key] = value
+            return value
+        finally:
+            inflight.pop(key, None)
+
+    def clear(self):
+        self.invalidations += 1
+        self._generation += 1
+        self._cache.clear()
+        # Loads already running may have read stale data: later readers start a new one
+        self._inflight = {}
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._cache),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+class RollupSnapshot:
+    """Single computed value, refreshed periodically and on demand, served stale while refreshing"""
+
+    def __init__(self, name: str, loader: Callable[[], Awaitable[Any]], refresh_interval: float):
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self._loader = loader
+        self._value = None
+        self._computed_at = None
+        self._stale = True
+        self._refreshing = None
+        self.refreshes = 0
+        self.failures = 0
+        self.invalidations = 0
+        self.last_duration_ms = None
+
+    @property
+    def computed_at(self):
+        """Wall-clock time (epoch seconds) of the value being served"""
+        return self._computed_at
+
+    async def get(self) -> Any:
+        if self._value is None:
+            return await self.refresh()
+        if self._stale or time.time() - self._computed_at > self.refresh_interval:
+            self._start()
+        return self._value
+
+    def invalidate(self):
+        """Mark the value stale: the next read serves it once more and triggers a refresh"""
+        self.invalidations += 1
+        self._stale = True
+
+    async def refresh(self) -> Any:
+        """Recompute now; concurrent callers share the same computation"""
+        return await asyncio.shield(self._start())
+
+    def _start(self):
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._compute())
+            self._refreshing.add_done_callback(self._log_failure)
+        return self._refreshing
+
+    def _log_failure(self, task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Rollup {self.name} refresh failed, serving the previous value: {task.exception()}")
+
+    async def _compute(self):
+        started = time.perf_counter()
+        # Writes landing during the computation must trigger another refresh
+        self._stale = False
+        try:
+            value = await self._loader()
+        except Exception:
+            self.failures += 1
+            self._stale = True
+            raise
+        finally:
+            self._refreshing = None
+        self._value, self._computed_at = value, time.time()
+        self.refreshes += 1
+        self.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        return value
+
+    async def run_periodic(self):
+        """Background loop keeping the rollup fresh; failures are logged and retried next round"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Rollup {self.name} periodic refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> dict:
+        return {
+            "computed_at": self._computed_at,
+            "refresh_interval_seconds": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "invalidations": self.invalidations,
+            "last_duration_ms": self.last_duration_ms,
+        }
@@ -0,0 +1,95 @@
+"""
+Streak Maintenance
+Streaks only advance when a user is active, so an inactive user's streak_days
+would stay at its last value. This nightly job resets to 0 every streak whose
+last_activity_date is older than yesterday, so /gamification/stats and the
+parent dashboards show current streaks without recomputing them.
+
+Candidates are read from the last_activity_date index and reset with
+bulk_write in batches. Each update is guarded by the last_activity_date it was
+selected with, so a user who becomes active meanwhile keeps their new streak.
+
+These resets are not recorded in the XP ledger: rebuilt stats apply the same
+streak_cutoff (services/xp_ledger.py stats_fields).
+"""
+
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from services.xp import streak_cutoff
+
+logger = logging.getLogger(__name__)
+
+
+def seconds_until(hour: int, minute: int, now: datetime) -> float:
+    """Seconds from `now` to the next hour:minute (UTC)"""
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class StreakMaintenance:
+    """Bulk reset of broken streaks in gamification_stats"""
+
+    def __init__(self, db, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[dict] = None
+
+    async def reset_broken(self, today: Optional[date] = None) -> dict:
+        """Reset every broken streak; returns the documents matched/modified and the duration"""
+        started = time.perf_counter()
+        cutoff = streak_cutoff(today or datetime.now(timezone.utc).date())
+        collection = self.db.gamification_stats
+        cursor = collection.find(
+            {"last_activity_date": {"$lt": cutoff}, "streak_days": {"$gt": 0}},
+            {"_id": 1, "last_activity_date": 1}
+        ).batch_size(self.batch_size)
+
+        matched = modified = batches = 0
+        operations = []
+        async for stats in cursor:
+            operations.append(UpdateOne(
+                {"_id": stats["_id"], "last_activity_date": stats["last_activity_date"]},
+                {"$set": {"streak_days": 0}}
+            ))
+            if len(operations) >= self.batch_size:
+                result = await collection.bulk_write(operations, ordered=False)
+                matched, modified, batches = matched + result.matched_count, modified + result.modified_count, batches + 1
+                operations = []
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            matched, modified, batches = matched + result.matched_count, modified + result.modified_count, batches + 1
+
+        self.runs += 1
+        self.last_run = {
+            "ran_at": datetime.now(timezone.utc).isoformat(),
+            "cutoff": cutoff,
+            "matched": matched,
+            "modified": modified,
+            "batches": batches,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logger.info(f"Streak maintenance: {self.last_run}")
+        return self.last_run
+
+    async def run_nightly(self, hour: int = 0, minute: int = 5):
+        """Background loop running reset_broken every day at hour:minute UTC"""
+        while True:
+            await asyncio.sleep(seconds_until(hour, minute, datetime.now(timezone.utc)))
+            try:
+                await self.reset_broken()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Streak maintenance failed: {e}")
+
+    def stats(self) -> dict:
+        return {"runs": self.runs, "failures": self.failures, "last_run": self.last_run}
@@ -0,0 +1,86 @@
+"""
+Token Verification Service
+Single role-aware JWT verification layer for every kind of account
+(users, enseignants, parents, club admins).
+
+Verified tokens are kept in a small LRU so hot tokens skip the signature
+check; expiry and role are still checked on every call.
+"""
+
+import os
+import time
+import threading
+from collections import defaultdict
+
+import jwt
+from cachetools import LRUCache
+from fastapi import HTTPException
+
+# Configuration
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+
+# Role → (claim check, HTTP status, detail) applied once the signature is valid
+ROLE_RULES = {
+    "user": (lambda p: bool(p.get("user_id")), 401, "Token invalide"),
+    "enseignant": (lambda p: p.get("role") == "enseignant", 403, "Accès réservé aux enseignants"),
+    "parent": (lambda p: p.get("role") == "parent", 403, "Accès réservé aux parents"),
+    "club_admin": (lambda p: p.get("role") == "club_admin", 403, "Accès réservé aux administrateurs de club"),
+}
+
+
+class TokenVerifier:
+    """Verifies JWTs for a given role, with an LRU of verified tokens and per-role counters"""
+
+    def __init__(self, secret: str, algorithm: str, cache_size: int = TOKEN_CACHE_SIZE):
+        self._secret = secret
+        self._algorithm = algorithm
+        self._cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {"verified": 0, "rejected": 0, "cache_hits": 0})
+
+    def _count(self, role: str, counter: str):
+        with self._lock:
+            self._counters[role][counter] += 1
+
+    def _reject(self, role: str, status_code: int, detail: str):
+        self._count(role, "rejected")
+        raise HTTPException(status_code=status_code, detail=detail)
+
+    def _cached(self, token: str):
+        with self._lock:
+            payload = self._cache.get(token)
+            if payload is not None and payload.get("exp", float("inf")) <= time.time():
+                # Expired since it was cached: fall back to a full decode, which rejects it
+                del self._cache[token]
+                return None
+            return payload
+
+    def verify(self, token: str, role: str) -> dict:
+        """Return the token payload or raise HTTPException (401 invalid/expired, 401/403 wrong role)"""
+        check, status_code, detail = ROLE_RULES[role]
+
+        payload = self._cached(token)
+        cache_hit = payload is not None
+        if not cache_hit:
+            try:
+                payload = jwt.decode(token, self._secret, algorithms=[self._algorithm])
+            except jwt.ExpiredSignatureError:
+                self._reject(role, 401, "Token expiré")
+            except jwt.InvalidTokenError:
+                self._reject(role, 401, "Token invalide")
+            with self._lock:
+                self._cache[token] = payload
+
+        if not check(payload):
+            self._reject(role, status_code, detail)
+
+        self._count(role, "cache_hits" if cache_hit else "verified")
+        return payload
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cache_size": len(self._cache),
+                "cache_maxsize": self._cache.maxsize,
+                "roles": {role: dict(counters) for role, counters in self._counters.items()},
+            }
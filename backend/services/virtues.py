@@ -0,0 +1,191 @@
+"""
+Virtue-Action Log
+Logged virtue actions live in the `virtue_actions` collection, one document
+per action, with a unique key on (user_id, month, action_id): the "once per
+month per action" rule is a single insert that either succeeds or raises
+DuplicateKeyError, whatever the length of the history. The month comes before
+action_id in the key so that the same index also serves "this month's actions".
+
+Totals per virtue are kept in `virtue_totals` (one document per user), so
+reading them never scans the log. They are only derived from the log: each
+insert recomputes the user's totals with one aggregation over their actions
+(at most one per catalog action and month), rather than a $inc that could not
+be atomic with the insert. Totals that missed an insert (failed or racing
+recompute) are eventually repaired by the user's next action, or by
+`python maintenance.py rebuild-virtue-totals`.
+
+Users written before this collection still carry an embedded `virtue_actions`
+array; it is moved on their first access (see JournalStore for the same
+pattern), or all at once with `python maintenance.py migrate-virtue-actions`.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from cachetools import LRUCache
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+ACTION_FIELDS = ("id", "virtue_id", "action_id", "action_type", "action_name", "points", "note", "logged_at")
+ACTION_PROJECTION = {"_id": 0, **{field: 1 for field in ACTION_FIELDS}}
+COUNTERS = ("individual_points", "collective_points", "total_points", "action_count")
+
+
+def month_of(logged_at) -> str:
+    """UTC month ("2025-01") of an ISO timestamp or datetime"""
+    if isinstance(logged_at, str):
+        try:
+            logged_at = datetime.fromisoformat(logged_at.replace('Z', '+00:00'))
+        except ValueError:
+            # Unparseable legacy dates keep their raw prefix
+            return logged_at[:7]
+    if logged_at.tzinfo is not None:
+        logged_at = logged_at.astimezone(timezone.utc)
+    return logged_at.strftime("%Y-%m")
+
+
+def summarize_totals(totals_doc: Optional[dict], virtue_ids: Iterable[str]) -> dict:
+    """Per-virtue totals for every known virtue (zeros when never logged) plus the grand totals"""
+    stored = (totals_doc or {}).get("virtues", {})
+    totals = {vid: {c: stored.get(vid, {}).get(c, 0) for c in COUNTERS} for vid in virtue_ids}
+    return {
+        "totals": totals,
+        "total_pv": sum(v["individual_points"] for v in totals.values()),
+        "total_pc": sum(v["collective_points"] for v in totals.values()),
+        "total_points": sum(v["total_points"] for v in totals.values()),
+    }
+
+
+def _totals_pipeline(user_id: str) -> list:
+    """Aggregation rebuilding a user's totals document from the log"""
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": "$virtue_id",
+            "individual_points": {"$sum": {"$cond": [{"$eq": ["$action_type", "individual"]}, "$points", 0]}},
+            "collective_points": {"$sum": {"$cond": [{"$eq": ["$action_type", "individual"]}, 0, "$points"]}},
+            "total_points": {"$sum": "$points"},
+            "action_count": {"$sum": 1},
+        }},
+    ]
+
+
+class VirtueLog:
+    """Inserts and reads of virtue_actions / virtue_totals, migrating embedded logs on first access"""
+
+    def __init__(self, db, migrated_cache_size: int = 100000):
+        self.db = db
+        self.collection = db.virtue_actions
+        self.totals = db.virtue_totals
+        # Users known to have no embedded log left (saves the users lookup)
+        self._migrated = LRUCache(maxsize=migrated_cache_size)
+        self.migrated_users = 0
+        self.migrated_actions = 0
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    async def log(self, user_id: str, action: dict):
+        """
+        Insert one action, then recompute the user's totals from the log;
+        raises DuplicateKeyError if it was already logged this month.
+        """
+        doc = {field: action.get(field) for field in ACTION_FIELDS}
+        doc["user_id"] = user_id
+        doc["month"] = month_of(doc["logged_at"])
+        await self.collection.insert_one(doc)
+        await self.rebuild_totals(user_id)
+
+    async def rebuild_totals(self, user_id: str):
+        """Replace a user's totals document by the totals of their whole log"""
+        groups = await self.collection.aggregate(_totals_pipeline(user_id)).to_list(None)
+        virtues = {g.pop("_id"): g for g in groups}
+        await self.totals.replace_one({"user_id": user_id}, {"user_id": user_id, "virtues": virtues}, upsert=True)
+
+    # ── Migration ─────────────────────────────────────────────────────────────
+
+    async def migrate_user(self, user_id: str, actions: Optional[list] = None) -> int:
+        """
+        Move a user's embedded actions into the collection and rebuild their
+        totals. Idempotent: actions are upserted on the unique monthly key, so
+        legacy duplicates within a month collapse into one.
+        """
+        if actions is None:
+            user = await self.db.users.find_one(
+                {"id": user_id, "virtue_actions": {"$exists": True}}, {"_id": 0, "virtue_actions": 1}
+            )
+            actions = (user or {}).get("virtue_actions")
+            if actions is None:
+                self._migrated[user_id] = True
+                return 0
+
+        entries = [a for a in actions if isinstance(a, dict) and a.get("id") and a.get("action_id")]
+        if entries:
+            requests = []
+            for action in entries:
+                doc = {field: action.get(field) for field in ACTION_FIELDS}
+                doc.update(user_id=user_id, month=month_of(doc["logged_at"] or ""))
+                key = {"user_id": user_id, "action_id": doc["action_id"], "month": doc["month"]}
+                requests.append(UpdateOne(key, {"$setOnInsert": doc}, upsert=True))
+            await self.collection.bulk_write(requests, ordered=False)
+            await self.db.users.update_one(
+                {"id": user_id},
+                {"$pull": {"virtue_actions": {"id": {"$in": [a["id"] for a in entries]}}}}
+            )
+            await self.rebuild_totals(user_id)
+        await self.db.users.update_one(
+            {"id": user_id, "virtue_actions": {"$not": {"$elemMatch": {"id": {"$exists": True}}}}},
+            {"$unset": {"virtue_actions": ""}}
+        )
+
+        self._migrated[user_id] = True
+        self.migrated_users += 1
+        self.migrated_actions += len(entries)
+        return len(entries)
+
+    async def ensure_migrated(self, user_id: str) -> bool:
+        """Compatibility path: True if the user's embedded log had to be moved now"""
+        if user_id in self._migrated:
+            return False
+        return await self.migrate_user(user_id) > 0
+
+    async def migrate_all(self, batch_size: int = 500) -> dict:
+        """Move every embedded log still present; resumable at any point"""
+        users = moved = 0
+        cursor = self.db.users.find(
+            {"virtue_actions": {"$exists": True}}, {"_id": 0, "id": 1, "virtue_actions": 1}
+        ).batch_size(batch_size)
+        async for user in cursor:
+            moved += await self.migrate_user(user["id"], user.get("virtue_actions") or [])
+            users += 1
+        return {"users": users, "actions": moved}
+
+    async def rebuild_all_totals(self) -> dict:
+        """Recompute the totals of every user with a logged action"""
+        users = await self.collection.distinct("user_id")
+        for user_id in users:
+            await self.rebuild_totals(user_id)
+        return {"users": len(users)}
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    async def month_actions(self, user_id: str, month: str) -> List[dict]:
+        """Actions of one month: at most one per catalog action"""
+        return await self.collection.find(
+            {"user_id": user_id, "month": month}, ACTION_PROJECTION
+        ).sort("logged_at", 1).to_list(None)
+
+    async def totals_of(self, user_id: str) -> Optional[dict]:
+        return await self.totals.find_one({"user_id": user_id}, {"_id": 0})
+
+    def history(self, user_id: str):
+        """Cursor over the whole log, oldest first (timeline / PDF export)"""
+        return self.collection.find({"user_id": user_id}, ACTION_PROJECTION).sort("logged_at", 1)
+
+    def stats(self) -> dict:
+        return {
+            "migrated_users": self.migrated_users,
+            "migrated_actions": self.migrated_actions,
+            "known_migrated": len(self._migrated),
+        }
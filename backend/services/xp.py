@@ -0,0 +1,161 @@
+"""
+XP Service
+Every XP gain is a single find_one_and_update with an update pipeline: total_xp
+is incremented, level / level_name recomputed from the new total, the streak
+and counters updated, all in one atomic round trip that returns the new stats
+document. Concurrent gains can no longer overwrite each other, and the
+returned document feeds the badge check without another read.
+
+Each gain is first appended to the XP ledger (services/xp_ledger.py), of which
+the stats document is a projection; the `on_insert` fields the update actually
+left are then recorded on that event.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# XP par niveau
+LEVEL_THRESHOLDS = [
+    {"level": 1, "name": "Petit Scarabée", "xp": 0},
+    {"level": 2, "name": "Jeune Poussin", "xp": 200},
+    {"level": 3, "name": "Apprenti Ninja", "xp": 500},
+    {"level": 4, "name": "Ninja Agile", "xp": 1000},
+    {"level": 5, "name": "Ninja Rapide", "xp": 2000},
+    {"level": 6, "name": "Super Ninja", "xp": 4000},
+    {"level": 7, "name": "Maître Ninja", "xp": 8000},
+    {"level": 8, "name": "Grand Maître", "xp": 15000},
+    {"level": 9, "name": "Légende Ninja", "xp": 30000},
+    {"level": 10, "name": "Dragon Suprême", "xp": 50000},
+]
+
+
+def get_level_from_xp(total_xp: int) -> dict:
+    """Calculate level and level name from total XP"""
+    current_level = LEVEL_THRESHOLDS[0]
+    for threshold in LEVEL_THRESHOLDS:
+        if total_xp >= threshold["xp"]:
+            current_level = threshold
+        else:
+            break
+    return current_level
+
+
+# Fields of a stats document created by its first XP gain
+NEW_STATS_DEFAULTS = {
+    "streak_days": 0,
+    "last_activity_date": None,
+    "badges": [],
+    "challenges_completed": 0,
+    "attendance_count": 0,
+    "techniques_validated": 0,
+}
+
+
+# ── Aggregation expressions ───────────────────────────────────────────────────
+
+def level_expression(key: str, total_xp="$total_xp") -> dict:
+    """$switch mapping total_xp to the `key` ("level" or "name") of its threshold"""
+    return {"$switch": {
+        "branches": [
+            {"case": {"$gte": [total_xp, t["xp"]]}, "then": t[key]}
+            for t in reversed(LEVEL_THRESHOLDS[1:])
+        ],
+        "default": LEVEL_THRESHOLDS[0][key]
+    }}
+
+
+def streak_expression(activity_date: str) -> dict:
+    """
+    Streak after an activity on `activity_date` (YYYY-MM-DD), from the stored
+    last_activity_date: +1 the day after, unchanged the same day (or if the
+    last activity is later), back to 1 otherwise.
+    """
+    yesterday = (date.fromisoformat(activity_date) - timedelta(days=1)).isoformat()
+    last = "$last_activity_date"
+    streak = {"$ifNull": ["$streak_days", 0]}
+    return {"$switch": {
+        "branches": [
+            {"case": {"$eq": [last, yesterday]}, "then": {"$add": [streak, 1]}},
+            {"case": {"$gte": [last, activity_date]}, "then": streak},
+        ],
+        # No activity yet (null/missing sorts before strings) or an older one
+        "default": 1
+    }}
+
+
+def streak_cutoff(today: date) -> str:
+    """Streaks whose last activity is before this date (YYYY-MM-DD) are broken"""
+    return (today - timedelta(days=1)).isoformat()
+
+
+def xp_pipeline(amount: int, counters: Optional[Dict[str, int]] = None,
+                activity_date: Optional[str] = None, on_insert: Optional[dict] = None,
+                created_at: Optional[str] = None) -> list:
+    """
+    Update pipeline of one XP gain. The first stage reads the document as it
+    was (defaults fill a document being created by the upsert); the second
+    derives the level from the new total.
+    """
+    defaults = {**NEW_STATS_DEFAULTS, **(on_insert or {}), "created_at": created_at}
+    fields = {
+        name: {"$ifNull": [f"${name}", {"$literal": value}]}
+        for name, value in defaults.items()
+    }
+    fields["total_xp"] = {"$add": [{"$ifNull": ["$total_xp", 0]}, amount]}
+    for name, increment in (counters or {}).items():
+        fields[name] = {"$add": [{"$ifNull": [f"${name}", 0]}, increment]}
+    if activity_date:
+        fields["streak_days"] = streak_expression(activity_date)
+        fields["last_activity_date"] = {"$literal": activity_date}
+
+    return [
+        {"$set": fields},
+        {"$set": {"level": level_expression("level"), "level_name": level_expression("name")}},
+    ]
+
+
+class XpService:
+    """Atomic XP gains on gamification_stats, logged to the ledger and mirrored to the leaderboard"""
+
+    def __init__(self, db, leaderboard, ledger):
+        self.db = db
+        self.leaderboard = leaderboard
+        self.ledger = ledger
+
+    async def gain(self, user_id: str, amount: int, source: str, counters: Optional[Dict[str, int]] = None,
+                   activity_date: Optional[str] = None, on_insert: Optional[dict] = None,
+                   ref: Optional[str] = None) -> dict:
+        """
+        Add `amount` XP (and `counters` increments) to a user's stats, creating
+        them if needed; `activity_date` also advances the streak. `source` and
+        `ref` identify the gain in the ledger. Returns the stats document after
+        the update.
+        """
+        # Ledger first: if the stats update fails, a rebuild still accounts for the gain
+        event = await self.ledger.append(user_id, amount, source, counters, activity_date, ref=ref)
+        pipeline = xp_pipeline(amount, counters, activity_date, on_insert,
+                               created_at=datetime.now(timezone.utc).isoformat())
+        try:
+            stats = await self._apply(user_id, pipeline)
+        except DuplicateKeyError:
+            # Two first gains raced on the upsert; the loser now finds the document
+            stats = await self._apply(user_id, pipeline)
+
+        # on_insert only fills missing fields (a stats document created empty keeps
+        # its streak): the event records the values the update actually left
+        if on_insert:
+            await self.ledger.record_applied(event["id"], {name: stats.get(name) for name in on_insert})
+        await self.leaderboard.record_xp(user_id, stats["total_xp"], stats["level"], stats["level_name"])
+        return stats
+
+    async def _apply(self, user_id: str, pipeline: list) -> dict:
+        return await self.db.gamification_stats.find_one_and_update(
+            {"user_id": user_id},
+            pipeline,
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
@@ -0,0 +1,271 @@
+"""
+XP Ledger
+Every XP gain is first appended to `xp_events` (source, amount, counters,
+activity date, timestamp); gamification_stats is a projection of that ledger.
+Events are never deleted, so totals can be rebuilt, disputes audited and
+windowed rankings computed over any period. The only write to an existing
+event records, once the stats update has returned, the `on_insert` fields it
+left (`set`); if that write fails the gain's XP and counters are still in the
+ledger and only those fields are missing from a rebuild.
+
+Compaction folds the events older than a cutoff into one checkpoint per user in
+`xp_snapshots`: rebuilding a user's stats reads that checkpoint plus the short
+tail of events written after it.
+
+Stats that predate the ledger enter it as "opening_balance" events per user
+(`python maintenance.py seed-xp-ledger`): the XP and counter deltas dated at the
+epoch so that they sort before every real event, and the streak as it was when
+seeding, dated after the events already logged.
+
+Rebuilt stats are as of the rebuild day: a streak whose last activity is
+before yesterday is broken and comes back as 0.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from services.pagination import keyset_filter
+from services.xp import get_level_from_xp, streak_cutoff
+
+logger = logging.getLogger(__name__)
+
+EVENT_ORDER = [("created_at", 1), ("id", 1)]
+OPENING_BALANCE = "opening_balance"
+EPOCH = "1970-01-01T00:00:00+00:00"
+COUNTERS = ("challenges_completed", "attendance_count")
+
+
+def empty_state() -> dict:
+    return {"total_xp": 0, "counters": {}, "streak_days": 0, "last_activity_date": None}
+
+
+def apply_event(state: dict, event: dict) -> dict:
+    """Fold one event into a state (same streak rule as streak_expression)"""
+    state["total_xp"] += event.get("amount", 0)
+    for name, increment in (event.get("counters") or {}).items():
+        state["counters"][name] = state["counters"].get(name, 0) + increment
+    # Values written as they were: the streak of an opening balance, the
+    # on_insert fields as the stats update left them
+    for name, value in (event.get("set") or {}).items():
+        state[name] = value
+
+    activity_date = event.get("activity_date")
+    if activity_date:
+        last = state["last_activity_date"]
+        if last and last == (date.fromisoformat(activity_date) - timedelta(days=1)).isoformat():
+            state["streak_days"] += 1
+        elif not last or last < activity_date:
+            state["streak_days"] = 1
+        state["last_activity_date"] = activity_date
+    return state
+
+
+def fold(state: dict, events: Iterable[dict]) -> dict:
+    for event in events:
+        apply_event(state, event)
+    return state
+
+
+def stats_fields(state: dict, today: Optional[date] = None) -> dict:
+    """gamification_stats fields derived from a ledger state, as of `today`"""
+    level = get_level_from_xp(state["total_xp"])
+    streak_days = state["streak_days"]
+    last = state["last_activity_date"]
+    if last and last < streak_cutoff(today or datetime.now(timezone.utc).date()):
+        streak_days = 0
+    return {
+        "total_xp": state["total_xp"],
+        "level": level["level"],
+        "level_name": level["name"],
+        "streak_days": streak_days,
+        "last_activity_date": state["last_activity_date"],
+        **{name: state["counters"].get(name, 0) for name in COUNTERS},
+    }
+
+
+class XpLedger:
+    """Appends to xp_events, compacts them into xp_snapshots and rebuilds stats from both"""
+
+    def __init__(self, db):
+        self.db = db
+        self.events = db.xp_events
+        self.snapshots = db.xp_snapshots
+        # Events older than this were compacted by this process already
+        self._compacted_before: Optional[str] = None
+        self.appended = 0
+        self.last_compaction: Optional[dict] = None
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    async def append(self, user_id: str, amount: int, source: str, counters: Optional[Dict[str, int]] = None,
+                     activity_date: Optional[str] = None, set_fields: Optional[dict] = None,
+                     ref: Optional[str] = None) -> dict:
+        event = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "amount": amount,
+            "source": source,
+            "counters": counters or {},
+            "activity_date": activity_date,
+            "set": set_fields or {},
+            "ref": ref,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        await self.events.insert_one(event)
+        event.pop("_id", None)
+        self.appended += 1
+        return event
+
+    async def record_applied(self, event_id: str, fields: dict):
+        """Values a gain's stats update actually left for its on_insert fields"""
+        await self.events.update_one({"id": event_id}, {"$set": {"set": fields}})
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    async def _tail(self, user_id: str, after: Optional[list], before: Optional[str] = None) -> List[dict]:
+        conditions = [{"user_id": user_id}]
+        if after:
+            conditions.append(keyset_filter(EVENT_ORDER, after))
+        if before:
+            conditions.append({"created_at": {"$lt": before}})
+        return await self.events.find({"$and": conditions}, {"_id": 0}).sort(EVENT_ORDER).to_list(None)
+
+    async def state_of(self, user_id: str, before: Optional[str] = None,
+                       snapshot: Optional[dict] = None) -> Tuple[dict, Optional[list], int]:
+        """
+        A user's ledger state from their checkpoint plus the events after it
+        (only those older than `before` if given). Returns (state, position of
+        the last event folded, number of tail events read).
+        """
+        if snapshot is None:
+            snapshot = await self.snapshots.find_one({"user_id": user_id}, {"_id": 0}) or {}
+        state = snapshot.get("state") or empty_state()
+        through = snapshot.get("through")
+        tail = await self._tail(user_id, through, before)
+        if tail:
+            through = [tail[-1]["created_at"], tail[-1]["id"]]
+        return fold(state, tail), through, len(tail)
+
+    # ── Compaction ────────────────────────────────────────────────────────────
+
+    async def compact_user(self, user_id: str, before: str) -> int:
+        """Fold the user's events older than `before` into their checkpoint; returns the events folded"""
+        snapshot = await self.snapshots.find_one({"user_id": user_id}, {"_id": 0}) or {}
+        previous = snapshot.get("through")
+        state, through, folded = await self.state_of(user_id, before, snapshot)
+        if not folded:
+            return 0
+        # Only replaces the checkpoint it started from: a concurrent compaction of the same user wins
+        try:
+            await self.snapshots.update_one(
+                {"user_id": user_id, "through": previous},
+                {"$set": {"state": state, "through": through, "compacted_at": datetime.now(timezone.utc).isoformat()}},
+                upsert=not snapshot
+            )
+        except DuplicateKeyError:
+            return 0
+        return folded
+
+    async def compact(self, older_than: timedelta, workers: int = 4) -> dict:
+        """Checkpoint every user with events older than `older_than` not yet folded"""
+        started = time.perf_counter()
+        before = (datetime.now(timezone.utc) - older_than).isoformat()
+        window = {"$lt": before}
+        if self._compacted_before:
+            window["$gte"] = self._compacted_before
+        user_ids = await self.events.distinct("user_id", {"created_at": window})
+
+        folded = await self._run_parallel(user_ids, lambda uid: self.compact_user(uid, before), workers)
+        self._compacted_before = before
+        self.last_compaction = {
+            "users": len(user_ids),
+            "events": sum(folded),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "before": before,
+        }
+        return self.last_compaction
+
+    async def run_periodic(self, interval: float, older_than: timedelta):
+        """Background loop compacting the ledger; failures are logged and retried next round"""
+        while True:
+            try:
+                await self.compact(older_than)
+            except Exception as e:
+                logger.error(f"XP ledger compaction failed: {e}")
+            await asyncio.sleep(interval)
+
+    # ── Rebuild ───────────────────────────────────────────────────────────────
+
+    async def rebuild_user(self, user_id: str) -> dict:
+        """Overwrite a user's gamification_stats totals with those of the ledger"""
+        state, _, _ = await self.state_of(user_id)
+        fields = stats_fields(state)
+        await self.db.gamification_stats.update_one({"user_id": user_id}, {"$set": fields}, upsert=True)
+        return fields
+
+    async def rebuild_all(self, workers: int = 8) -> dict:
+        """Rebuild the stats of every user in the ledger, `workers` users at a time"""
+        started = time.perf_counter()
+        user_ids = set(await self.snapshots.distinct("user_id")) | set(await self.events.distinct("user_id"))
+        await self._run_parallel(sorted(user_ids), self.rebuild_user, workers)
+        return {"users": len(user_ids), "workers": workers, "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def seed_opening_balances(self) -> dict:
+        """
+        Opening balances for each stats document not yet in the ledger: the
+        difference between the stored stats and the events already logged (at
+        the epoch), then the stored streak (after those events, which would
+        otherwise be replayed on top of it).
+        """
+        seeded = 0
+        async for stats in self.db.gamification_stats.find({}, {"_id": 0}):
+            user_id = stats["user_id"]
+            if await self.events.find_one({"user_id": user_id, "source": OPENING_BALANCE}, {"_id": 1}):
+                continue
+            logged, _, _ = await self.state_of(user_id)
+            opening = {"user_id": user_id, "source": OPENING_BALANCE, "activity_date": None, "ref": None}
+            await self.events.insert_many([
+                {
+                    **opening,
+                    "id": str(uuid.uuid4()),
+                    "amount": stats.get("total_xp", 0) - logged["total_xp"],
+                    "counters": {name: stats.get(name, 0) - logged["counters"].get(name, 0) for name in COUNTERS},
+                    "set": {},
+                    "created_at": EPOCH,
+                },
+                {
+                    **opening,
+                    "id": str(uuid.uuid4()),
+                    "amount": 0,
+                    "counters": {},
+                    "set": {"streak_days": stats.get("streak_days", 0),
+                            "last_activity_date": stats.get("last_activity_date")},
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                },
+            ])
+            # A checkpoint already past the epoch would never fold the opening balance
+            await self.snapshots.delete_one({"user_id": user_id})
+            seeded += 1
+        return {"seeded": seeded}
+
+    async def _run_parallel(self, user_ids: List[str], job, workers: int) -> list:
+        queue: asyncio.Queue = asyncio.Queue()
+        for user_id in user_ids:
+            queue.put_nowait(user_id)
+        results = []
+
+        async def worker():
+            while not queue.empty():
+                results.append(await job(queue.get_nowait()))
+
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+        return results
+
+    def stats(self) -> dict:
+        return {"appended": self.appended, "last_compaction": self.last_compaction}
@@ -0,0 +1,119 @@
+"""
+Unit tests for the compiled badge rules (services/badges.py): they must award
+exactly the badges of the former lambda-based check_and_award_badges.
+"""
+
+import asyncio
+import random
+
+from services.badges import BADGE_CATALOG, BELT_ORDER, award_badges, earned_badges
+
+# The rules as they were written in check_and_award_badges, in the same order
+LEGACY_RULES = [
+    ("first_step", lambda s: s.get("attendance_count", 0) >= 1),
+    ("streak_3", lambda s: s.get("streak_days", 0) >= 3),
+    ("streak_7", lambda s: s.get("streak_days", 0) >= 7),
+    ("streak_14", lambda s: s.get("streak_days", 0) >= 14),
+    ("streak_21", lambda s: s.get("streak_days", 0) >= 21),
+    ("practice_1month", lambda s: s.get("days_since_registration", 0) >= 30),
+    ("practice_3months", lambda s: s.get("days_since_registration", 0) >= 90),
+    ("practice_6months", lambda s: s.get("days_since_registration", 0) >= 180),
+    ("practice_1year", lambda s: s.get("days_since_registration", 0) >= 365),
+    ("practice_2years", lambda s: s.get("days_since_registration", 0) >= 730),
+    ("practice_5years", lambda s: s.get("days_since_registration", 0) >= 1825),
+    ("grade_6kyu", lambda s: s.get("belt_level", "") in ["6e_kyu", "5e_kyu", "4e_kyu", "3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]),
+    ("grade_5kyu", lambda s: s.get("belt_level", "") in ["5e_kyu", "4e_kyu", "3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]),
+    ("grade_4kyu", lambda s: s.get("belt_level", "") in ["4e_kyu", "3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]),
+    ("grade_3kyu", lambda s: s.get("belt_level", "") in ["3e_kyu", "2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]),
+    ("grade_2kyu", lambda s: s.get("belt_level", "") in ["2e_kyu", "1er_kyu", "shodan", "nidan", "sandan", "yondan"]),
+    ("grade_1kyu", lambda s: s.get("belt_level", "") in ["1er_kyu", "shodan", "nidan", "sandan", "yondan"]),
+    ("grade_shodan", lambda s: s.get("belt_level", "") in ["shodan", "nidan", "sandan", "yondan"]),
+    ("grade_nidan", lambda s: s.get("belt_level", "") in ["nidan", "sandan", "yondan"]),
+    ("grade_sandan", lambda s: s.get("belt_level", "") in ["sandan", "yondan"]),
+    ("grade_yondan", lambda s: s.get("belt_level", "") == "yondan"),
+    ("xp_100", lambda s: s.get("total_xp", 0) >= 100),
+    ("xp_500", lambda s: s.get("total_xp", 0) >= 500),
+    ("xp_1000", lambda s: s.get("total_xp", 0) >= 1000),
+    ("xp_5000", lambda s: s.get("total_xp", 0) >= 5000),
+    ("xp_10000", lambda s: s.get("total_xp", 0) >= 10000),
+    ("level_5", lambda s: s.get("level", 1) >= 5),
+    ("level_10", lambda s: s.get("level", 1) >= 10),
+    ("level_20", lambda s: s.get("level", 1) >= 20),
+    ("tech_5", lambda s: s.get("techniques_validated", 0) >= 5),
+    ("tech_10", lambda s: s.get("techniques_validated", 0) >= 10),
+    ("tech_25", lambda s: s.get("techniques_validated", 0) >= 25),
+    ("tech_50", lambda s: s.get("techniques_validated", 0) >= 50),
+    ("tech_100", lambda s: s.get("techniques_validated", 0) >= 100),
+    ("attendance_10", lambda s: s.get("attendance_count", 0) >= 10),
+    ("attendance_50", lambda s: s.get("attendance_count", 0) >= 50),
+    ("attendance_100", lambda s: s.get("attendance_count", 0) >= 100),
+    ("attendance_200", lambda s: s.get("attendance_count", 0) >= 200),
+    ("attendance_500", lambda s: s.get("attendance_count", 0) >= 500),
+    ("ukemi_master", lambda s: s.get("ukemi_validated", False)),
+    ("weapons_intro", lambda s: s.get("weapons_started", False)),
+    ("tanto_master", lambda s: s.get("tanto_mastered", False)),
+    ("jo_master", lambda s: s.get("jo_mastered", False)),
+    ("bokken_master", lambda s: s.get("bokken_mastered", False)),
+]
+
+STAT_FIELDS = ["attendance_count", "streak_days", "days_since_registration", "total_xp", "level", "techniques_validated"]
+FLAG_FIELDS = ["ukemi_validated", "weapons_started", "tanto_mastered", "jo_mastered", "bokken_mastered"]
+
+
+def legacy_earned(stats, owned):
+    return [badge_id for badge_id, condition in LEGACY_RULES if badge_id not in owned and condition(stats)]
+
+
+def random_stats(rng):
+    stats = {field: rng.choice([0, 1, 3, 5, 7, 10, 21, 50, 99, 100, 365, 500, 1000, 2000, 10000]) for field in STAT_FIELDS
+             if rng.random() < 0.8}
+    stats.update({flag: rng.choice([True, False, None, 1]) for flag in FLAG_FIELDS if rng.random() < 0.3})
+    if rng.random() < 0.8:
+        stats["belt_level"] = rng.choice(BELT_ORDER + ["", "godan", None])
+    return stats
+
+
+def test_catalog_matches_legacy_rules():
+    assert [entry[0] for entry in BADGE_CATALOG] == [badge_id for badge_id, _ in LEGACY_RULES]
+
+
+def test_awards_identical_to_legacy():
+    rng = random.Random(17)
+    all_ids = [badge_id for badge_id, _ in LEGACY_RULES]
+    for _ in range(5000):
+        stats = random_stats(rng)
+        owned = set(rng.sample(all_ids, rng.randrange(0, 10)))
+
+        assert [r.badge_id for r in earned_badges(stats, owned)] == legacy_earned(stats, owned)
+
+
+def test_changed_stats_only():
+    stats = {"total_xp": 600, "streak_days": 7, "belt_level": "4e_kyu"}
+
+    assert [r.badge_id for r in earned_badges(stats, [], changed=["total_xp"])] == ["xp_100", "xp_500"]
+    assert [r.badge_id for r in earned_badges(stats, [], changed=["belt_level"])] == ["grade_6kyu", "grade_5kyu", "grade_4kyu"]
+
+
+class FakeStats:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+class FakeDb:
+    def __init__(self):
+        self.gamification_stats = FakeStats()
+
+
+def test_new_badges_written_in_one_push():
+    db = FakeDb()
+    stats = {"total_xp": 1200, "level": 5, "badges": [{"badge_id": "xp_100"}]}
+
+    awarded = asyncio.run(award_badges(db, "u1", stats))
+
+    assert [b["badge_id"] for b in awarded] == ["xp_500", "xp_1000", "level_5"]
+    assert db.gamification_stats.updates == [({"user_id": "u1"}, {"$push": {"badges": {"$each": awarded}}})]
+    assert asyncio.run(award_badges(db, "u1", {"badges": []}, changed=["total_xp"])) == []
+    assert len(db.gamification_stats.updates) == 1
@@ -0,0 +1,33 @@
+"""
+Unit tests for the challenge completions (services/challenges.py)
+"""
+
+from services.challenges import completion_document, legacy_completions
+
+
+def test_completion_document_keeps_known_fields():
+    record = {"challenge_id": "salut", "completed_date": "2025-01-02", "xp_reward": 10,
+              "status": "pending", "validated_at": None, "extra": True}
+
+    assert completion_document("u1", record) == {
+        "challenge_id": "salut", "completed_date": "2025-01-02", "xp_reward": 10, "status": "pending", "user_id": "u1"
+    }
+
+
+def test_legacy_completions_prefer_the_completed_entry():
+    pending = {"challenge_id": "salut", "completed_date": "2025-01-02", "status": "pending"}
+    stats = {
+        "completed_challenges": [
+            {"challenge_id": "salut", "completed_date": "2025-01-02", "status": "validated"},
+            {"challenge_id": "salut", "completed_date": "2025-01-03", "status": "pending"},
+            {"challenge_id": "kiai"},
+        ],
+        "pending_validations": [pending],
+    }
+
+    records = legacy_completions(stats)
+
+    assert sorted((r["completed_date"], r["status"]) for r in records) == [
+        ("2025-01-02", "validated"), ("2025-01-03", "pending")
+    ]
+    assert legacy_completions({}) == []
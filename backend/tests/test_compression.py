@@ -0,0 +1,90 @@
+"""
+Unit tests for response compression (services/compression.py)
+"""
+
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from services.compression import CompressionMiddleware, choose_encoding, supported_encodings
+from services.http_cache import StaticPayload
+
+LARGE = {"techniques": [{"nom": "Ikkyo omote", "description": "Immobilisation du coude"}] * 200}
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+
+@app.get("/large")
+async def large():
+    return LARGE
+
+
+@app.get("/small")
+async def small():
+    return {"ok": True}
+
+
+@app.get("/stream")
+async def stream():
+    return StreamingResponse(iter([b"x" * 1000, b"y" * 1000]), media_type="text/plain")
+
+
+@app.get("/encoded")
+async def encoded():
+    return Response(gzip.compress(b"z" * 1000), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+
+@app.get("/binary")
+async def binary():
+    return Response(b"\0" * 1000, media_type="application/octet-stream")
+
+
+client = TestClient(app)
+
+
+def raw_get(path, accept_encoding="gzip"):
+    # Bytes as sent on the wire, not decoded by the client
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding(None) is None
+    assert choose_encoding("*") == supported_encodings()[0]
+
+
+def test_large_json_compressed():
+    response, body = raw_get("/large")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body)
+    assert gzip.decompress(body).startswith(b'{"techniques":')
+
+
+def test_passthrough():
+    for path in ("/small", "/stream", "/binary"):
+        response, _ = raw_get(path)
+        assert "content-encoding" not in response.headers, path
+
+    response, body = raw_get("/encoded")
+    assert gzip.decompress(body) == b"z" * 1000
+
+    response, body = raw_get("/large", accept_encoding="identity")
+    assert "content-encoding" not in response.headers
+    assert body.startswith(b'{"techniques":')
+
+
+def test_static_payload_variants():
+    payload = StaticPayload(LARGE)
+    body, etag, encoding = payload.variant("gzip")
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == payload.body
+    assert etag != payload.etag
+    assert payload.variant(None) == (payload.body, payload.etag, None)
+    assert StaticPayload({"ok": True}).encoded == {}
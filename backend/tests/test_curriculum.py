@@ -0,0 +1,89 @@
+"""
+Unit tests for the curriculum cache (services/curriculum.py)
+"""
+
+import asyncio
+
+from services.curriculum import Curriculum, CurriculumCache, grade_kind
+
+LEVELS = [
+    {"id": "k5", "name": "5e KYU", "order": 5, "color": "#fbbf24", "techniques": [{"id": "t1"}, {"id": "t2"}]},
+    {"id": "sh", "name": "SHODAN", "order": 0, "techniques": [{"id": "t3"}]},
+    {"id": "k4", "name": "4e KYU", "order": 4, "techniques": []},
+    {"id": "bk", "name": "BOKKEN", "order": 5, "techniques": [{"id": "t4"}]},
+]
+
+
+class FakeCursor:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def to_list(self, length):
+        self.collection.reads += 1
+        await asyncio.sleep(0)
+        return [dict(doc) for doc in self.collection.docs]
+
+
+class FakeKyuLevels:
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+
+    def find(self, query, projection):
+        return FakeCursor(self)
+
+
+class FakeDb:
+    def __init__(self, docs):
+        self.kyu_levels = FakeKyuLevels(docs)
+
+
+def test_derived_values():
+    curriculum = Curriculum(LEVELS)
+    assert curriculum.total_techniques == 4
+    assert (curriculum.kyu_count, curriculum.dan_count) == (2, 1)
+    assert [kyu["id"] for kyu in curriculum.by_order] == ["k5", "bk", "k4", "sh"]
+    assert curriculum.techniques_by_level[0] == {"name": "5e KYU", "color": "#fbbf24", "total": 2}
+    assert curriculum.by_id["sh"]["name"] == "SHODAN"
+
+
+def test_grade_kind():
+    assert grade_kind("3e KYU") == "kyu"
+    assert grade_kind("NIDAN") == "dan"
+    assert grade_kind("Aïkijo") is None
+    assert grade_kind(None) is None
+
+
+def test_loaded_once_until_invalidated():
+    db = FakeDb(list(LEVELS))
+    cache = CurriculumCache(db, prepare=lambda kyu: kyu.setdefault("prepared", True))
+
+    async def scenario():
+        first, second = await asyncio.gather(cache.get(), cache.get())
+        assert first is second
+        assert first.by_id["k5"]["prepared"]
+        assert (await cache.get()) is first
+        assert db.kyu_levels.reads == 1
+
+        db.kyu_levels.docs.append({"id": "k3", "name": "3e KYU", "order": 3, "techniques": [{"id": "t5"}]})
+        cache.invalidate()
+        assert (await cache.get()).total_techniques == 5
+        assert db.kyu_levels.reads == 2
+
+    asyncio.run(scenario())
+    assert cache.stats()["loads"] == 2
+
+
+def test_load_overtaken_by_invalidate_is_not_kept():
+    db = FakeDb(list(LEVELS))
+    cache = CurriculumCache(db)
+
+    async def scenario():
+        stale = asyncio.ensure_future(cache.get())
+        await asyncio.sleep(0)
+        cache.invalidate()
+        await stale
+        await cache.get()
+        assert db.kyu_levels.reads == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+"""
+Unit tests for the streaming exports (services/exports.py)
+"""
+
+import asyncio
+import json
+
+import services.exports as exports
+from services.exports import stream_export
+
+
+class FakeCursor:
+    """Minimal stand-in for a Motor cursor: async iteration, batch_size() and close()"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.closed = False
+
+    def batch_size(self, size):
+        return self
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def close(self):
+        self.closed = True
+
+
+def collect(response):
+    async def read():
+        return [chunk async for chunk in response.body_iterator]
+    return asyncio.run(read())
+
+
+def test_ndjson_is_chunked(monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+    cursor = FakeCursor([{"id": str(i), "email": f"{i}@dojo.fr", "secret": "x"} for i in range(5)])
+
+    response = stream_export(cursor, "ndjson", ["id", "email"], "export")
+    chunks = collect(response)
+
+    assert len(chunks) == 3
+    rows = [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+    assert rows[4] == {"id": "4", "email": "4@dojo.fr"}
+    assert cursor.closed
+    assert response.headers["content-disposition"] == "attachment; filename=export.ndjson"
+
+
+def test_csv_escapes_formulas():
+    cursor = FakeCursor([{"id": "1", "firstName": "=HYPERLINK()", "isActive": True}, {"id": "2"}])
+
+    body = b"".join(collect(stream_export(cursor, "csv", ["id", "firstName", "isActive"], "export")))
+
+    assert body.decode("utf-8").splitlines() == [
+        "\ufeffid;firstName;isActive",
+        "1;'=HYPERLINK();True",
+        "2;;",
+    ]
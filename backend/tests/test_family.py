@@ -0,0 +1,70 @@
+"""
+Unit tests for the batch loading of a family's children (services/family.py)
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from services.family import load_children
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append((query, projection))
+        ((field, condition),) = query.items()
+        wanted = [k for k, v in projection.items() if v]
+        # Documents come back in collection order, not in $in order
+        return FakeCursor([{k: d[k] for k in wanted if k in d} for d in self.docs if d.get(field) in condition["$in"]])
+
+
+def family_db():
+    return SimpleNamespace(
+        users=FakeCollection([
+            {"id": "c2", "first_name": "Yuki", "email": "y@b.fr"},
+            {"id": "c1", "first_name": "Aiko", "email": "a@b.fr"},
+            {"id": "c3", "first_name": "Ren", "email": "r@b.fr"},
+        ]),
+        gamification_stats=FakeCollection([
+            {"user_id": "c1", "total_xp": 120, "level": 1},
+            {"user_id": "c2", "total_xp": 600, "level": 3},
+        ]),
+    )
+
+
+def test_children_joined_with_their_stats_in_family_order():
+    db = family_db()
+
+    loaded = asyncio.run(load_children(db, ["c1", "c2", "c3", "gone"], ["first_name"], ["total_xp"]))
+
+    assert loaded == [
+        ("c1", {"id": "c1", "first_name": "Aiko"}, {"user_id": "c1", "total_xp": 120}),
+        ("c2", {"id": "c2", "first_name": "Yuki"}, {"user_id": "c2", "total_xp": 600}),
+        # No stats document yet
+        ("c3", {"id": "c3", "first_name": "Ren"}, None),
+        # Deleted child still listed on the parent
+        ("gone", None, None),
+    ]
+    # One query per collection whatever the number of children
+    assert len(db.users.queries) == len(db.gamification_stats.queries) == 1
+
+
+def test_stats_not_read_unless_requested():
+    db = family_db()
+
+    loaded = asyncio.run(load_children(db, ["c3"], ["first_name", "email"]))
+
+    assert loaded == [("c3", {"id": "c3", "first_name": "Ren", "email": "r@b.fr"}, None)]
+    assert db.gamification_stats.queries == []
+    assert asyncio.run(load_children(db, [], ["first_name"])) == []
@@ -0,0 +1,42 @@
+"""
+Unit tests for the bcrypt worker pool (services/hashing.py)
+"""
+
+import asyncio
+import threading
+
+import bcrypt
+
+from services.hashing import HashingPool, hash_password, hashing_pool, verify_password
+
+
+def test_hash_verify_round_trip_through_the_pool():
+    async def scenario():
+        hashed = await hash_password("ikkyo-omote")
+        return hashed, await verify_password("ikkyo-omote", hashed), await verify_password("nikyo", hashed)
+
+    completed = hashing_pool.stats()["completed"]
+    hashed, valid, invalid = asyncio.run(scenario())
+
+    assert hashed.startswith("$2") and bcrypt.checkpw(b"ikkyo-omote", hashed.encode("utf-8"))
+    assert (valid, invalid) == (True, False)
+    assert hashing_pool.stats()["completed"] == completed + 3
+
+
+def test_pool_runs_off_the_event_loop_thread():
+    pool = HashingPool(max_workers=2)
+
+    async def scenario():
+        loop_thread = threading.current_thread().name
+        names = await asyncio.gather(*(pool.run(lambda: threading.current_thread().name) for _ in range(4)))
+        return loop_thread, names
+
+    try:
+        loop_thread, names = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert loop_thread not in names
+    assert all(name.startswith("bcrypt") for name in names)
+    stats = pool.stats()
+    assert (stats["completed"], stats["queued"], stats["active"]) == (4, 0, 0)
@@ -0,0 +1,92 @@
+"""
+Unit tests for the pre-serialized static responses (services/http_cache.py)
+"""
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from models.passages_grades import PROGRAMME_FFAAA, get_all_grades, get_kyu_grades
+from routes.grades_routes import grade_complet, grade_resume, router
+from services import http_cache
+from services.http_cache import STATIC_CACHE_CONTROL, StaticPayload, etag_matches, static_for_build
+
+app = FastAPI()
+app.include_router(router, prefix="/api")
+client = TestClient(app)
+
+
+def test_payload_bytes_match_json_response():
+    content = [grade_resume(g) for g in get_all_grades()]
+    assert StaticPayload(content).body == JSONResponse([c.model_dump() for c in content]).body
+
+
+def test_programme_served_with_etag():
+    response = client.get("/api/grades/programme", params={"type": "kyu"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["cache-control"] == STATIC_CACHE_CONTROL
+    assert response.json() == [grade_resume(g).model_dump() for g in get_kyu_grades()]
+
+    # Unknown filter: every grade, as before
+    assert len(client.get("/api/grades/programme", params={"type": "x"}).json()) == len(get_all_grades())
+
+
+def test_if_none_match_returns_304():
+    etag = client.get("/api/grades/programme/shodan").headers["etag"]
+    response = client.get("/api/grades/programme/shodan", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    assert client.get("/api/grades/programme/nidan", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_grade_detail():
+    response = client.get("/api/grades/programme/6e_kyu")
+    assert response.json() == grade_complet(PROGRAMME_FFAAA["6e_kyu"]).model_dump()
+    assert client.get("/api/grades/programme/inconnu").status_code == 404
+
+
+def test_etag_matches():
+    assert etag_matches("*", '"a"')
+    assert etag_matches('"b", "a"', '"a"')
+    assert not etag_matches(None, '"a"')
+    assert not etag_matches('"b"', '"a"')
+
+
+def test_static_route_computed_once():
+    calls = []
+
+    @app.get("/api/test-static")
+    @static_for_build
+    async def reference():
+        calls.append(1)
+        return {"calls": len(calls)}
+
+    first = client.get("/api/test-static")
+    assert first.json() == {"calls": 1}
+    assert first.headers["cache-control"] == STATIC_CACHE_CONTROL
+    assert client.get("/api/test-static").json() == {"calls": 1}
+    assert client.get("/api/test-static", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert calls == [1]
+
+    # Reference routes of the grades router
+    etag = client.get("/api/grades/attaques").headers["etag"]
+    assert client.get("/api/grades/attaques", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_static_route_takes_no_parameters():
+    with pytest.raises(TypeError):
+        @static_for_build
+        async def with_query(type: str):
+            return {}
+
+
+def test_build_version_changes_etag(monkeypatch):
+    etag = StaticPayload({"a": 1}).etag
+    assert StaticPayload({"a": 1}).etag == etag
+    monkeypatch.setattr(http_cache, "BUILD_VERSION", "next")
+    assert StaticPayload({"a": 1}).etag != etag
@@ -0,0 +1,40 @@
+"""
+Unit tests for the index registry audit helpers (services/indexes.py)
+"""
+
+from services.indexes import INDEX_REGISTRY, IndexSpec, find_missing, find_redundant
+
+
+def test_registry_names_are_unique_per_collection():
+    for collection, specs in INDEX_REGISTRY.items():
+        names = [spec.name for spec in specs]
+        assert len(names) == len(set(names)), collection
+
+
+def test_spec_name_matches_mongodb_default():
+    assert IndexSpec(("user_id", 1), ("date", 1)).name == "user_id_1_date_1"
+    assert IndexSpec(("created_at", -1)).name == "created_at_-1"
+
+
+def test_find_missing():
+    declared = [IndexSpec(("id", 1), unique=True), IndexSpec(("recipient_id", 1), ("created_at", -1))]
+    existing = {"_id_": (("_id", 1),), "custom_name": (("id", 1),)}
+
+    missing = find_missing(declared, existing)
+
+    assert [m["name"] for m in missing] == ["recipient_id_1_created_at_-1"]
+
+
+def test_find_redundant_skips_unique_and_id():
+    existing = {
+        "_id_": (("_id", 1),),
+        "dojo_id_1": (("dojo_id", 1),),
+        "dojo_id_1_email_1": (("dojo_id", 1), ("email", 1)),
+        "id_1": (("id", 1),),
+        "id_1_name_1": (("id", 1), ("name", 1)),
+        "created_at_1": (("created_at", 1),),
+        "created_at_-1_id_1": (("created_at", -1), ("id", 1)),
+    }
+    unique = {"id_1": True}
+
+    assert find_redundant(existing, unique) == [{"name": "dojo_id_1", "covered_by": "dojo_id_1_email_1"}]
@@ -0,0 +1,76 @@
+"""
+Unit tests for the journal migration (services/journal.py)
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from services.journal import JournalStore, entry_document, legacy_entry_id
+
+
+class FakeCollection:
+    """Records the calls made by JournalStore; find_one returns the preset document"""
+
+    def __init__(self, doc=None):
+        self.doc = doc
+        self.calls = []
+
+    async def find_one(self, query, projection=None):
+        self.calls.append(("find_one", query))
+        return self.doc
+
+    async def bulk_write(self, requests, ordered=True):
+        self.calls.append(("bulk_write", requests))
+
+    async def update_one(self, query, update):
+        self.calls.append(("update_one", query, update))
+
+
+def make_store(user_doc):
+    db = SimpleNamespace(users=FakeCollection(user_doc), journal_entries=FakeCollection())
+    return JournalStore(db), db
+
+
+def test_entry_document():
+    doc = entry_document("u1", {"id": "e1", "content": "Merci", "tags": None, "created_at": "2025-01-01", "extra": 1})
+
+    assert doc == {"id": "e1", "content": "Merci", "mood": None, "tags": [], "created_at": "2025-01-01",
+                   "updated_at": None, "user_id": "u1"}
+
+
+def test_migration_upserts_and_pulls_only_moved_entries():
+    journal = [{"id": "e1", "content": "a"}, {"id": "e2", "content": "b"}, {"content": "sans id"}]
+    store, db = make_store({"journal": journal})
+
+    assert asyncio.run(store.ensure_migrated("u1")) is True
+
+    legacy_id = legacy_entry_id("u1", 0)
+    requests = db.journal_entries.calls[0][1]
+    assert [r._filter for r in requests] == [{"id": "e1"}, {"id": "e2"}, {"id": legacy_id}]
+    # Already migrated entries are never overwritten
+    assert all(set(r._doc) == {"$setOnInsert"} for r in requests)
+    assert requests[2]._doc["$setOnInsert"]["content"] == "sans id"
+    pull = db.users.calls[1]
+    assert pull[2] == {"$pull": {"journal": {"id": {"$in": ["e1", "e2", legacy_id, None, ""]}}}}
+    assert store.stats()["migrated_entries"] == 3
+
+
+def test_entries_without_id_get_the_same_id_on_every_attempt():
+    journal = [{"content": "a"}, {"id": "e1", "content": "b"}, {"content": "c"}]
+    ids = []
+    for _ in range(2):
+        store, db = make_store({"journal": journal})
+        asyncio.run(store.migrate_user("u1"))
+        ids.append([r._filter["id"] for r in db.journal_entries.calls[0][1]])
+
+    assert ids[0] == ids[1] == ["e1", legacy_entry_id("u1", 0), legacy_entry_id("u1", 1)]
+    assert legacy_entry_id("u1", 0) != legacy_entry_id("u2", 0)
+
+
+def test_migrated_users_are_not_looked_up_again():
+    store, db = make_store(None)
+
+    assert asyncio.run(store.ensure_migrated("u1")) is False
+    assert asyncio.run(store.ensure_migrated("u1")) is False
+    assert len(db.users.calls) == 1
+    assert db.journal_entries.calls == []
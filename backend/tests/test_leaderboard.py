@@ -0,0 +1,177 @@
+"""
+Unit tests for the materialized leaderboard (services/leaderboard.py)
+"""
+
+import asyncio
+from functools import cmp_to_key
+from types import SimpleNamespace
+
+from services.leaderboard import DEFAULT_NAME, Leaderboard
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(field)
+            if "$gt" in condition and not value > condition["$gt"]:
+                return False
+            if "$lt" in condition and not value < condition["$lt"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+def evaluate(expression, doc):
+    """The few aggregation expressions of the rebuild pipeline"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return doc.get(expression[1:])
+    if isinstance(expression, dict) and "$ifNull" in expression:
+        value, default = expression["$ifNull"]
+        value = evaluate(value, doc)
+        return evaluate(default, doc) if value is None else value
+    if isinstance(expression, dict) and "$arrayElemAt" in expression:
+        path, index = expression["$arrayElemAt"]
+        array, field = path[1:].split(".")
+        items = [item.get(field) for item in doc.get(array, [])]
+        return items[index] if len(items) > index else None
+    return expression
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, order):
+        def compare(a, b):
+            for field, direction in order:
+                if a[field] != b[field]:
+                    return direction if a[field] > b[field] else -direction
+            return 0
+        self.docs = sorted(self.docs, key=cmp_to_key(compare))
+        return self
+
+    def limit(self, limit):
+        self.docs = self.docs[:limit]
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = [dict(doc) for doc in docs or []]
+
+    def _project(self, doc, projection):
+        return {k: v for k, v in doc.items() if projection.get(k)}
+
+    def find(self, query, projection):
+        return FakeCursor([self._project(d, projection) for d in self.docs if matches(d, query)])
+
+    async def find_one(self, query, projection):
+        return next((self._project(d, projection) for d in self.docs if matches(d, query)), None)
+
+    async def count_documents(self, query):
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is None:
+            if not upsert:
+                return SimpleNamespace(matched_count=0)
+            doc = {**query, **update.get("$setOnInsert", {})}
+            self.docs.append(doc)
+        doc.update(update["$set"])
+        return SimpleNamespace(matched_count=1)
+
+    async def delete_many(self, query):
+        kept = [d for d in self.docs if not matches(d, query)]
+        removed, self.docs = len(self.docs) - len(kept), kept
+        return SimpleNamespace(deleted_count=removed)
+
+
+class FakeStats(FakeCollection):
+    def __init__(self, docs, db):
+        super().__init__(docs)
+        self.db = db
+
+    def aggregate(self, pipeline):
+        lookup, project, merge = pipeline[0]["$lookup"], pipeline[1]["$project"], pipeline[2]["$merge"]
+        target = getattr(self.db, merge["into"])
+        for stats in self.docs:
+            joined = {**stats, lookup["as"]: [
+                user for user in getattr(self.db, lookup["from"]).docs
+                if user.get(lookup["foreignField"]) == stats.get(lookup["localField"])
+            ]}
+            row = {field: joined.get(field) if value == 1 else evaluate(value, joined)
+                   for field, value in project.items() if value}
+            target.docs = [d for d in target.docs if d[merge["on"]] != row[merge["on"]]] + [row]
+        return FakeCursor([])
+
+
+def entry(user_id, total_xp, dojo_id="d1"):
+    return {"user_id": user_id, "name": user_id, "dojo_id": dojo_id, "total_xp": total_xp,
+            "level": 1, "level_name": "Petit Scarabée", "updated_at": "2025-01-01T00:00:00+00:00"}
+
+
+def board_of(*entries, users=(), stats=()):
+    db = SimpleNamespace(leaderboard=FakeCollection(entries), users=FakeCollection(users))
+    db.gamification_stats = FakeStats(stats, db)
+    return Leaderboard(db)
+
+
+def test_top_and_rank_break_ties_by_user_id():
+    board = board_of(entry("c", 300), entry("b", 500), entry("a", 300), entry("d", 100, dojo_id="d2"))
+
+    top = asyncio.run(board.top(3))
+    assert [(e["user_id"], e["rank"]) for e in top] == [("b", 1), ("a", 2), ("c", 3)]
+    # rank_of agrees with the order of top()
+    assert asyncio.run(board.rank_of("a"))["rank"] == 2
+    assert asyncio.run(board.rank_of("c"))["rank"] == 3
+    assert asyncio.run(board.rank_of("d"))["rank"] == 4
+
+
+def test_rank_within_a_dojo():
+    board = board_of(entry("a", 300), entry("b", 500, dojo_id="d2"), entry("c", 100))
+
+    assert [e["user_id"] for e in asyncio.run(board.top(10, dojo_id="d1"))] == ["a", "c"]
+    assert asyncio.run(board.rank_of("a", dojo_id="d1"))["rank"] == 1
+    assert asyncio.run(board.rank_of("c", dojo_id="d1"))["rank"] == 2
+    # Not ranked in a dojo that is not theirs
+    assert not asyncio.run(board.rank_of("b", dojo_id="d1"))
+
+
+def test_rank_of_a_player_not_on_the_board():
+    board = board_of(entry("a", 300))
+
+    assert not asyncio.run(board.rank_of("nobody"))
+
+
+def test_record_xp_creates_then_updates_an_entry():
+    board = board_of(users=[{"id": "u1", "first_name": "Aiko", "dojo_id": "d1"}])
+
+    asyncio.run(board.record_xp("u1", 50, 1, "Petit Scarabée"))
+    asyncio.run(board.record_xp("u1", 250, 2, "Jeune Poussin"))
+    asyncio.run(board.record_xp("ghost", 10, 1, "Petit Scarabée"))
+
+    (aiko, ghost) = board.collection.docs
+    assert (aiko["name"], aiko["dojo_id"], aiko["total_xp"], aiko["level"]) == ("Aiko", "d1", 250, 2)
+    assert (ghost["name"], ghost["dojo_id"]) == (DEFAULT_NAME, None)
+
+
+def test_rebuild_from_stats_drops_stale_entries():
+    board = board_of(
+        entry("u1", 10), entry("gone", 900),
+        users=[{"id": "u1", "first_name": "Aiko", "dojo_id": "d3"}],
+        stats=[{"user_id": "u1", "total_xp": 420, "level": 2, "level_name": "Jeune Poussin"},
+               {"user_id": "u2"}],
+    )
+
+    assert asyncio.run(board.rebuild()) == {"players": 2, "removed": 1}
+    rebuilt = {e["user_id"]: e for e in board.collection.docs}
+    assert (rebuilt["u1"]["name"], rebuilt["u1"]["dojo_id"], rebuilt["u1"]["total_xp"]) == ("Aiko", "d3", 420)
+    assert (rebuilt["u2"]["name"], rebuilt["u2"]["total_xp"], rebuilt["u2"]["level"]) == (DEFAULT_NAME, 0, 1)
@@ -0,0 +1,53 @@
+"""
+Unit tests for the keyset pagination helpers (services/pagination.py)
+"""
+
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from services.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+def raw_cursor(text):
+    # Extended JSON as a client could craft it, encoded like a real cursor
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def test_cursor_round_trip():
+    values = ["2025-01-02T10:00:00+00:00", "abc", datetime(2025, 1, 2, tzinfo=timezone.utc)]
+    decoded = decode_cursor(encode_cursor(values), 3)
+
+    assert decoded[:2] == values[:2]
+    assert decoded[2].replace(tzinfo=timezone.utc) == values[2]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    encode_cursor({"a": 1}),
+    encode_cursor(["only-one"]),
+    raw_cursor('[{"$oid": "zz"}, "x"]'),
+    raw_cursor('[{"$date": "nope"}, "x"]'),
+    raw_cursor('[{"$binary": "zz"}, "x"]'),
+    raw_cursor('[{"$numberDecimal": "x"}, "x"]'),
+    # Operators would be injected into the keyset filter
+    raw_cursor('[{"$ne": null}, "x"]'),
+    raw_cursor('[["a"], "x"]'),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, 2)
+    assert exc.value.status_code == 400
+
+
+def test_keyset_filter_single_field():
+    assert keyset_filter([("id", 1)], ["u1"]) == {"id": {"$gt": "u1"}}
+
+
+def test_keyset_filter_compound_descending():
+    assert keyset_filter([("created_at", -1), ("id", -1)], ["2025", "m1"]) == {"$or": [
+        {"created_at": {"$lt": "2025"}},
+        {"created_at": "2025", "id": {"$lt": "m1"}},
+    ]}
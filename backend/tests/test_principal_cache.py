@@ -0,0 +1,66 @@
+"""
+Unit tests for the per-process user cache (services/principal_cache.py)
+"""
+
+import time
+
+from services.principal_cache import FULL_DOCUMENT, PrincipalCache, _Entry
+
+USER = {"id": "u1", "email": "a@b.fr", "first_name": "Aiko", "role": "user", "dojo_id": "d1"}
+
+
+def test_entry_covers():
+    partial = _Entry({}, frozenset({"id", "email"}), 0)
+    assert partial.covers(frozenset({"id"}))
+    assert not partial.covers(frozenset({"id", "role"}))
+    assert not partial.covers(FULL_DOCUMENT)
+
+    full = _Entry({}, FULL_DOCUMENT, 0)
+    assert full.covers(FULL_DOCUMENT)
+    assert full.covers(frozenset({"anything"}))
+
+
+def test_projected_loads_are_merged():
+    cache = PrincipalCache(maxsize=8, ttl=30)
+    cache.set("u1", {"id": "u1", "email": "a@b.fr"}, fields=["id", "email"])
+    first_load = cache._cache["u1"].loaded_at
+    cache.set("u1", {"id": "u1", "role": "user"}, fields=["id", "role"])
+
+    assert cache.get("u1", ["email", "role"]) == {"email": "a@b.fr", "role": "user"}
+    assert cache.get("u1") is None
+    # The oldest load time bounds the staleness of the merged entry
+    assert cache._cache["u1"].loaded_at == first_load
+
+
+def test_full_document_entry_serves_any_projection():
+    cache = PrincipalCache(maxsize=8, ttl=30)
+    cache.set("u1", USER)
+    cache.set("u1", {"id": "u1", "role": "admin"}, fields=["id", "role"])
+
+    assert cache._cache["u1"].fields is FULL_DOCUMENT
+    assert cache.get("u1", ["role", "dojo_id"]) == {"role": "admin", "dojo_id": "d1"}
+    assert cache.get("u1") == {**USER, "role": "admin"}
+    assert cache.stats()["hits"] == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = PrincipalCache(maxsize=8, ttl=0.2)
+    cache.set("u1", {"id": "u1", "email": "a@b.fr"}, fields=["id", "email"])
+    time.sleep(0.12)
+    # Merged into the first load: it expires with it
+    cache.set("u1", {"id": "u1", "role": "user"}, fields=["id", "role"])
+    time.sleep(0.12)
+
+    assert cache.get("u1", ["role"]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_projected_load_after_invalidate_does_not_resurrect_old_fields():
+    cache = PrincipalCache(maxsize=8, ttl=30)
+    cache.set("u1", USER)
+    cache.invalidate("u1")
+    cache.set("u1", {"id": "u1", "email": "new@b.fr"}, fields=["id", "email"])
+
+    assert cache.get("u1", ["id", "email"]) == {"id": "u1", "email": "new@b.fr"}
+    assert cache.get("u1", ["first_name"]) is None
+    assert cache.get("u1") is None
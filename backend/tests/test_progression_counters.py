@@ -0,0 +1,47 @@
+"""
+Unit tests for the progression counters (services/progression.py)
+"""
+
+from services.progression import progression_update, summarize
+
+
+def test_summarize():
+    progression = {
+        "ikkyo": {"mastery_level": "mastered", "practice_count": 4},
+        "nikyo": {"mastery_level": "learning", "practice_count": 2},
+        "sankyo": {"mastery_level": "practiced"},
+        "kotegaeshi": {"mastery_level": "not_started", "practice_count": 1},
+    }
+
+    assert summarize(progression) == {"techniques_mastered": 1, "techniques_in_progress": 2, "total_sessions": 7}
+    assert summarize(None) == {"techniques_mastered": 0, "techniques_in_progress": 0, "total_sessions": 0}
+
+
+def test_summarize_counts_practice_like_stats_expression():
+    # $ifNull turns a missing or null count into 0; $sum adds every number and skips the rest
+    progression = {
+        "ikkyo": {"mastery_level": "learning"},
+        "nikyo": {"practice_count": None},
+        "sankyo": {"practice_count": 2.0},
+        "yonkyo": {"practice_count": "3"},
+        "gokyo": {"practice_count": True},
+        "iriminage": {"practice_count": 5},
+    }
+
+    assert summarize(progression)["total_sessions"] == 7
+
+
+def test_update_sets_entry_and_counters_in_one_stage():
+    pipeline = progression_update("ikkyo", mastery_level="mastered", timestamps={"last_updated": "2025-01-01"})
+
+    assert len(pipeline) == 1
+    fields = pipeline[0]["$set"]
+    assert set(fields) == {"progression.ikkyo.mastery_level", "progression.ikkyo.last_updated", "progression_stats"}
+    assert set(fields["progression_stats"]) == {"techniques_mastered", "techniques_in_progress", "total_sessions"}
+
+
+def test_user_values_are_literals():
+    # A value starting with "$" must not be read as a field path of the user document
+    fields = progression_update("ikkyo", mastery_level="$password_hash")[0]["$set"]
+
+    assert fields["progression.ikkyo.mastery_level"] == {"$literal": "$password_hash"}
@@ -0,0 +1,105 @@
+"""
+Static checks for the projection-aware auth dependencies.
+Every authenticated route declares the user fields it reads via
+require_user_fields(...) / require_identity; these tests parse server.py and
+fail if a handler reads a field it did not declare.
+"""
+
+import ast
+from pathlib import Path
+
+import pytest
+
+SERVER_PATH = Path(__file__).resolve().parent.parent / "server.py"
+
+
+def _load_routes():
+    tree = ast.parse(SERVER_PATH.read_text(encoding="utf-8"))
+    routes = []
+    for node in tree.body:
+        if not isinstance(node, ast.AsyncFunctionDef):
+            continue
+        is_route = any(
+            isinstance(d, ast.Call) and isinstance(d.func, ast.Attribute)
+            and isinstance(d.func.value, ast.Name) and d.func.value.id == "api_router"
+            for d in node.decorator_list
+        )
+        if is_route:
+            routes.append(node)
+    return routes
+
+
+def _user_dependencies(func):
+    """Yield (param_name, dependency_node) for params defaulting to Depends(...)"""
+    args = func.args.args
+    defaults = func.args.defaults
+    for arg, default in zip(args[len(args) - len(defaults):], defaults):
+        if (isinstance(default, ast.Call) and isinstance(default.func, ast.Name)
+                and default.func.id == "Depends" and default.args):
+            yield arg.arg, default.args[0]
+
+
+def _declared_fields(dependency):
+    """Fields declared by a dependency, or None if it is not a user-fields dependency"""
+    if isinstance(dependency, ast.Name) and dependency.id == "require_identity":
+        return {"id"}
+    if (isinstance(dependency, ast.Call) and isinstance(dependency.func, ast.Name)
+            and dependency.func.id == "require_user_fields"):
+        return {"id"} | {a.value for a in dependency.args}
+    return None
+
+
+def _fields_read(func, name):
+    """Fields read through user["x"] / user.get("x"); any other use is reported as an escape"""
+    parents = {}
+    for node in ast.walk(func):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+
+    fields, escapes = set(), []
+    for node in ast.walk(func):
+        if not (isinstance(node, ast.Name) and node.id == name and isinstance(node.ctx, ast.Load)):
+            continue
+        parent = parents[node]
+        if isinstance(parent, ast.Subscript) and isinstance(parent.slice, ast.Constant):
+            fields.add(parent.slice.value)
+        elif (isinstance(parent, ast.Attribute) and parent.attr == "get"
+              and isinstance(parents[parent], ast.Call) and parents[parent].args
+              and isinstance(parents[parent].args[0], ast.Constant)):
+            fields.add(parents[parent].args[0].value)
+        else:
+            escapes.append(node.lineno)
+    return fields, escapes
+
+
+ROUTES = _load_routes()
+
+DECLARED = [
+    (func.name, param, declared)
+    for func in ROUTES
+    for param, dependency in _user_dependencies(func)
+    for declared in [_declared_fields(dependency)]
+    if declared is not None
+]
+
+
+def test_routes_declare_user_fields():
+    """Authenticated user routes use a projected dependency, not the full document"""
+    offenders = [
+        func.name
+        for func in ROUTES
+        for _, dependency in _user_dependencies(func)
+        if isinstance(dependency, ast.Name) and dependency.id == "require_auth"
+    ]
+    assert DECLARED, "no route uses require_user_fields/require_identity"
+    assert not offenders, f"routes loading the whole user document: {offenders}"
+
+
+@pytest.mark.parametrize("route,param,declared", DECLARED, ids=[d[0] for d in DECLARED])
+def test_route_reads_only_declared_fields(route, param, declared):
+    func = next(f for f in ROUTES if f.name == route)
+    fields, escapes = _fields_read(func, param)
+
+    assert not escapes, f"{route}: '{param}' is used as a whole (lines {escapes}), fields cannot be checked"
+    undeclared = fields - declared
+    assert not undeclared, f"{route} reads undeclared user fields: {sorted(undeclared)}"
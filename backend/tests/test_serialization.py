@@ -0,0 +1,93 @@
+"""
+Unit tests for the orjson response class and single-validation responses (services/serialization.py)
+"""
+
+import enum
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, ConfigDict
+
+from services.curriculum import Curriculum
+from services.serialization import FastJSONResponse, model_json, model_response
+
+
+class Level(str, enum.Enum):
+    NOT_STARTED = "not_started"
+
+
+class Item(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    level: Level = Level.NOT_STARTED
+    created_at: datetime
+    notes: Optional[str] = None
+
+
+DOCS = [
+    {"id": "a", "created_at": datetime(2025, 1, 2, 3, 4, 5, 600000, tzinfo=timezone.utc), "secret": "x"},
+    {"id": "b", "level": "not_started", "created_at": datetime(2024, 5, 6), "notes": "Ikkyō"},
+]
+
+router = APIRouter(prefix="/api")
+
+
+@router.get("/validated", response_model=List[Item])
+async def validated():
+    return DOCS
+
+
+@router.get("/single", response_model=List[Item])
+async def single():
+    return model_response(List[Item], DOCS, headers={"X-Total-Count": "2"})
+
+
+@router.get("/plain")
+async def plain():
+    return {"at": DOCS[0]["created_at"], "id": uuid.UUID(int=1), "level": Level.NOT_STARTED}
+
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.include_router(router)
+client = TestClient(app)
+
+
+def test_default_response_class_reaches_included_routers():
+    response = client.get("/api/plain")
+    assert response.json() == {
+        "at": "2025-01-02T03:04:05.600000+00:00",
+        "id": "00000000-0000-0000-0000-000000000001",
+        "level": "not_started",
+    }
+
+
+def test_render_matches_json_dumps():
+    content = {"items": [Item(**doc) for doc in DOCS], "tags": {"a"}, 1: "un"}
+    rendered = FastJSONResponse(content).body
+    assert json.loads(rendered) == json.loads(json.dumps(jsonable_encoder(content)))
+
+
+def test_model_response_matches_response_model():
+    expected = client.get("/api/validated")
+    response = client.get("/api/single")
+    assert response.content == expected.content
+    assert response.headers["x-total-count"] == "2"
+    assert "secret" not in response.json()[0]
+
+    # Instances of the model are not revalidated
+    items = [Item(**doc) for doc in DOCS]
+    assert model_json(List[Item], items) == expected.content
+
+
+def test_curriculum_rendered_once():
+    curriculum = Curriculum([])
+    calls = []
+    render = lambda: calls.append(1) or b"[]"
+    assert curriculum.rendered("kyu_levels", render) == b"[]"
+    assert curriculum.rendered("kyu_levels", render) == b"[]"
+    assert calls == [1]
@@ -0,0 +1,166 @@
+"""
+Unit tests for the snapshot cache (services/snapshots.py) and the members-stats rollup (services/member_stats.py)
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from services.member_stats import compute_members_stats, count_facets
+from services.snapshots import SnapshotCache, RollupSnapshot
+
+
+def test_concurrent_misses_share_one_load():
+    cache = SnapshotCache("test", ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": len(calls)}
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(10)))
+        cached = await cache.get_or_load("k", loader)
+        return results, cached
+
+    results, cached = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(r == {"value": 1} for r in results)
+    assert cached == {"value": 1}
+    assert cache.stats()["hits"] == 1
+
+
+def test_clear_during_load_is_not_cached():
+    cache = SnapshotCache("test", ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        call = len(calls)
+        await asyncio.sleep(0.01)
+        return call
+
+    async def scenario():
+        first = asyncio.ensure_future(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        cache.clear()
+        # A reader arriving after the write does not join the stale load
+        second = await cache.get_or_load("k", loader)
+        return await first, second, await cache.get_or_load("k", loader)
+
+    first, second, third = asyncio.run(scenario())
+
+    assert (first, second, third) == (1, 2, 2)
+
+
+def test_rollup_serves_stale_value_while_refreshing():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 3:
+            raise RuntimeError("mongo down")
+        return len(calls)
+
+    rollup = RollupSnapshot("test", loader, refresh_interval=60)
+
+    async def scenario():
+        first = await rollup.get()
+        rollup.invalidate()
+        stale = await rollup.get()
+        await asyncio.sleep(0.02)
+        fresh = await rollup.get()
+        rollup.invalidate()
+        await rollup.get()
+        await asyncio.sleep(0.02)
+        # The failed refresh keeps serving the previous value
+        return first, stale, fresh, await rollup.get()
+
+    assert asyncio.run(scenario()) == (1, 1, 2, 2)
+    assert rollup.stats()["failures"] == 1
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif isinstance(condition, dict):
+            if "$in" in condition and doc.get(field) not in condition["$in"]:
+                return False
+            if condition.get("$exists") and field not in doc:
+                return False
+            if "$ne" in condition and doc.get(field) == condition["$ne"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FacetCollection:
+    """Runs a [{"$facet": ...}] pipeline of $match/$count stages as MongoDB does"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        (stage,) = pipeline
+        result = {}
+        for name, stages in stage["$facet"].items():
+            docs = self.docs
+            for sub in stages:
+                if "$match" in sub:
+                    docs = [d for d in docs if matches(d, sub["$match"])]
+            # $count outputs no document at all when nothing matched
+            result[name] = [{"count": len(docs)}] if docs else []
+
+        class Cursor:
+            async def to_list(self, length):
+                return [result]
+        return Cursor()
+
+
+def test_count_facets_runs_one_aggregation():
+    users = FacetCollection([{"is_active": True}, {"is_active": True}, {"is_active": False}])
+
+    counts = asyncio.run(count_facets(users, {"total": {}, "active": {"is_active": True}, "none": {"role": "x"}}))
+
+    assert counts == {"total": 3, "active": 2, "none": 0}
+    assert users.pipelines == [[{"$facet": {
+        "total": [{"$count": "count"}],
+        "active": [{"$match": {"is_active": True}}, {"$count": "count"}],
+        "none": [{"$match": {"role": "x"}}, {"$count": "count"}],
+    }}]]
+
+
+def test_members_stats():
+    db = SimpleNamespace(
+        users=FacetCollection([
+            {"is_active": True, "subscription_status": "active"},
+            {"is_active": True, "role": "enfant"},
+            {"is_active": False, "parent_id": "p1", "subscription_status": "trialing"},
+            {"is_active": False, "parent_id": None},
+        ]),
+        dojos=FacetCollection([{"is_active": True}, {"is_active": False}]),
+        members=FacetCollection([{"status": "active"}]),
+    )
+
+    stats = asyncio.run(compute_members_stats(db))
+
+    assert stats == {
+        "total_members": 5, "totalUsers": 4, "totalDojos": 2, "activeDojos": 1,
+        "activeSubscriptions": 2, "pending": 0, "active": 3, "inactive": 2,
+        "total_children": 2, "adult_members": 2,
+    }
+
+
+def test_members_stats_on_empty_collections():
+    db = SimpleNamespace(users=FacetCollection(), dojos=FacetCollection(), members=FacetCollection())
+
+    stats = asyncio.run(compute_members_stats(db))
+
+    assert set(stats.values()) == {0}
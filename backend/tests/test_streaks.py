@@ -0,0 +1,60 @@
+"""
+Unit tests for the streak maintenance job (services/streaks.py)
+"""
+
+import asyncio
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+from services.streaks import StreakMaintenance, seconds_until, streak_cutoff
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def batch_size(self, size):
+        return self
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+class FakeStats:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+        self.batches = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        return FakeCursor(self.docs)
+
+    async def bulk_write(self, operations, ordered=True):
+        self.batches.append(operations)
+        return SimpleNamespace(matched_count=len(operations), modified_count=len(operations))
+
+
+def test_cutoff_and_schedule():
+    assert streak_cutoff(date(2025, 3, 1)) == "2025-02-28"
+    now = datetime(2025, 3, 1, 0, 10, tzinfo=timezone.utc)
+    assert seconds_until(0, 5, now) == 24 * 3600 - 5 * 60
+    assert seconds_until(1, 0, now) == 50 * 60
+
+
+def test_reset_is_batched_and_guarded():
+    docs = [{"_id": i, "last_activity_date": "2025-02-01"} for i in range(5)]
+    stats = FakeStats(docs)
+    job = StreakMaintenance(SimpleNamespace(gamification_stats=stats), batch_size=2)
+
+    result = asyncio.run(job.reset_broken(date(2025, 3, 1)))
+
+    assert stats.queries == [{"last_activity_date": {"$lt": "2025-02-28"}, "streak_days": {"$gt": 0}}]
+    assert [len(batch) for batch in stats.batches] == [2, 2, 1]
+    assert stats.batches[0][0]._filter == {"_id": 0, "last_activity_date": "2025-02-01"}
+    assert (result["modified"], result["batches"]) == (5, 3)
+    assert job.stats()["runs"] == 1
@@ -0,0 +1,68 @@
+"""
+Unit tests for the role-aware token verifier (services/tokens.py)
+"""
+
+import time
+from datetime import datetime, timezone, timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from services.tokens import TokenVerifier
+
+SECRET = "test-secret"
+
+
+def make_token(exp_seconds=3600, **claims):
+    claims["exp"] = datetime.now(timezone.utc) + timedelta(seconds=exp_seconds)
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+@pytest.fixture
+def verifier():
+    return TokenVerifier(SECRET, "HS256", cache_size=8)
+
+
+def test_user_token_is_cached(verifier):
+    token = make_token(user_id="u1", email="a@b.fr")
+
+    assert verifier.verify(token, "user")["user_id"] == "u1"
+    assert verifier.verify(token, "user")["user_id"] == "u1"
+
+    assert verifier.stats()["roles"]["user"] == {"verified": 1, "rejected": 0, "cache_hits": 1}
+
+
+def test_role_mismatch_is_rejected_even_when_cached(verifier):
+    token = make_token(role="parent", parent_id="p1")
+    verifier.verify(token, "parent")
+
+    with pytest.raises(HTTPException) as exc:
+        verifier.verify(token, "club_admin")
+    assert exc.value.status_code == 403
+
+    with pytest.raises(HTTPException) as exc:
+        verifier.verify(token, "user")
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.parametrize("token,detail", [
+    (make_token(exp_seconds=-10, user_id="u1"), "Token expiré"),
+    ("not-a-jwt", "Token invalide"),
+    (jwt.encode({"user_id": "u1"}, "other-secret", algorithm="HS256"), "Token invalide"),
+])
+def test_invalid_tokens(verifier, token, detail):
+    with pytest.raises(HTTPException) as exc:
+        verifier.verify(token, "user")
+    assert (exc.value.status_code, exc.value.detail) == (401, detail)
+    assert verifier.stats()["roles"]["user"]["rejected"] == 1
+
+
+def test_cached_token_expires(verifier):
+    token = make_token(exp_seconds=1, user_id="u1")
+    verifier.verify(token, "user")
+    time.sleep(1.1)
+
+    with pytest.raises(HTTPException) as exc:
+        verifier.verify(token, "user")
+    assert exc.value.detail == "Token expiré"
@@ -0,0 +1,106 @@
+"""
+Unit tests for the virtue-action log (services/virtues.py)
+"""
+
+import asyncio
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from services.virtues import VirtueLog, month_of, summarize_totals
+
+
+def test_month_of_is_utc():
+    assert month_of("2025-03-31T23:30:00+00:00") == "2025-03"
+    assert month_of("2025-04-01T00:30:00+02:00") == "2025-03"
+    assert month_of(datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=-5)))) == "2025-01"
+    assert month_of("pas une date") == "pas une"
+
+
+def test_summarize_totals_fills_unlogged_virtues():
+    doc = {"virtues": {"jin": {"individual_points": 10, "collective_points": 20, "total_points": 30, "action_count": 2}}}
+
+    summary = summarize_totals(doc, ["jin", "gi"])
+
+    assert summary["totals"]["gi"] == {"individual_points": 0, "collective_points": 0, "total_points": 0, "action_count": 0}
+    assert (summary["total_pv"], summary["total_pc"], summary["total_points"]) == (10, 20, 30)
+    assert summarize_totals(None, ["jin"])["total_points"] == 0
+
+
+class FakeActions:
+    """virtue_actions with its unique monthly key; aggregate() groups like _totals_pipeline"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        key = (doc["user_id"], doc["month"], doc["action_id"])
+        if any((d["user_id"], d["month"], d["action_id"]) == key for d in self.docs):
+            raise DuplicateKeyError("E11000")
+        self.docs.append(dict(doc))
+
+    def aggregate(self, pipeline):
+        user_id = pipeline[0]["$match"]["user_id"]
+        groups = {}
+        for doc in self.docs:
+            if doc["user_id"] != user_id:
+                continue
+            group = groups.setdefault(doc["virtue_id"], {
+                "_id": doc["virtue_id"], "individual_points": 0, "collective_points": 0,
+                "total_points": 0, "action_count": 0,
+            })
+            kind = "individual_points" if doc["action_type"] == "individual" else "collective_points"
+            group[kind] += doc["points"]
+            group["total_points"] += doc["points"]
+            group["action_count"] += 1
+
+        class Cursor:
+            async def to_list(self, length):
+                return list(groups.values())
+        return Cursor()
+
+
+class FakeTotals:
+    def __init__(self):
+        self.docs = {}
+        self.fail_next = False
+
+    async def replace_one(self, query, doc, upsert=False):
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("write failed")
+        self.docs[query["user_id"]] = doc
+
+
+def virtue_log():
+    return VirtueLog(SimpleNamespace(virtue_actions=FakeActions(), virtue_totals=FakeTotals()))
+
+
+def action(action_id, points, action_type="individual", logged_at="2025-03-02T10:00:00+00:00"):
+    return {"id": action_id, "virtue_id": "jin", "action_id": action_id, "action_type": action_type,
+            "points": points, "logged_at": logged_at}
+
+
+def test_totals_missed_by_a_failed_write_are_repaired_by_the_next_action():
+    log = virtue_log()
+    log.totals.fail_next = True
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(log.log("u1", action("a1", 10)))
+    asyncio.run(log.log("u1", action("a2", 20, action_type="collective")))
+
+    assert log.totals.docs["u1"]["virtues"]["jin"] == {
+        "individual_points": 10, "collective_points": 20, "total_points": 30, "action_count": 2
+    }
+
+
+def test_duplicate_action_leaves_totals_untouched():
+    log = virtue_log()
+    asyncio.run(log.log("u1", action("a1", 10)))
+
+    with pytest.raises(DuplicateKeyError):
+        asyncio.run(log.log("u1", action("a1", 10, logged_at="2025-03-20T10:00:00+00:00")))
+
+    assert log.totals.docs["u1"]["virtues"]["jin"]["total_points"] == 10
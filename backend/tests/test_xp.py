@@ -0,0 +1,42 @@
+"""
+Unit tests for the XP update pipeline (services/xp.py)
+"""
+
+from services.xp import LEVEL_THRESHOLDS, get_level_from_xp, level_expression, streak_expression, xp_pipeline
+
+
+def evaluate_level_switch(expression, total_xp):
+    # The branches only use {"$gte": ["$total_xp", threshold]}
+    for branch in expression["$switch"]["branches"]:
+        if total_xp >= branch["case"]["$gte"][1]:
+            return branch["then"]
+    return expression["$switch"]["default"]
+
+
+def test_level_expression_matches_get_level_from_xp():
+    for total_xp in [0, 1, 199, 200, 201, 999, 1000, 14999, 15000, 49999, 50000, 10 ** 6]:
+        level = get_level_from_xp(total_xp)
+        assert evaluate_level_switch(level_expression("level"), total_xp) == level["level"]
+        assert evaluate_level_switch(level_expression("name"), total_xp) == level["name"]
+    assert len(level_expression("level")["$switch"]["branches"]) == len(LEVEL_THRESHOLDS) - 1
+
+
+def test_streak_compares_with_the_previous_day():
+    branches = streak_expression("2025-03-01")["$switch"]["branches"]
+
+    assert branches[0]["case"] == {"$eq": ["$last_activity_date", "2025-02-28"]}
+    assert branches[1]["case"] == {"$gte": ["$last_activity_date", "2025-03-01"]}
+
+
+def test_pipeline_increments_and_recomputes_level_after():
+    pipeline = xp_pipeline(25, counters={"attendance_count": 1}, on_insert={"streak_days": 1},
+                           created_at="2025-03-01T10:00:00+00:00")
+
+    first, second = (stage["$set"] for stage in pipeline)
+    assert first["total_xp"] == {"$add": [{"$ifNull": ["$total_xp", 0]}, 25]}
+    assert first["attendance_count"] == {"$add": [{"$ifNull": ["$attendance_count", 0]}, 1]}
+    assert first["streak_days"] == {"$ifNull": ["$streak_days", {"$literal": 1}]}
+    assert first["badges"] == {"$ifNull": ["$badges", {"$literal": []}]}
+    # The level reads the total_xp written by the previous stage
+    assert set(second) == {"level", "level_name"}
+    assert "streak_days" in xp_pipeline(10, activity_date="2025-03-01")[0]["$set"]
@@ -0,0 +1,182 @@
+"""
+Unit tests for the XP ledger fold (services/xp_ledger.py)
+"""
+
+import asyncio
+from datetime import date
+
+import pytest
+
+from services.xp import XpService
+from services.xp_ledger import OPENING_BALANCE, XpLedger, apply_event, empty_state, fold, stats_fields
+
+
+def event(amount=0, **fields):
+    return {"amount": amount, **fields}
+
+
+def test_fold_totals_and_counters():
+    state = fold(empty_state(), [
+        event(10, source="challenge", counters={"challenges_completed": 1}),
+        event(25, source="attendance", counters={"attendance_count": 1}),
+        event(10, source="parent_validation"),
+    ])
+
+    assert state["total_xp"] == 45
+    assert state["counters"] == {"challenges_completed": 1, "attendance_count": 1}
+
+
+def test_streak_follows_the_stats_pipeline_rule():
+    state = empty_state()
+    for day, expected in [("2025-03-01", 1), ("2025-03-02", 2), ("2025-03-02", 2), ("2025-03-03", 3), ("2025-03-10", 1)]:
+        apply_event(state, event(10, activity_date=day))
+        assert state["streak_days"] == expected
+    assert state["last_activity_date"] == "2025-03-10"
+
+
+def test_opening_balance_then_events():
+    state = fold(empty_state(), [
+        event(1200, source=OPENING_BALANCE, counters={"attendance_count": 4},
+              set={"streak_days": 5, "last_activity_date": "2025-03-01"}),
+        event(10, activity_date="2025-03-02"),
+        # Attendance on existing stats: its on_insert fields as the update left them
+        event(25, set={"streak_days": 6, "last_activity_date": "2025-03-02"}),
+    ])
+
+    fields = stats_fields(state, today=date(2025, 3, 3))
+    assert (fields["total_xp"], fields["streak_days"], fields["last_activity_date"]) == (1235, 6, "2025-03-02")
+    assert (fields["level"], fields["level_name"]) == (4, "Ninja Agile")
+    assert (fields["attendance_count"], fields["challenges_completed"]) == (4, 0)
+
+
+def test_rebuilt_streak_is_broken_after_a_missed_day():
+    state = fold(empty_state(), [event(10, activity_date="2025-03-01"), event(10, activity_date="2025-03-02")])
+
+    assert stats_fields(state, today=date(2025, 3, 3))["streak_days"] == 2
+    broken = stats_fields(state, today=date(2025, 3, 4))
+    assert (broken["streak_days"], broken["last_activity_date"]) == (0, "2025-03-02")
+
+
+def test_checkpoint_plus_tail_equals_full_fold():
+    events = [event(5 * i, activity_date=f"2025-03-{i:02d}") for i in range(1, 20)]
+    checkpoint = fold(empty_state(), events[:12])
+
+    assert fold(checkpoint, events[12:]) == fold(empty_state(), events)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, order):
+        self.docs = sorted(self.docs, key=lambda d: tuple(d[field] for field, _ in order))
+        return self
+
+    async def to_list(self, length):
+        return [dict(doc) for doc in self.docs]
+
+    def __aiter__(self):
+        async def iterate():
+            for doc in self.docs:
+                yield dict(doc)
+        return iterate()
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    def _matches(self, doc, query):
+        if "$and" in query:
+            return all(self._matches(doc, q) for q in query["$and"])
+        return all(doc.get(k) == v for k, v in query.items())
+
+    def find(self, query, projection=None):
+        return FakeCursor([d for d in self.docs if self._matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if self._matches(d, query)), None)
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def insert_many(self, docs):
+        self.docs.extend(dict(d) for d in docs)
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                doc.update(update["$set"])
+                return
+
+    async def delete_one(self, query):
+        self.docs = [d for d in self.docs if not self._matches(d, query)]
+
+
+class FakeDb:
+    def __init__(self, stats):
+        self.gamification_stats = FakeCollection(stats)
+        self.xp_events = FakeCollection()
+        self.xp_snapshots = FakeCollection()
+
+
+def test_gain_on_stats_created_empty_keeps_their_streak():
+    # GET /gamification/stats created the document with streak 0; then a first attendance
+    stats = {"user_id": "u1", "total_xp": 25, "level": 1, "level_name": "Petit Scarabée",
+             "streak_days": 0, "last_activity_date": None, "attendance_count": 1}
+
+    class Stats(FakeCollection):
+        async def find_one_and_update(self, *args, **kwargs):
+            return dict(stats)
+
+    class Board:
+        async def record_xp(self, *args):
+            pass
+
+    db = FakeDb([])
+    db.gamification_stats = Stats()
+    ledger = XpLedger(db)
+    service = XpService(db, Board(), ledger)
+    asyncio.run(service.gain("u1", 25, "attendance", counters={"attendance_count": 1},
+                             on_insert={"streak_days": 1, "last_activity_date": "2025-03-01"}))
+
+    (logged,) = db.xp_events.docs
+    assert logged["set"] == {"streak_days": 0, "last_activity_date": None}
+    state = fold(empty_state(), [event(10), logged])
+    assert (state["streak_days"], state["last_activity_date"]) == (0, None)
+
+
+def test_gain_is_logged_before_the_stats_update():
+    class Stats(FakeCollection):
+        async def find_one_and_update(self, *args, **kwargs):
+            raise RuntimeError("stats update failed")
+
+    db = FakeDb([])
+    db.gamification_stats = Stats()
+    service = XpService(db, None, XpLedger(db))
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.gain("u1", 25, "attendance", counters={"attendance_count": 1},
+                                 on_insert={"streak_days": 1, "last_activity_date": "2025-03-01"}))
+
+    # A rebuild still accounts for the gain; only the on_insert values are unknown
+    (logged,) = db.xp_events.docs
+    assert (logged["amount"], logged["counters"], logged["set"]) == (25, {"attendance_count": 1}, {})
+
+
+def test_seed_keeps_the_streak_of_already_logged_days():
+    db = FakeDb([{"user_id": "u1", "total_xp": 520, "streak_days": 2, "last_activity_date": "2025-03-03",
+                  "attendance_count": 0, "challenges_completed": 2}])
+    ledger = XpLedger(db)
+    for i, day in enumerate(["2025-03-02", "2025-03-03"]):
+        db.xp_events.docs.append({"id": f"e{i}", "user_id": "u1", "amount": 10, "source": "challenge",
+                                  "counters": {"challenges_completed": 1}, "activity_date": day,
+                                  "set": {}, "created_at": f"{day}T10:00:00+00:00"})
+
+    async def scenario():
+        assert await ledger.seed_opening_balances() == {"seeded": 1}
+        state, _, _ = await ledger.state_of("u1")
+        return state
+
+    state = asyncio.run(scenario())
+    assert (state["total_xp"], state["counters"]["challenges_completed"]) == (520, 2)
+    assert (state["streak_days"], state["last_activity_date"]) == (2, "2025-03-03")